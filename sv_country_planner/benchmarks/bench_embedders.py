@@ -0,0 +1,92 @@
+###############################################################################
+#   Benchmark: embedding backends of the website search tool.                 #
+#                                                                             #
+#   The corpus is the instructions of every <section> in tasks.yaml, filled   #
+#   in for a sample trip; each section is queried with its search keywords    #
+#   (e.g. 'visa permit Indonesia' for "Travel Permits"). For every backend    #
+#   the script reports the time to embed the corpus, the query latency        #
+#   (embedding plus a brute-force cosine search) and recall@k of the right    #
+#   section. "remote" only runs when OPENAI_API_KEY is set, "local" needs     #
+#   the MiniLM model (downloaded by chromadb on first use).                   #
+#                                                                             #
+#   python benchmarks/bench_embedders.py [k] [backend ...]                    #
+###############################################################################
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List, Sequence, Tuple
+
+from sv_country_planner.prefetch import CITY_TASK, COUNTRY_TASK
+from sv_country_planner.sections import SECTION_KEYWORDS, load_sections
+from sv_country_planner.tools.embedders import EMBEDDERS, REMOTE
+
+INPUTS = {
+    "HomeCountry": "USA",
+    "Country": "Indonesia",
+    "StartDate": "10 December 2025",
+    "EndDate": "01 January 2026",
+    "PreferredActivity": "Kayaking",
+}
+
+
+def _corpus() -> Tuple[List[str], List[Tuple[str, int]]]:
+    documents, queries = [], []
+    for task in (COUNTRY_TASK, CITY_TASK):
+        for section in load_sections(task):
+            text = section.render(INPUTS)
+            if not text:
+                continue
+            keywords = SECTION_KEYWORDS.get(section.name)
+            if keywords:
+                queries.append((f"{' '.join(keywords[:2])} {INPUTS['Country']}", len(documents)))
+            documents.append(text)
+    return documents, queries
+
+
+def _remote() -> Callable[[Sequence[str]], List[List[float]]]:
+    from embedchain.embedder.openai import OpenAIEmbedder
+
+    return OpenAIEmbedder().embedding_fn
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return dot / norm if norm else 0.0
+
+
+def run(name: str, embed: Callable[[Sequence[str]], List[List[float]]], documents: List[str],
+        queries: List[Tuple[str, int]], k: int) -> None:
+    started = time.perf_counter()
+    vectors = embed(documents)
+    corpus_seconds = time.perf_counter() - started
+
+    latencies, found = [], 0
+    for query, expected in queries:
+        started = time.perf_counter()
+        vector = embed([query])[0]
+        ranked = sorted(range(len(vectors)), key=lambda i: _cosine(vector, vectors[i]), reverse=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += expected in ranked[:k]
+
+    print(f"{name:8s}: corpus {corpus_seconds:7.2f}s  query p50 {statistics.median(latencies):7.1f} ms  "
+          f"p95 {sorted(latencies)[int(0.95 * (len(latencies) - 1))]:7.1f} ms  recall@{k} {found / len(queries):.2f}")
+
+
+def main(k: int = 3, *backends: str) -> None:
+    documents, queries = _corpus()
+    print(f"{len(documents)} section documents, {len(queries)} queries")
+    for name in backends or ("hashing", "local", REMOTE):
+        if name == REMOTE and not os.getenv("OPENAI_API_KEY"):
+            print(f"{name:8s}: skipped (OPENAI_API_KEY is not set)")
+            continue
+        try:
+            embed = _remote() if name == REMOTE else EMBEDDERS[name]().embed
+            run(name, embed, documents, queries, k)
+        except Exception as e:
+            print(f"{name:8s}: failed ({e})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3, *sys.argv[2:])
@@ -0,0 +1,65 @@
+###############################################################################
+#   Benchmark: hedged streamed completions against the stand-in LLM server.   #
+#                                                                             #
+#   The primary stand-in model answers in 0.1s but every 25th request takes   #
+#   2s (a fake slow provider with a latency tail); the secondary always       #
+#   answers in 0.2s. The same streamed calls run without and with hedging     #
+#   (hedging.py) and the p50/p95/p99 call latency of both are printed, with   #
+#   the hedge rate and the p99 TTFT saved from hedge_stats.                   #
+#                                                                             #
+#   python benchmarks/bench_hedging.py [calls]                                #
+###############################################################################
+import os
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="ta-hedging-")
+
+# The LLM and hedging.py read these when they are imported.
+os.environ.update({
+    "TA_HEDGE": "1", "TA_HEDGE_DELAY": "0.5", "TA_LLM_CACHE": "0", "TA_MODEL_ROUTING": "0",
+    "TA_CACHE_DIR": WORKDIR, "OPENAI_API_KEY": "stand-in",
+})
+
+from sv_country_planner.hedging import hedge_stats, percentile  # noqa: E402
+from sv_country_planner.rate_limit import set_limits  # noqa: E402
+from sv_country_planner.stand_in import StandInHTTPServer  # noqa: E402
+
+PRIMARY, SECONDARY = "openai/stand-in-primary", "openai/stand-in-secondary"
+LATENCY = {"stand-in-primary": [0.1] * 24 + [2.0], "stand-in-secondary": 0.2}
+
+
+def timed_calls(llm, calls: int):
+    seconds = []
+    for index in range(calls):
+        started = time.perf_counter()
+        llm.call([{"role": "user", "content": f"Packing list for trip {index}?"}])
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def summary(seconds) -> str:
+    return "  ".join(f"p{pct} {percentile(seconds, pct):5.2f}s" for pct in (50, 95, 99))
+
+
+def main(calls: int = 100) -> None:
+    with StandInHTTPServer(model_latency=LATENCY) as server:
+        from sv_country_planner.llm import TravelLLM
+
+        set_limits("llm:openai", rate=1e6, burst=1000, max_concurrency=16)  # measure the hedging, not the limiter
+        url = f"{server.url}/v1"
+        secondary = TravelLLM(model=SECONDARY, base_url=url, stream=True, max_rate_limit_retries=0)
+        plain = TravelLLM(model=PRIMARY, base_url=url, stream=True, max_rate_limit_retries=0)
+        hedged = TravelLLM(model=PRIMARY, base_url=url, stream=True, max_rate_limit_retries=0, hedge=secondary)
+
+        without = summary(timed_calls(plain, calls))
+        server.set_model_latency("stand-in-primary", LATENCY["stand-in-primary"])  # same spikes, same order
+        with_hedging = summary(timed_calls(hedged, calls))
+        time.sleep(max(LATENCY["stand-in-primary"]))  # the last cancelled primary still records its TTFT
+        print(f"\n\nwithout hedging  {without}\nwith hedging     {with_hedging}")
+        print(f"\nhedge stats: {hedge_stats.stats()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,73 @@
+###############################################################################
+#   Benchmark: shared pooled HTTP client vs. one connection per request.      #
+#                                                                             #
+#   Runs a mix of Serper-style searches and page fetches against the local    #
+#   stand-in server, first opening a new client per request (what each tool  #
+#   did on its own), then through the shared PooledHTTPClient. Reports        #
+#   requests per second and the TCP connections opened; on https every one    #
+#   of those connections is also a TLS handshake.                             #
+#                                                                             #
+#   python benchmarks/bench_http_client.py [requests] [concurrency]           #
+###############################################################################
+import asyncio
+import sys
+import time
+
+import httpx
+
+from sv_country_planner.http_client import PooledHTTPClient
+from sv_country_planner.rate_limit import set_limits
+from sv_country_planner.stand_in import StandInHTTPServer
+
+
+def _workload(base_url: str, n: int):
+    for i in range(n):
+        if i % 2:
+            yield "POST", f"{base_url}/search", {"json": {"q": f"indonesia section {i % 35}", "num": 10}}
+        else:
+            yield "GET", f"{base_url}/page/page-{i % 20}", {}
+
+
+async def _unpooled(base_url: str, n: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(method, url, kwargs):
+        async with semaphore:
+            async with httpx.AsyncClient() as client:
+                (await client.request(method, url, **kwargs)).raise_for_status()
+
+    await asyncio.gather(*(one(*item) for item in _workload(base_url, n)))
+
+
+async def _pooled(client: PooledHTTPClient, base_url: str, n: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(method, url, kwargs):
+        async with semaphore:
+            (await client.arequest(method, url, upstream="bench", **kwargs)).raise_for_status()
+
+    await asyncio.gather(*(one(*item) for item in _workload(base_url, n)))
+
+
+def main(n: int = 400, concurrency: int = 16) -> None:
+    print(f"{n} requests, concurrency {concurrency}")
+
+    with StandInHTTPServer() as server:
+        started = time.perf_counter()
+        asyncio.run(_unpooled(server.url, n, concurrency))
+        elapsed = time.perf_counter() - started
+        print(f"new client per request : {n / elapsed:8.1f} req/s  {server.connections:5d} connections")
+
+    with StandInHTTPServer() as server:
+        client = PooledHTTPClient(per_host_limit=concurrency)
+        set_limits("bench", rate=1e6, burst=n, max_concurrency=concurrency)  # measure the pool, not the limiter
+        started = time.perf_counter()
+        client.run(_pooled(client, server.url, n, concurrency))
+        elapsed = time.perf_counter() - started
+        print(f"shared pooled client   : {n / elapsed:8.1f} req/s  {server.connections:5d} connections")
+        print(f"client stats           : {client.stats()}")
+        client.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,94 @@
+###############################################################################
+#   Benchmark: model routing decisions against the stand-in LLM server.       #
+#                                                                             #
+#   Two stand-in models answer chat completions on the local stand-in         #
+#   server: "small" (cheap, fast) and "large" (pricier, slower). Calls are    #
+#   routed on three routes (the default one, final_reporting_task and a       #
+#   map-reduce shard of simple sections) through four phases:                 #
+#     1. both models healthy,                                                 #
+#     2. small gets slower than the default route's max_p95_seconds,          #
+#     3. small takes longer than the route's timeout (calls fall back),       #
+#     4. small recovers once its slow samples leave the window.               #
+#   Prints the model each scope was routed to and the router's stats.         #
+#                                                                             #
+#   python benchmarks/bench_model_routing.py [calls per scope and phase]      #
+###############################################################################
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+WORKDIR = tempfile.mkdtemp(prefix="ta-routing-")
+CONFIG = os.path.join(WORKDIR, "models.yaml")
+
+# The router and the LLM read these when they are imported.
+os.environ.update({
+    "TA_MODEL_ROUTING": "1", "TA_MODELS_CONFIG": CONFIG, "TA_ROUTER_MIN_SAMPLES": "3", "TA_ROUTER_WINDOW": "3",
+    "TA_ROUTER_COOLDOWN": "2", "TA_LLM_CACHE": "0", "TA_CACHE_DIR": WORKDIR, "OPENAI_API_KEY": "stand-in",
+})
+
+from sv_country_planner.rate_limit import set_limits  # noqa: E402
+from sv_country_planner.stand_in import StandInHTTPServer  # noqa: E402
+
+SMALL, LARGE = "openai/stand-in-small", "openai/stand-in-large"
+ROUTES = """
+models:
+  {small}: {{input_cost: 0.05, output_cost: 0.08, base_url: "{url}/v1"}}
+  {large}: {{input_cost: 0.59, output_cost: 0.79, base_url: "{url}/v1"}}
+routes:
+  default:
+    models: [{small}, {large}]
+    max_p95_seconds: 0.3
+    timeout: 1.0
+  final_reporting_task:
+    models: [{large}, {small}]
+    max_cost_per_call: 0.002
+    timeout: 1.0
+  Emergency Contacts:
+    models: [{small}, {large}]
+    max_p95_seconds: 0.3
+    timeout: 1.0
+"""
+SCOPES = [
+    ("default", None, (), "What should I pack?"),
+    ("final report", "final_reporting_task", (), "Write the final report. " + "Context paragraph. " * 10),
+    ("final report, long context", "final_reporting_task", (), "Write the final report. " + "Context. " * 2500),
+    ("shard: Emergency Contacts", "country_research_task", ("Emergency Contacts",), "Emergency numbers?"),
+]
+PHASES = [
+    ("healthy", {SMALL: 0.05, LARGE: 0.15}),
+    ("small slow (0.5s > p95 bound)", {SMALL: 0.5, LARGE: 0.15}),
+    ("small stalls (2s > timeout)", {SMALL: 2.0, LARGE: 0.15}),
+    ("small recovered", {SMALL: 0.05, LARGE: 0.15}),
+]
+
+
+def main(calls: int = 6) -> None:
+    with StandInHTTPServer() as server:
+        with open(CONFIG, "w", encoding="utf-8") as f:
+            f.write(ROUTES.format(small=SMALL, large=LARGE, url=server.url))
+        from sv_country_planner.llm import TravelLLM
+        from sv_country_planner.router import default_router, routing_scope
+
+        set_limits("llm:openai", rate=1e6, burst=1000, max_concurrency=16)  # measure the routing, not the limiter
+        llm = TravelLLM(model=SMALL, max_rate_limit_retries=0)
+        for phase, latencies in PHASES:
+            if phase == "small recovered":
+                time.sleep(3)  # let the slow samples age out of TA_ROUTER_WINDOW and the failure cool down
+            for model, seconds in latencies.items():
+                server.set_model_latency(model.split("/", 1)[1], seconds)
+            print(f"\n{phase}")
+            for label, task, sections, prompt in SCOPES:
+                routed = Counter()
+                started = time.perf_counter()
+                with routing_scope(task, sections):
+                    for _ in range(calls):
+                        answer = llm.call([{"role": "user", "content": prompt}])
+                        routed[answer.split("Stand-in answer from ", 1)[1].split(" ", 1)[0]] += 1
+                print(f"  {label:28s} {dict(routed)}  {(time.perf_counter() - started) / calls:5.2f} s/call")
+        print(f"\nrouter stats: {default_router().stats()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 6)
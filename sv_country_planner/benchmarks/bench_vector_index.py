@@ -0,0 +1,129 @@
+###############################################################################
+#   Benchmark: float32 HNSW vs int8 vectors for the website vector store.     #
+#                                                                             #
+#   The corpus is the <section> instructions of tasks.yaml filled in for      #
+#   many countries (a stand-in for pages about many countries), embedded      #
+#   with the hashing backend so no model or key is needed. Each section of    #
+#   each country is queried with its search keywords; recall@k is measured    #
+#   against an exact float32 brute-force search. For Chroma's HNSW index      #
+#   it runs every M / search ef pair given, for the int8 index every          #
+#   re-rank factor, and reports the memory of the vectors (plus the graph     #
+#   links for HNSW), build time and query latency.                            #
+#                                                                             #
+#   python benchmarks/bench_vector_index.py [k] [countries]                   #
+###############################################################################
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Sequence, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from sv_country_planner.prefetch import CITY_TASK, COUNTRY_TASK
+from sv_country_planner.sections import SECTION_KEYWORDS, load_sections
+from sv_country_planner.tools.embedders import HashingEmbedder
+from sv_country_planner.tools.vector_quant import QuantizedIndex, exact_rerank
+
+COUNTRIES = [
+    "Indonesia", "Japan", "Peru", "Kenya", "Norway", "Mexico", "Vietnam", "Morocco", "Iceland", "Chile",
+    "India", "Italy", "Egypt", "Canada", "Thailand", "Portugal", "Brazil", "Australia", "Turkey", "Greece",
+    "Nepal", "Spain", "Argentina", "Tanzania", "Croatia", "Jordan", "Colombia", "France", "Sri Lanka", "Ireland",
+    "Cambodia", "Germany", "Namibia", "Ecuador", "Scotland", "Philippines", "Georgia", "Oman", "Laos", "Austria",
+]
+HNSW_SETTINGS = [(16, 10), (16, 50), (32, 50), (32, 100)]  # (M, search ef)
+RERANK_FACTORS = [1, 4, 10]
+
+
+def _corpus(countries: Sequence[str]) -> Tuple[List[str], List[str]]:
+    documents, queries = [], []
+    for country in countries:
+        inputs = {"HomeCountry": "USA", "Country": country, "StartDate": "10 December 2025",
+                  "EndDate": "01 January 2026", "PreferredActivity": "Kayaking"}
+        for task in (COUNTRY_TASK, CITY_TASK):
+            for section in load_sections(task):
+                text = section.render(inputs)
+                if text:
+                    documents.append(f"{section.name} in {country}. {text}")
+                keywords = SECTION_KEYWORDS.get(section.name)
+                if keywords and task == COUNTRY_TASK:
+                    queries.append(f"{' '.join(keywords[:2])} {country}")
+    return list(dict.fromkeys(documents)), queries
+
+
+def _exact(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    distances = (queries * queries).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors * vectors).sum(1)[None, :]
+    return [set(np.argsort(row)[:k]) for row in distances]
+
+
+def _report(name: str, memory: int, build: float, latencies: List[float], found: int, total: int, k: int) -> None:
+    print(f"{name:26s} memory {memory / 1e6:7.2f} MB  build {build:6.2f}s  query p50 "
+          f"{statistics.median(latencies):6.2f} ms  p95 {sorted(latencies)[int(0.95 * (len(latencies) - 1))]:6.2f} ms"
+          f"  recall@{k} {found / total:.3f}")
+
+
+def run_hnsw(vectors: np.ndarray, queries: np.ndarray, truth: List[set], k: int, m: int, ef: int) -> None:
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(
+        f"bench_{m}_{ef}", metadata={"hnsw:space": "l2", "hnsw:M": m, "hnsw:search_ef": ef,
+                                     "hnsw:construction_ef": max(100, ef)},
+    )
+    ids = [str(i) for i in range(len(vectors))]
+    started = time.perf_counter()
+    for i in range(0, len(ids), 1000):
+        collection.add(ids=ids[i:i + 1000], embeddings=vectors[i:i + 1000].tolist())
+    build = time.perf_counter() - started
+    latencies, found = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += len(expected & {int(i) for i in result["ids"][0]})
+    # hnswlib keeps each float32 vector plus 2*M level-0 links of 4 bytes.
+    memory = len(vectors) * (vectors.shape[1] * 4 + 2 * m * 4)
+    _report(f"hnsw float32 M={m} ef={ef}", memory, build, latencies, found, k * len(queries), k)
+    client.delete_collection(f"bench_{m}_{ef}")
+
+
+def run_int8(vectors: np.ndarray, queries: np.ndarray, truth: List[set], k: int, factor: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        index = QuantizedIndex("bench", path=os.path.join(directory, "vectors_int8.sqlite3"))
+        started = time.perf_counter()
+        index.put("bench", "", [(str(i), "", vector) for i, vector in enumerate(vectors)])
+        index.search(queries[0], 1)  # loads the matrix
+        build = time.perf_counter() - started
+        latencies, found = [], 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            candidates = index.search(query, k * factor)
+            # Exact re-rank with the float vectors stored next to the codes, as section_search.py does.
+            stored = index.vectors(candidates)
+            distances = exact_rerank(query, [stored[i] for i in candidates])
+            top = [int(candidates[i]) for i in np.argsort(distances)[:k]]
+            latencies.append((time.perf_counter() - started) * 1000)
+            found += len(expected & set(top))
+        _report(f"int8 re-rank x{factor}", index.stats()["int8_bytes"], build, latencies, found,
+                k * len(queries), k)
+
+
+def main(k: int = 5, countries: int = len(COUNTRIES)) -> None:
+    documents, queries = _corpus(COUNTRIES[:countries])
+    embedder = HashingEmbedder()
+    started = time.perf_counter()
+    vectors = np.asarray(embedder.embed(documents), dtype=np.float32)
+    query_vectors = np.asarray(embedder.embed(queries), dtype=np.float32)
+    print(f"{len(documents)} documents from {countries} countries, {len(queries)} queries, "
+          f"dimension {vectors.shape[1]}, embedded in {time.perf_counter() - started:.1f}s")
+    print(f"{'float32 vectors only':26s} memory {vectors.nbytes / 1e6:7.2f} MB")
+    truth = _exact(vectors, query_vectors, k)
+    for m, ef in HNSW_SETTINGS:
+        run_hnsw(vectors, query_vectors, truth, k, m, ef)
+    for factor in RERANK_FACTORS:
+        run_int8(vectors, query_vectors, truth, k, factor)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5, int(sys.argv[2]) if len(sys.argv) > 2 else len(COUNTRIES))
@@ -0,0 +1,161 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Record / replay cassettes for offline runs.                               #
+#                                                                             #
+#   In record mode every LLM completion, Serper search and website lookup of  #
+#   a real run is written to a compact cassette file (gzipped JSON lines).    #
+#   In replay mode the same calls are answered from that file, in the order   #
+#   they were recorded, without touching Groq, Serper or the web, so the      #
+#   orchestration can be profiled and regression-tested offline. Calls are    #
+#   recorded at the tool level only; the steps below a tool (HTTP fetches,    #
+#   prefetch, seeding, indexing) are skipped in replay. A cassette applies to #
+#   the block that opened it (a ContextVar), not to other sessions.           #
+#                                                                             #
+#   with use_cassette("indonesia.cassette.gz", "record"):                     #
+#       TA().crew().kickoff(inputs=inputs)                                    #
+###############################################################################
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a call that is not on the cassette."""
+
+
+def request_key(kind: str, request: Any) -> str:
+    material = json.dumps(request, sort_keys=True, default=str, separators=(",", ":"))
+    return kind + ":" + hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """Recorded interactions keyed by (kind, request). Repeated requests replay their answers in order."""
+
+    def __init__(self, path: str, mode: str = REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Cassette mode must be '{RECORD}' or '{REPLAY}', not '{mode}'")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Any]] = {}
+        self._cursors: Dict[str, int] = {}
+        self.recorded = 0
+        self.replayed = 0
+        if mode == REPLAY:
+            self.load()
+
+    def load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self._entries.setdefault(entry["k"], []).append(entry["r"])
+
+    def save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for key, responses in self._entries.items():
+                for response in responses:
+                    f.write(json.dumps({"k": key, "r": response}, separators=(",", ":"), default=str) + "\n")
+
+    def record(self, kind: str, request: Any, response: Any) -> None:
+        with self._lock:
+            self._entries.setdefault(request_key(kind, request), []).append(response)
+            self.recorded += 1
+
+    def replay(self, kind: str, request: Any) -> Any:
+        key = request_key(kind, request)
+        with self._lock:
+            responses = self._entries.get(key)
+            if not responses:
+                raise CassetteMiss(f"No recorded {kind} call matches this request ({key})")
+            # Answer repeats in recorded order; once they run out keep giving the last one.
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+            self.replayed += 1
+            return responses[min(index, len(responses) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "mode": self.mode, "recorded": self.recorded, "replayed": self.replayed,
+                "entries": sum(len(v) for v in self._entries.values())}
+
+
+_active: ContextVar[Optional[Cassette]] = ContextVar("ta_cassette", default=None)
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active.get()
+
+
+def replaying() -> bool:
+    cassette = _active.get()
+    return cassette is not None and cassette.mode == REPLAY
+
+
+def through_cassette(kind: str, request: Any, call: Callable[[], Any],
+                     encode: Callable[[Any], Any] = lambda r: r,
+                     decode: Callable[[Any], Any] = lambda r: r) -> Any:
+    """Calls call() normally, records its answer, or replays it, depending on the active cassette.
+
+    encode/decode convert answers that are not JSON-friendly (e.g. HTTP responses).
+    """
+    cassette = _active.get()
+    if cassette is None:
+        return call()
+    if cassette.mode == REPLAY:
+        return decode(cassette.replay(kind, request))
+    response = call()
+    cassette.record(kind, request, encode(response))
+    return response
+
+
+@contextmanager
+def use_cassette(path: Optional[str], mode: str = REPLAY) -> Iterator[Optional[Cassette]]:
+    """Activates a cassette for the calls made inside the block. path=None does nothing."""
+    if not path:
+        yield None
+        return
+    cassette = Cassette(path, mode)
+    token = _active.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active.reset(token)
+        if cassette.mode == RECORD:
+            cassette.save()
+        print(f"Cassette: {cassette.stats()}")
+
+
+def cassette_args(argv: List[str] = sys.argv) -> Tuple[Optional[str], str]:
+    """Takes '--cassette PATH' and '--record' out of argv (so positional arguments keep their place).
+
+    Falls back to the TA_CASSETTE and TA_CASSETTE_MODE environment variables.
+    """
+    path = os.getenv("TA_CASSETTE") or None
+    mode = os.getenv("TA_CASSETTE_MODE", REPLAY)
+    if "--record" in argv:
+        argv.remove("--record")
+        mode = RECORD
+    for i, arg in enumerate(list(argv)):
+        if arg == "--cassette" and i + 1 < len(argv):
+            path = argv[i + 1]
+            del argv[i:i + 2]
+            break
+        if arg.startswith("--cassette="):
+            path = arg.split("=", 1)[1]
+            del argv[i]
+            break
+    return path, mode
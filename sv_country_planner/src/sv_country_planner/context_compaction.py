@@ -0,0 +1,249 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Compaction of the context a task receives from several upstream tasks.    #
+#                                                                             #
+#   final_reporting_task reads the outputs of all four earlier tasks, and     #
+#   the planners repeat much of what the researchers found. For the tasks in  #
+#   TA_CONTEXT_COMPACTION_TASKS (only final_reporting_task by default: the    #
+#   city tasks need their day-by-day plans whole), each output is split into  #
+#   its markdown sections and paragraphs (list items count as paragraphs)     #
+#   before the outputs are joined into the prompt:                            #
+#     - a paragraph already given by an earlier output, verbatim or with      #
+#       TA_CONTEXT_NEAR_DUP of its word 3-shingles in common, is dropped,     #
+#     - a link to a URL already given is reduced to its text, and a line      #
+#       that only lists such URLs is dropped,                                 #
+#     - a section keeps whole paragraphs up to TA_CONTEXT_SECTION_TOKENS,     #
+#     - a heading with nothing left under it is dropped.                      #
+#   The prompt size before and after is kept per task (context_stats).        #
+###############################################################################
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from sv_country_planner.settings import env_flag, env_float, env_int
+from sv_country_planner.tokens import count_tokens
+from sv_country_planner.tools.crawl_dedupe import canonical_url
+
+ENABLED = env_flag("TA_CONTEXT_COMPACTION", default=True)
+COMPACTED_TASKS = tuple(name.strip() for name in os.getenv("TA_CONTEXT_COMPACTION_TASKS", "final_reporting_task")
+                        .split(",") if name.strip())
+SECTION_BUDGET = env_int("TA_CONTEXT_SECTION_TOKENS", 700)
+NEAR_DUPLICATE = env_float("TA_CONTEXT_NEAR_DUP", 0.8)  # Jaccard similarity of word 3-shingles
+
+DIVIDER = "\n\n----------\n\n"  # crewai's separator between context outputs
+NEAR_DUPLICATE_WORDS = 12  # shorter paragraphs are only dropped when repeated verbatim
+SOURCE_LINE_WORDS = 8  # a paragraph with fewer words besides its links is a list of sources
+
+_HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(\S.*?)\s*#*\s*$")
+_BOLD_HEADING_RE = re.compile(r"^\s*\*\*([^*]{2,80}?)\*\*:?\s*$")
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d{1,3}[.)])\s+")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\((https?://[^\s)]+)\)")
+_URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class Section:
+    heading: str  # the heading line as written, "" for text before the first heading
+    level: int  # 1-6 for '#' headings, 7 for bold-line headings, 0 for the text before them
+    paragraphs: List[str] = field(default_factory=list)
+
+
+def _heading(line: str) -> Optional[Tuple[int, str]]:
+    match = _HEADING_RE.match(line)
+    if match:
+        return len(match.group(1)), line.strip()
+    match = _BOLD_HEADING_RE.match(line)
+    if match:
+        return 7, line.strip()
+    return None
+
+
+def split_sections(markdown: str) -> List[Section]:
+    """Sections of a markdown text; blocks separated by blank lines and list items are paragraphs."""
+    sections = [Section("", 0)]
+    block: List[str] = []
+
+    def close_block():
+        if block:
+            sections[-1].paragraphs.append("\n".join(block))
+            block.clear()
+
+    in_fence = False
+    for line in markdown.replace("\r\n", "\n").split("\n"):
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        heading = None if in_fence else _heading(line)
+        if heading is not None:
+            close_block()
+            sections.append(Section(heading[1], heading[0]))
+        elif not line.strip() and not in_fence:
+            close_block()
+        else:
+            if _LIST_ITEM_RE.match(line) and not in_fence:
+                close_block()
+            block.append(line.rstrip())
+    close_block()
+    return sections
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _truncate(text: str, budget: int) -> str:
+    """The longest prefix of text, cut after a sentence or word, within budget tokens."""
+    if count_tokens(text) <= budget:
+        return text
+    cut = text[:max(1, len(text) * budget // count_tokens(text))]
+    sentence = max(cut.rfind(". "), cut.rfind(".\n"))
+    cut = cut[:sentence + 1] if sentence > len(cut) // 2 else cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + " …"
+
+
+def _join(paragraphs: List[str]) -> str:
+    """Paragraphs separated by blank lines, consecutive list items by line breaks."""
+    text = paragraphs[0] if paragraphs else ""
+    for previous, paragraph in zip(paragraphs, paragraphs[1:]):
+        tight = _LIST_ITEM_RE.match(previous) and _LIST_ITEM_RE.match(paragraph)
+        text += ("\n" if tight else "\n\n") + paragraph
+    return text
+
+
+class _Seen:
+    """Paragraphs and URLs already given by an earlier part of the context."""
+
+    def __init__(self, near_duplicate: float):
+        self.near_duplicate = near_duplicate
+        self.exact: Set[str] = set()
+        self.shingles: List[FrozenSet[str]] = []
+        self.urls: Set[str] = set()
+
+    def repeated(self, paragraph: str) -> bool:
+        words = _words(_LINK_RE.sub(r"\1", _LIST_ITEM_RE.sub("", paragraph)))
+        if not words:
+            return False
+        key = " ".join(words)
+        if key in self.exact:
+            return True
+        self.exact.add(key)
+        if len(words) < NEAR_DUPLICATE_WORDS:
+            return False
+        shingles = frozenset(" ".join(words[i:i + 3]) for i in range(len(words) - 2))
+        for seen in self.shingles:
+            if len(shingles & seen) >= self.near_duplicate * len(shingles | seen):
+                return True
+        self.shingles.append(shingles)
+        return False
+
+    def strip_links(self, paragraph: str) -> Optional[str]:
+        """paragraph with links to URLs already given reduced to their text; None if it only lists those."""
+        urls = [canonical_url(url) for url in _URL_RE.findall(paragraph)]
+        if not urls:
+            return paragraph
+        fresh = [url for url in urls if url not in self.urls]
+        prose = _words(_URL_RE.sub(" ", _LINK_RE.sub(r"\1", paragraph)))
+        if not fresh and len(prose) < SOURCE_LINE_WORDS:
+            return None
+        self.urls.update(fresh)
+        known = set(urls) - set(fresh)
+        return _LINK_RE.sub(lambda m: m.group(1) if canonical_url(m.group(2)) in known else m.group(0), paragraph)
+
+
+@dataclass
+class Compaction:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    dropped_paragraphs: int
+    dropped_sections: int
+    truncated_sections: int
+
+
+def compact_outputs(outputs: Sequence[str], section_budget: int = SECTION_BUDGET,
+                    near_duplicate: float = NEAR_DUPLICATE) -> Compaction:
+    """Joins task outputs the way crewai does, without repeated paragraphs and URLs, sections within budget."""
+    seen = _Seen(near_duplicate)
+    parts: List[str] = []
+    dropped_paragraphs = dropped_sections = truncated_sections = 0
+    for output in outputs:
+        sections = split_sections(output)
+        kept: List[Tuple[Section, List[str]]] = []
+        for section in sections:
+            paragraphs, used = [], count_tokens(section.heading)
+            for paragraph in section.paragraphs:
+                text = None if seen.repeated(paragraph) else seen.strip_links(paragraph)
+                if text is None:
+                    dropped_paragraphs += 1
+                    continue
+                tokens = count_tokens(text)
+                if used + tokens > section_budget:
+                    if not paragraphs:
+                        paragraphs.append(_truncate(text, max(1, section_budget - used)))
+                    truncated_sections += 1
+                    break
+                paragraphs.append(text)
+                used += tokens
+            kept.append((section, paragraphs))
+        # A heading stays if it, or a deeper section before the next heading of its level, has text left.
+        blocks: List[str] = []
+        has_text_below = [False] * 8
+        for section, paragraphs in reversed(kept):
+            keep = bool(paragraphs) or any(has_text_below[section.level + 1:])
+            has_text_below[section.level + 1:] = [False] * (7 - section.level)
+            has_text_below[section.level] = keep or has_text_below[section.level]
+            if keep and (section.heading or paragraphs):
+                blocks.append(_join(([section.heading] if section.heading else []) + paragraphs))
+            elif section.heading:
+                dropped_sections += 1
+        if blocks:
+            parts.append("\n\n".join(reversed(blocks)))
+    before = count_tokens(DIVIDER.join(outputs))
+    text = DIVIDER.join(parts)
+    return Compaction(text, before, count_tokens(text), dropped_paragraphs, dropped_sections, truncated_sections)
+
+
+class ContextStats:
+    """Prompt sizes of the compacted task contexts of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.dropped_paragraphs = 0
+        self.dropped_sections = 0
+        self.truncated_sections = 0
+        self.last: Dict[str, str] = {}
+
+    def add(self, task: str, compaction: Compaction) -> None:
+        with self._lock:
+            self.compactions += 1
+            self.tokens_before += compaction.tokens_before
+            self.tokens_after += compaction.tokens_after
+            self.dropped_paragraphs += compaction.dropped_paragraphs
+            self.dropped_sections += compaction.dropped_sections
+            self.truncated_sections += compaction.truncated_sections
+            self.last[task] = f"{compaction.tokens_before} -> {compaction.tokens_after} tokens"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "compactions": self.compactions,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "saved": f"{1 - self.tokens_after / self.tokens_before:.0%}" if self.tokens_before else "0%",
+                "dropped_paragraphs": self.dropped_paragraphs,
+                "dropped_sections": self.dropped_sections,
+                "truncated_sections": self.truncated_sections,
+                "last": dict(self.last),
+            }
+
+
+context_stats = ContextStats()
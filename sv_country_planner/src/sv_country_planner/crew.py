@@ -10,14 +10,25 @@ import streamlit as st
 from crewai import Agent, Crew, Process, Task,LLM
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
-from crewai_tools import SerperDevTool
-from crewai_tools import WebsiteSearchTool
+from typing import List, Optional
+from sv_country_planner.tools.travel_tools import TravelSearchTool, TravelWebsiteSearchTool
+from sv_country_planner.llm import TravelLLM
+from sv_country_planner.context_compaction import (
+    ENABLED as COMPACT_CONTEXT, COMPACTED_TASKS, compact_outputs, context_stats,
+)
+from sv_country_planner.map_reduce import MapReduceAgent
+from sv_country_planner.structured_output import StructuredTask, context_text, structured
+from sv_country_planner.scheduler import ENABLED as DAG_SCHEDULER, DagScheduler, partial_outputs
+from sv_country_planner.seed_sites import with_seed_note
+from sv_country_planner.settings import env_float
 
 from crewai.utilities.events import (LLMStreamChunkEvent)
 from crewai.utilities.events.base_event_listener import BaseEventListener
 from crewai.agents.parser import AgentAction, AgentFinish
 from crewai.agents.crew_agent_executor import ToolResult
+from crewai.tasks.task_output import TaskOutput
+from crewai.crews.crew_output import CrewOutput
+from crewai.cli.constants import DEFAULT_LLM_MODEL
 import re
 
 # Get the OPEN API KEY FROM THE LOCAL .env FILE
@@ -39,6 +50,33 @@ class MyCustomListener(BaseEventListener):
 my_listener = MyCustomListener()
 
 
+###############################################################################
+class TravelCrew(Crew):
+    """Crew whose tasks get only the sections they need of structured context outputs (see structured_output.py),
+    the final report its context outputs compacted (see context_compaction.py), and that runs its tasks as a
+    DAG with TA_DAG_SCHEDULER=1 (see scheduler.py)."""
+
+    def _run_sequential_process(self) -> CrewOutput:
+        if not DAG_SCHEDULER:
+            return super()._run_sequential_process()
+        return self._create_crew_output(DagScheduler(self).run())
+
+    def _context_output(self, context_task: Task) -> Optional[TaskOutput]:
+        """A context task's output, or what it published so far if the task is started on it (scheduler.py)."""
+        return context_task.output if context_task.output is not None else partial_outputs.output(context_task)
+
+    def _get_context(self, task: Task, task_outputs: List[TaskOutput]) -> str:
+        if not isinstance(task.context, list):
+            return super()._get_context(task, task_outputs)
+        outputs = [(context_task.name, self._context_output(context_task)) for context_task in task.context]
+        texts = [context_text(task.name, name, output) for name, output in outputs if output is not None]
+        if not COMPACT_CONTEXT or task.name not in COMPACTED_TASKS or len(task.context) < 2:
+            return "\n\n----------\n\n".join(texts)  # crewai's divider
+        compaction = compact_outputs(texts)
+        context_stats.add(task.name or task.description[:40], compaction)
+        return compaction.text
+
+
 ###############################################################################
 
 
@@ -71,6 +109,10 @@ GROQ_API_KEY=os.getenv("GROQ_API_KEY")
 OPEN_AI_KEY=os.getenv("OPEN_AI_KEY")
 OPEN_AI_MODEL_NAME=os.getenv("OPEN_AI_MODEL_NAME")
 SERPER_API_KEY=os.getenv("SERPER_API_KEY")
+# The agents' model: crewai's default (MODEL / OPENAI_MODEL_NAME, else gpt-4o-mini) unless TA_MODEL names
+# another, e.g. TA_MODEL=groq/gemma2-9b-it with GROQ_API_KEY.
+TA_MODEL = (os.getenv("TA_MODEL") or os.getenv("MODEL") or os.getenv("MODEL_NAME") or os.getenv("OPENAI_MODEL_NAME")
+            or DEFAULT_LLM_MODEL)
 
 
 @CrewBase
@@ -79,29 +121,31 @@ class TA():
     agents: List[BaseAgent]
     tasks: List[Task]
 
-    #Groq LLM
-    llm = LLM(model="groq/gemma2-9b-it", stream=True,)  # Enable streaming
-    search_tool = SerperDevTool(base_url='https://google.serper.dev')
-    website_search_tool = WebsiteSearchTool()
+    llm = TravelLLM(model=TA_MODEL, stream=True,  # Enable streaming; shares the process-wide rate limit of its provider
+                    temperature=env_float("TA_LLM_TEMPERATURE", None))  # the provider's default unless set; 0 lets TA_LLM_CACHE=1 replay completions
+    search_tool = TravelSearchTool(base_url='https://google.serper.dev')  # Serper results are cached on disk
+    website_search_tool = TravelWebsiteSearchTool()  # identical concurrent calls share one request, pages are embedded once on disk
 
     # AGENT #1 - Country Researcher and Planner 
     @agent
     def country_researcher_and_planning_agent(self) -> Agent:
-        return Agent(
+        return MapReduceAgent(  # with TA_MAP_REDUCE=1 country_research_task runs its sections concurrently
             role='Country Researcher and Planner Agent',
             config=self.agents_config['country_researcher_and_planning_agent'], # type: ignore[index]
             verbose=True,
             tools=[self.search_tool,self.website_search_tool], 
             allow_delegation=False,
             step_callback=streamlit_agent_step_callback, # type: ignore[index]
+            llm=self.llm,
             #llm=self.localollama, # Use the local LLM instance 
         )
 
 
     @task
     def country_research_task(self) -> Task:
-        return Task(
-            config=self.tasks_config['country_research_task'], # type: ignore[index]
+        return StructuredTask(
+            config=with_seed_note(self.tasks_config['country_research_task']), # type: ignore[index]
+            **structured('country_research_task'),  # with TA_STRUCTURED_OUTPUT=1, one field per <section>
             async_execution=True,
             markdown=True,
             output_file='country_researcher.md',
@@ -110,8 +154,9 @@ class TA():
 
     @task
     def country_planner_task(self) -> Task:
-        return Task(
+        return StructuredTask(
             config=self.tasks_config['country_planner_task'], # type: ignore[index]
+            **structured('country_planner_task'),  # with TA_STRUCTURED_OUTPUT=1, one field per <section>
             markdown=True,
             output_file='country_planner.md',
             #will wait for country_research_task to complete.
@@ -130,14 +175,16 @@ class TA():
             tools=[self.search_tool,self.website_search_tool,], 
             allow_delegation=False,
             step_callback=streamlit_agent_step_callback, # type: ignore[index]
+            llm=self.llm,
             #llm=self.localollama, # Use the local LLM instance
         )
 
 
     @task
     def city_researcher_task(self) -> Task:
-        return Task(
+        return StructuredTask(
             config=self.tasks_config['city_researcher_task'],# type: ignore[index]
+            **structured('city_researcher_task'),  # with TA_STRUCTURED_OUTPUT=1, one field per <section>
             #will wait for country_research_task and country_planner_task to complete. 
             context=[self.country_research_task(), self.country_planner_task()],
             markdown=True,
@@ -147,8 +194,9 @@ class TA():
 
     @task
     def city_planner_task(self) -> Task:
-        return Task(
+        return StructuredTask(
             config=self.tasks_config['city_planner_task'],# type: ignore[index]
+            **structured('city_planner_task'),  # with TA_STRUCTURED_OUTPUT=1, one field per <section>
             markdown=True,
             output_file='city_planner.md',
             #will wait for city_researcher_task, country_research_task and country_planner_task to complete. 
@@ -168,14 +216,16 @@ class TA():
             verbose=True,
             allow_delegation=False,
             step_callback=streamlit_agent_step_callback, # type: ignore[index]
+            llm=self.llm,
             #llm=self.localollama, # Use the local LLM instance
         ) # type: ignore
 
 
     @task
     def final_reporting_task(self) -> Task:
-        return Task(
+        return StructuredTask(
             config=self.tasks_config['final_reporting_task'],
+            **structured('final_reporting_task'),  # with TA_STRUCTURED_OUTPUT=1, one field per <section>
             markdown=True,
             output_file='final_report.md',
             #will wait for country_research_task and country_planner_task, country_research_task and country_planner_task  to complete. 
@@ -189,7 +239,7 @@ class TA():
     @crew
     def crew(self) -> Crew:
         """Creates the TA crew"""
-        return Crew(
+        return TravelCrew(
             agents=self.agents, # Automatically created by the @agent decorator
             tasks=self.tasks, # Automatically created by the @task decorator
             process=Process.sequential,
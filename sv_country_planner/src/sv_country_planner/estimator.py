@@ -0,0 +1,377 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Token, cost and wall-time estimate of a trip before kickoff.              #
+#                                                                             #
+#   Every task prompt of tasks.yaml / agents.yaml is rendered with the trip's #
+#   inputs and tokenized locally (tokens.py). Each finished task records what #
+#   it really took in task_history.sqlite3: the tokens of its rendered        #
+#   prompt and context, the prompt and completion tokens of all its LLM       #
+#   calls, the tokens of its output, its seconds and the trip's length. The   #
+#   estimate scales the rendered prompts by the recent prompt/rendered ratio  #
+#   of each task (the agent loop sends its prompt many times), takes the      #
+#   output sizes per trip day and the seconds per token from the same runs,   #
+#   and prices the tokens with config/models.yaml. Without history it falls   #
+#   back to the route's expected_output_tokens and TA_ESTIMATE_* defaults.    #
+#   Which outputs a task is given as context is read off the crew's tasks.    #
+#   TA_BUDGET_TOKENS / TA_BUDGET_USD / TA_BUDGET_SECONDS refuse larger runs.  #
+###############################################################################
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import yaml
+from crewai import Task
+from crewai.utilities.events import (
+    LLMCallCompletedEvent,
+    LLMCallStartedEvent,
+    TaskCompletedEvent,
+    TaskFailedEvent,
+    TaskStartedEvent,
+)
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+
+from sv_country_planner.llm import prompt_text
+from sv_country_planner.router import ENABLED as MODEL_ROUTING, MODELS_CONFIG, load_routing
+from sv_country_planner.semantic_cache import current_trip_inputs
+from sv_country_planner.settings import cache_path, env_float, env_int
+from sv_country_planner.tokens import count_tokens
+
+HISTORY_RUNS = env_int("TA_ESTIMATE_HISTORY_RUNS", 20)  # recent runs of a task the estimate is based on
+DEFAULT_PROMPT_FACTOR = env_float("TA_ESTIMATE_PROMPT_FACTOR", 6.0)  # prompt tokens sent per rendered token
+DEFAULT_TOKENS_PER_SECOND = env_float("TA_ESTIMATE_TOKENS_PER_SECOND", 400.0)
+BUDGET_TOKENS = env_int("TA_BUDGET_TOKENS", 0)  # 0: no limit
+BUDGET_USD = env_float("TA_BUDGET_USD", 0.0)
+BUDGET_SECONDS = env_int("TA_BUDGET_SECONDS", 0)
+
+# Tasks whose output grows with the number of days of the trip.
+PER_DAY_TASKS = ("country_planner_task", "city_planner_task", "final_reporting_task")
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "config")
+DATE_FORMATS = ("%d %B %Y", "%d %b %Y", "%Y-%m-%d")
+AGENT_FIELDS = ("role", "goal", "backstory")
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_runs (
+    task              TEXT NOT NULL,
+    model             TEXT,
+    days              INTEGER,
+    rendered_tokens   INTEGER NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    output_tokens     INTEGER NOT NULL,
+    llm_calls         INTEGER NOT NULL,
+    seconds           REAL NOT NULL,
+    created_at        REAL NOT NULL
+)
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS task_runs_task ON task_runs (task, created_at)"
+
+
+class BudgetExceeded(Exception):
+    """Raised by enforce_budget() for a trip whose estimate is over a TA_BUDGET_* limit."""
+
+
+def trip_days(inputs: Dict[str, str]) -> Optional[int]:
+    """Days from StartDate to EndDate (both included), if both parse."""
+    dates = []
+    for name in ("StartDate", "EndDate"):
+        for fmt in DATE_FORMATS:
+            try:
+                dates.append(datetime.strptime(str(inputs.get(name, "")).strip(), fmt))
+                break
+            except ValueError:
+                continue
+    if len(dates) != 2:
+        return None
+    return max(1, (dates[1] - dates[0]).days + 1)
+
+
+def interpolate(text: str, inputs: Dict[str, str]) -> str:
+    """Fills {placeholders} the way crewai does, leaving unknown ones as they are."""
+    return _PLACEHOLDER_RE.sub(lambda m: str(inputs[m.group(1)]) if m.group(1) in inputs else m.group(0), text)
+
+
+@lru_cache(maxsize=None)
+def _config(name: str) -> Dict[str, Any]:
+    with open(os.path.join(CONFIG_DIR, name), "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def rendered_prompts(inputs: Dict[str, str]) -> Dict[str, str]:
+    """Each task's description, expected output and agent, rendered with inputs, in tasks.yaml order."""
+    agents, tasks = _config("agents.yaml"), _config("tasks.yaml")
+    prompts = {}
+    for name, spec in tasks.items():
+        agent = agents.get(spec.get("agent"), {})
+        parts = [str(agent.get(key, "")) for key in AGENT_FIELDS]
+        parts += [str(spec.get("description", "")), str(spec.get("expected_output", ""))]
+        prompts[name] = interpolate("\n".join(parts), inputs)
+    return prompts
+
+
+###############################################################################
+# History of finished tasks
+###############################################################################
+@dataclass
+class TaskRun:
+    rendered_tokens: int
+    prompt_tokens: int
+    completion_tokens: int
+    output_tokens: int
+    llm_calls: int
+    seconds: float
+    days: Optional[int]
+
+
+class TaskHistory:
+    """SQLite (WAL) log of what each finished task took."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or cache_path("task_history.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_INDEX)
+        self._conn.commit()
+        self.recorded = 0
+
+    def record(self, task: str, model: Optional[str], run: TaskRun) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO task_runs (task, model, days, rendered_tokens, prompt_tokens, completion_tokens, "
+                "output_tokens, llm_calls, seconds, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (task, model, run.days, run.rendered_tokens, run.prompt_tokens, run.completion_tokens,
+                 run.output_tokens, run.llm_calls, run.seconds, time.time()),
+            )
+            self._conn.commit()
+            self.recorded += 1
+
+    def recent(self, task: str, limit: int = HISTORY_RUNS) -> List[TaskRun]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rendered_tokens, prompt_tokens, completion_tokens, output_tokens, llm_calls, seconds, days "
+                "FROM task_runs WHERE task = ? ORDER BY created_at DESC LIMIT ?", (task, limit),
+            ).fetchall()
+        return [TaskRun(*row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT task, COUNT(*) FROM task_runs GROUP BY task").fetchall()
+        return {"recorded": self.recorded, "runs": dict(rows)}
+
+
+_default_history: Optional[TaskHistory] = None
+_default_history_lock = threading.Lock()
+
+
+def default_task_history() -> TaskHistory:
+    """The process-wide task history shared by every TA run."""
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = TaskHistory()
+        return _default_history
+
+
+@dataclass
+class _TaskUsage:
+    started: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = 0
+    model: Optional[str] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# The usage of the task running on this thread; map-reduce shards copy the context, so they add to it too.
+_usage: ContextVar[Optional[_TaskUsage]] = ContextVar("ta_task_usage", default=None)
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _task_started(source, event: TaskStartedEvent):
+    _usage.set(_TaskUsage(started=time.perf_counter()))
+
+
+@crewai_event_bus.on(LLMCallStartedEvent)
+def _llm_call_started(source, event: LLMCallStartedEvent):
+    usage = _usage.get()
+    if usage is not None:
+        tokens = count_tokens(prompt_text(event.messages))
+        with usage.lock:
+            usage.prompt_tokens += tokens
+            usage.llm_calls += 1
+            usage.model = usage.model or getattr(source, "model", None)
+
+
+@crewai_event_bus.on(LLMCallCompletedEvent)
+def _llm_call_completed(source, event: LLMCallCompletedEvent):
+    usage = _usage.get()
+    if usage is not None and isinstance(event.response, str):
+        tokens = count_tokens(event.response)
+        with usage.lock:
+            usage.completion_tokens += tokens
+
+
+@crewai_event_bus.on(TaskCompletedEvent)
+def _task_completed(source, event: TaskCompletedEvent):
+    usage, task = _usage.get(), event.task
+    _usage.set(None)
+    if usage is None or task is None or not task.name or event.output is None:
+        return
+    context = [t.output.raw for t in (task.context if isinstance(task.context, list) else [])
+               if t.output is not None]
+    agent = task.agent
+    rendered = "\n".join([str(getattr(agent, key, "") or "") for key in AGENT_FIELDS]
+                         + [task.description, task.expected_output] + context)
+    inputs = current_trip_inputs()
+    run = TaskRun(count_tokens(rendered), usage.prompt_tokens, usage.completion_tokens,
+                  count_tokens(event.output.raw), usage.llm_calls, time.perf_counter() - usage.started,
+                  trip_days(inputs) if inputs else None)
+    try:
+        default_task_history().record(task.name, usage.model, run)
+    except sqlite3.Error as e:
+        print(f"Could not record the run of {task.name}: {e}")
+
+
+@crewai_event_bus.on(TaskFailedEvent)
+def _task_failed(source, event: TaskFailedEvent):
+    _usage.set(None)
+
+
+###############################################################################
+# Estimate
+###############################################################################
+@dataclass
+class TaskEstimate:
+    task: str
+    model: str
+    rendered_tokens: int  # prompt, agent and predicted context
+    prompt_tokens: int
+    completion_tokens: int
+    output_tokens: int
+    seconds: float
+    cost: float
+    samples: int  # runs of the task in the history it is based on
+
+
+@dataclass
+class RunEstimate:
+    tasks: List[TaskEstimate]
+    days: Optional[int]
+
+    @property
+    def tokens(self) -> int:
+        return sum(t.prompt_tokens + t.completion_tokens for t in self.tasks)
+
+    @property
+    def cost(self) -> float:
+        return sum(t.cost for t in self.tasks)
+
+    @property
+    def seconds(self) -> float:
+        return sum(t.seconds for t in self.tasks)  # the crew is sequential
+
+    def over_budget(self) -> List[str]:
+        """The TA_BUDGET_* limits this estimate is over."""
+        reasons = []
+        if BUDGET_TOKENS and self.tokens > BUDGET_TOKENS:
+            reasons.append(f"{self.tokens:,} tokens > TA_BUDGET_TOKENS={BUDGET_TOKENS:,}")
+        if BUDGET_USD and self.cost > BUDGET_USD:
+            reasons.append(f"${self.cost:.3f} > TA_BUDGET_USD={BUDGET_USD}")
+        if BUDGET_SECONDS and self.seconds > BUDGET_SECONDS:
+            reasons.append(f"{self.seconds:.0f}s > TA_BUDGET_SECONDS={BUDGET_SECONDS}")
+        return reasons
+
+    def summary(self) -> str:
+        lines = [f"Estimate for a {self.days or '?'}-day trip: ~{self.tokens:,} tokens, ${self.cost:.3f}, "
+                 f"~{self.seconds / 60:.1f} min"]
+        for t in self.tasks:
+            lines.append(f"  {t.task:22s} {t.prompt_tokens:>9,} in {t.completion_tokens:>7,} out "
+                         f"{t.seconds:7.0f}s  ${t.cost:.4f}  {t.model} ({t.samples} past runs)")
+        return "\n".join(lines)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "days": self.days,
+            "tokens": self.tokens,
+            "cost_usd": round(self.cost, 4),
+            "minutes": round(self.seconds / 60, 1),
+            "tasks": {t.task: {"tokens": t.prompt_tokens + t.completion_tokens, "seconds": round(t.seconds),
+                               "samples": t.samples} for t in self.tasks},
+        }
+
+
+def _per_day(values: List[Tuple[int, Optional[int]]], days: Optional[int]) -> float:
+    """Median of values, scaled to days where the runs know theirs."""
+    scaled = [value / run_days for value, run_days in values if run_days]
+    if days and scaled:
+        return statistics.median(scaled) * days
+    return statistics.median(value for value, _ in values)
+
+
+def task_context(tasks: Sequence[Task]) -> Dict[str, Tuple[str, ...]]:
+    """Task name -> names of the tasks whose output it is given, as wired in the crew.
+
+    A task without a context list is given every task before it, as in crewai's sequential process.
+    """
+    context = {}
+    for index, task in enumerate(tasks):
+        upstream = task.context if isinstance(task.context, list) else (tasks[:index] if task.context else [])
+        context[task.name or ""] = tuple(t.name for t in upstream if t.name)
+    return context
+
+
+def estimate_run(inputs: Dict[str, str], model: str, tasks: Sequence[Task],
+                 history: Optional[TaskHistory] = None) -> RunEstimate:
+    """Predicts the tokens, cost and seconds of kicking off tasks (a crew's) with inputs on model."""
+    history = history or default_task_history()
+    context = task_context(tasks)
+    specs, routes = load_routing(MODELS_CONFIG)
+    days = trip_days(inputs)
+    estimates: Dict[str, TaskEstimate] = {}
+    for task, prompt in rendered_prompts(inputs).items():
+        route = routes.get(task, routes["default"])
+        task_model = route.models[0] if MODEL_ROUTING and route.models else model
+        rendered = count_tokens(prompt) + sum(estimates[name].output_tokens
+                                              for name in context.get(task, ()) if name in estimates)
+        runs = history.recent(task)
+        if runs:
+            factor = statistics.median(run.prompt_tokens / max(run.rendered_tokens, 1) for run in runs)
+            per_day = task in PER_DAY_TASKS
+            output = _per_day([(run.output_tokens, run.days if per_day else None) for run in runs], days)
+            completion = _per_day([(run.completion_tokens, run.days if per_day else None) for run in runs], days)
+            seconds_per_token = statistics.median(
+                run.seconds / max(run.prompt_tokens + run.completion_tokens, 1) for run in runs)
+        else:
+            factor = DEFAULT_PROMPT_FACTOR
+            output = completion = route.expected_output_tokens
+            seconds_per_token = 1.0 / DEFAULT_TOKENS_PER_SECOND
+        prompt_tokens = int(rendered * factor)
+        spec = specs.get(task_model)
+        cost = (prompt_tokens * spec.input_cost + completion * spec.output_cost) / 1e6 if spec else 0.0
+        estimates[task] = TaskEstimate(task, task_model, rendered, prompt_tokens, int(completion), int(output),
+                                       (prompt_tokens + completion) * seconds_per_token, cost, len(runs))
+    return RunEstimate(list(estimates.values()), days)
+
+
+def enforce_budget(estimate: RunEstimate) -> None:
+    """Raises BudgetExceeded if the estimate is over a TA_BUDGET_* limit."""
+    reasons = estimate.over_budget()
+    if reasons:
+        raise BudgetExceeded("Estimated run is over budget: " + "; ".join(reasons))
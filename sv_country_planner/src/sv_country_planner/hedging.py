@@ -0,0 +1,202 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Hedged streamed completions with failover (TA_HEDGE=1).                   #
+#                                                                             #
+#   A sequential TA run waits on every completion, so one Groq latency spike  #
+#   stalls the whole run. A hedged completion is streamed from the primary    #
+#   model; if its first token has not arrived after the TA_HEDGE_PERCENTILE   #
+#   percentile of that model's recent times to first token (TTFT), or the     #
+#   primary fails before it, the same request is sent to the secondary model  #
+#   (TA_HEDGE_MODEL, or the route's next model with router.py). The first to  #
+#   stream a token wins; the other's stream is closed once it answers. The    #
+#   winner's token usage goes to the agent's callbacks, as a plain streamed   #
+#   call's does. hedge_stats keeps the hedge rate and the p99 TTFT with       #
+#   hedging next to the primary's own.                                        #
+###############################################################################
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import litellm
+
+from sv_country_planner.rate_limit import limiter_for, parse_retry_after
+from sv_country_planner.settings import env_flag, env_float, env_int
+
+ENABLED = env_flag("TA_HEDGE", default=False)
+HEDGE_MODEL = os.getenv("TA_HEDGE_MODEL")
+PERCENTILE = env_float("TA_HEDGE_PERCENTILE", 95)
+MIN_SAMPLES = env_int("TA_HEDGE_MIN_SAMPLES", 10)
+DEFAULT_DELAY = env_float("TA_HEDGE_DELAY", 2.0)  # seconds, until a model has MIN_SAMPLES TTFTs
+MAX_SAMPLES = 500
+
+PRIMARY, SECONDARY = 0, 1
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class HedgeStats:
+    """TTFT history per model and the outcome of the hedged completions of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ttft: Dict[str, Deque[float]] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.secondary_wins = 0
+        self.delivered: Deque[float] = deque(maxlen=MAX_SAMPLES)  # TTFT the caller saw
+        self.primary: Deque[float] = deque(maxlen=MAX_SAMPLES)  # TTFT of the primary, won or not
+
+    def delay(self, model: str) -> float:
+        """How long to wait for the primary's first token before hedging."""
+        with self._lock:
+            samples = list(self._ttft.get(model, ()))
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_DELAY
+        return percentile(samples, PERCENTILE)
+
+    def record_primary(self, model: str, ttft: float) -> None:
+        """The primary's first token arrived after ttft seconds, whether its stream won or was cancelled."""
+        with self._lock:
+            self._ttft.setdefault(model, deque(maxlen=MAX_SAMPLES)).append(ttft)
+            self.primary.append(ttft)
+
+    def record(self, delivered_ttft: float, hedged: bool, failover: bool, secondary_won: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.hedged += hedged
+            self.failovers += failover
+            self.secondary_wins += secondary_won
+            self.delivered.append(delivered_ttft)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            delivered, primary = list(self.delivered), list(self.primary)
+            p99, p99_primary = percentile(delivered, 99), percentile(primary, 99)
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+                "failovers": self.failovers,
+                "secondary_wins": self.secondary_wins,
+                "ttft_p50_s": round(statistics.median(delivered), 2) if delivered else None,
+                "ttft_p99_s": round(p99, 2) if p99 is not None else None,
+                "primary_ttft_p99_s": round(p99_primary, 2) if p99_primary is not None else None,
+                "p99_saved_s": round(p99_primary - p99, 2) if delivered and primary else None,
+            }
+
+
+hedge_stats = HedgeStats()
+
+
+def _stream(llm, messages, index: int, cancel: threading.Event, events: "queue.Queue", started: float) -> None:
+    """Streams one attempt into events as (index, kind, value) until it ends, fails or is cancelled.
+
+    A cancelled attempt stops at its first chunk: a blocking completion cannot
+    be interrupted before it, and the primary's TTFT is recorded either way.
+    The "done" event carries the usage the provider reports in its last chunk.
+    """
+    params = llm._prepare_completion_params(messages)
+    params["stream"] = True
+    params["stream_options"] = {"include_usage": True}  # as LLM._handle_streaming_response asks
+    usage = None
+    try:
+        with limiter_for(llm.upstream).slot() as outcome:
+            try:
+                response = litellm.completion(**params)
+            except litellm.RateLimitError as e:
+                outcome["status"] = 429
+                headers = getattr(getattr(e, "response", None), "headers", None) or {}
+                outcome["retry_after"] = parse_retry_after(headers.get("retry-after"))
+                raise
+            try:
+                for position, chunk in enumerate(response):
+                    if position == 0 and index == PRIMARY:
+                        hedge_stats.record_primary(llm.model, time.perf_counter() - started)
+                    if cancel.is_set():
+                        break
+                    usage = getattr(chunk, "usage", None) or usage
+                    choices = getattr(chunk, "choices", None) or []
+                    text = getattr(getattr(choices[0], "delta", None), "content", None) if choices else None
+                    if text:
+                        events.put((index, "chunk", text))
+            finally:
+                close = getattr(getattr(response, "completion_stream", None), "close", None)
+                if close is not None:
+                    close()  # drops the loser's connection instead of reading it to the end
+        events.put((index, "done", usage))
+    except Exception as e:
+        events.put((index, "error", e))
+
+
+def hedged_stream(primary, secondary, messages, on_chunk: Callable[[str], None]) -> Tuple[str, Any, Any]:
+    """Streams messages from primary, hedged with secondary; returns (text, the LLM that answered, its usage).
+
+    on_chunk is called on this thread with each chunk of the winning stream.
+    """
+    started = time.perf_counter()
+    events: "queue.Queue[Tuple[int, str, Any]]" = queue.Queue()
+    llms = [primary, secondary]
+    cancels = [threading.Event(), threading.Event()]
+    running: List[int] = []
+    errors: Dict[int, Exception] = {}
+    hedged = failover = False
+
+    def start(index: int) -> None:
+        running.append(index)
+        threading.Thread(target=_stream, args=(llms[index], messages, index, cancels[index], events, started),
+                         name=f"ta-hedge-{index}", daemon=True).start()
+
+    start(PRIMARY)
+    deadline = started + hedge_stats.delay(primary.model)
+    winner: Optional[int] = None
+    first_token = 0.0
+    chunks: List[str] = []
+    while True:
+        timeout = None
+        if winner is None and SECONDARY not in running:
+            timeout = max(0.0, deadline - time.perf_counter())
+        try:
+            index, kind, value = events.get(timeout=timeout)
+        except queue.Empty:
+            hedged = True
+            start(SECONDARY)
+            continue
+        if winner is None:
+            if kind == "error":
+                errors[index] = value
+                if index == PRIMARY and SECONDARY not in running:
+                    failover = True
+                    start(SECONDARY)
+                if len(errors) == len(running):
+                    raise errors[PRIMARY]
+                continue
+            winner, first_token = index, time.perf_counter() - started
+            for other in running:
+                if other != winner:
+                    cancels[other].set()
+        if index != winner:
+            continue
+        if kind == "chunk":
+            chunks.append(value)
+            on_chunk(value)
+        elif kind == "error":
+            raise value
+        else:
+            usage = value
+            break
+    hedge_stats.record(first_token, hedged, failover, winner == SECONDARY)
+    return "".join(chunks), llms[winner], usage
@@ -0,0 +1,269 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   One pooled async HTTP client for the whole process.                       #
+#                                                                             #
+#   The Serper search, the section prefetch and the website page fetches all  #
+#   go through the same httpx.AsyncClient, so connections (and their TLS      #
+#   handshakes) are reused between them: HTTP/2 when the h2 package is        #
+#   installed, keep-alive otherwise, with a cap on connections per host.      #
+#                                                                             #
+#   The client runs on its own event loop in a background thread. The crew    #
+#   tools are synchronous, so they call request(); async code (prefetch)      #
+#   hands its coroutines to run().                                            #
+#                                                                             #
+#   Every request passes the adaptive limiter of its upstream (rate_limit.py) #
+#   and 429/503 answers are retried after the upstream's Retry-After.         #
+#   stream() hands a body over piece by piece as it arrives, up to a cap;     #
+#   the download waits while TA_HTTP_STREAM_BUFFER pieces are unread.         #
+###############################################################################
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+from sv_country_planner.rate_limit import THROTTLE_STATUSES, limiter_for, parse_retry_after
+from sv_country_planner.settings import env_flag, env_float, env_int
+
+try:
+    import h2  # noqa: F401  (only needed for HTTP/2)
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+T = TypeVar("T")
+
+class StreamedResponse:
+    """Status and headers of a streamed response; iterating it yields the body pieces."""
+
+    def __init__(self, status_code: int, headers: httpx.Headers, pieces: Iterator[bytes],
+                 on_close: Optional[Callable[[], Any]] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self._pieces = pieces
+        self._on_close = on_close
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._pieces
+
+    def close(self) -> None:
+        """Stops the download if the body is not needed (or not read to the end)."""
+        if self._on_close is not None:
+            self._on_close()
+
+
+class PooledHTTPClient:
+    """A shared httpx.AsyncClient with keep-alive, optional HTTP/2 and a per-host connection limit."""
+
+    def __init__(
+        self,
+        http2: Optional[bool] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        per_host_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.http2 = (env_flag("TA_HTTP2", default=True) if http2 is None else http2) and HAS_H2
+        self.max_connections = max_connections or env_int("TA_HTTP_MAX_CONNECTIONS", 64)
+        self.max_keepalive_connections = max_keepalive_connections or env_int("TA_HTTP_MAX_KEEPALIVE", 32)
+        self.keepalive_expiry = keepalive_expiry or env_float("TA_HTTP_KEEPALIVE_EXPIRY", 60.0)
+        self.per_host_limit = per_host_limit or env_int("TA_HTTP_PER_HOST", 8)
+        self.timeout = timeout or env_float("TA_HTTP_TIMEOUT", 20.0)
+        self.max_retries = env_int("TA_HTTP_MAX_RETRIES", 3)
+        self.stream_buffer = max(1, env_int("TA_HTTP_STREAM_BUFFER", 8))  # body pieces held for a slow reader
+
+        self._start_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+        self.requests = 0
+        self.tcp_connects = 0
+        self.tls_handshakes = 0
+        self.throttled = 0
+
+    # -- event loop --------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ta-http-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Runs a coroutine on the client's event loop and waits for its result (from any thread)."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The underlying AsyncClient. Only use it from coroutines running on the client's loop."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slot
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        # httpcore reports each new connection; reused connections report nothing.
+        if event_name == "connection.connect_tcp.started":
+            self.tcp_connects += 1
+        elif event_name == "connection.start_tls.started":
+            self.tls_handshakes += 1
+
+    # -- requests ----------------------------------------------------------
+    async def arequest(self, method: str, url: str, upstream: Optional[str] = None, **kwargs: Any) -> httpx.Response:
+        """Sends a request on the shared pool. Must be awaited on the client's loop (see run()).
+
+        upstream names the rate limiter to use ('serper', ...); by default each host has its own.
+        """
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions.setdefault("trace", self._trace)
+        limiter = limiter_for(upstream or f"web:{urlsplit(url).netloc.lower()}")
+        attempt = 0
+        while True:
+            async with limiter.aslot() as outcome:
+                async with self._host_slot(url):
+                    self.requests += 1
+                    response = await self.client.request(method, url, extensions=extensions, **kwargs)
+                    await response.aread()
+                if response.status_code in THROTTLE_STATUSES:
+                    self.throttled += 1
+                    outcome["status"] = response.status_code
+                    outcome["retry_after"] = parse_retry_after(response.headers.get("retry-after"))
+            if response.status_code not in THROTTLE_STATUSES or attempt >= self.max_retries:
+                return response
+            attempt += 1
+
+    def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Blocking version of arequest() for the synchronous crew tools."""
+        return self.run(self.arequest(method, url, **kwargs))
+
+    def stream(self, method: str, url: str, max_bytes: Optional[int] = None, upstream: Optional[str] = None,
+               **kwargs: Any) -> "StreamedResponse":
+        """Sends a request and returns as soon as the headers are in; iterate the result for the body.
+
+        The body arrives in pieces and stops after max_bytes; the download waits for the
+        reader rather than buffering more than stream_buffer pieces, so close() the
+        response if the body is not read to the end. Raises httpx.HTTPStatusError for
+        error statuses; throttled answers are not retried.
+        """
+        loop = self._ensure_loop()
+        pieces: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=self.stream_buffer)
+        done = object()
+
+        async def pump() -> None:
+            extensions = dict(kwargs.pop("extensions", None) or {})
+            extensions.setdefault("trace", self._trace)
+            limiter = limiter_for(upstream or f"web:{urlsplit(url).netloc.lower()}")
+            try:
+                async with limiter.aslot() as outcome, self._host_slot(url):
+                    self.requests += 1
+                    async with self.client.stream(method, url, extensions=extensions, **kwargs) as response:
+                        outcome["status"] = response.status_code
+                        if response.status_code in THROTTLE_STATUSES:
+                            self.throttled += 1
+                            outcome["retry_after"] = parse_retry_after(response.headers.get("retry-after"))
+                        if response.is_error:  # a 304 is not
+                            response.raise_for_status()
+                        await pieces.put(response)
+                        received = 0
+                        async for piece in response.aiter_bytes():
+                            if max_bytes is not None and received + len(piece) >= max_bytes:
+                                await pieces.put(piece[:max_bytes - received])
+                                break
+                            received += len(piece)
+                            await pieces.put(piece)  # waits while the reader is behind
+            except asyncio.CancelledError:
+                # close(): drop what was not read; a reader that goes on sees the end of the body.
+                while not pieces.empty():
+                    pieces.get_nowait()
+                pieces.put_nowait(done)
+                raise
+            except Exception as e:  # handed to the consumer
+                await pieces.put(e)
+            await pieces.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+
+        def take() -> Any:
+            return asyncio.run_coroutine_threadsafe(pieces.get(), loop).result()
+
+        def body() -> Iterator[bytes]:
+            try:
+                while True:
+                    piece = take()
+                    if piece is done:
+                        return
+                    if isinstance(piece, Exception):
+                        raise piece
+                    yield piece
+            finally:
+                future.cancel()  # the consumer stopped early: stop downloading
+
+        first = take()
+        if isinstance(first, Exception):
+            raise first
+        return StreamedResponse(first.status_code, first.headers, body(), on_close=future.cancel)
+
+    def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "tcp_connects": self.tcp_connects,
+            "tls_handshakes": self.tls_handshakes,
+            "connections_reused": max(self.requests - self.tcp_connects, 0),
+            "throttled": self.throttled,
+        }
+
+    def close(self) -> None:
+        if self._client is not None and self._loop is not None:
+            self.run(self._client.aclose())
+            self._client = None
+
+
+_shared_client: Optional[PooledHTTPClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def shared_http_client() -> PooledHTTPClient:
+    """The process-wide client used by the search tool, the website tool and the prefetcher."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = PooledHTTPClient()
+        return _shared_client
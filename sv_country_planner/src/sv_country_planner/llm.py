@@ -0,0 +1,257 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   The LLM used by the TA agents.                                            #
+#                                                                             #
+#   TravelLLM is crewai's LLM with the process-wide rate limiter of its       #
+#   provider in front of every completion: all TA runs in the process share   #
+#   one Groq quota, and a 429 pauses them together for the Retry-After the    #
+#   provider asked for before the call is retried.                            #
+#   With a cassette active (cassette.py) completions are recorded/replayed.   #
+#   With TA_LLM_CACHE=1 plain text completions at temperature 0 are kept in   #
+#   the completion cache (llm_cache.py) and replayed from it chunk by chunk,  #
+#   so stream listeners still fire.                                           #
+#   With TA_SEMANTIC_CACHE=1 an exact miss may still be answered with the     #
+#   completion of a near-identical prompt of another trip, see                #
+#   semantic_cache.py.                                                        #
+#   With TA_MODEL_ROUTING=1 each call goes to the model router.py picks for   #
+#   the task being executed, falling back to the next one if it fails.        #
+#   With TA_HEDGE=1 slow streamed completions are hedged, see hedging.py.     #
+###############################################################################
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import litellm
+from crewai import LLM
+from crewai.utilities.events import LLMCallCompletedEvent, LLMCallStartedEvent, LLMStreamChunkEvent
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+from crewai.utilities.events.llm_events import LLMCallType
+
+from sv_country_planner.cassette import through_cassette
+from sv_country_planner.hedging import ENABLED as HEDGING, HEDGE_MODEL, hedged_stream
+from sv_country_planner.llm_cache import (
+    COMPLETION_PARAMS, CachedCompletion, LLMCache, completion_key, completions_uncached, default_llm_cache,
+    deterministic,
+)
+from sv_country_planner.rate_limit import UPSTREAM_LIMITS, limiter_for, parse_retry_after
+from sv_country_planner.router import ENABLED as MODEL_ROUTING, current_scope, default_router
+from sv_country_planner.semantic_cache import (
+    ENABLED as SEMANTIC_CACHE, SemanticCache, current_trip_inputs, default_semantic_cache, prompt_scope,
+)
+from sv_country_planner.settings import env_flag, env_int
+from sv_country_planner.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Errors after which a routed call is retried on the route's next model.
+FALLBACK_ERRORS = (litellm.Timeout, litellm.APIConnectionError, litellm.ServiceUnavailableError,
+                   litellm.InternalServerError, litellm.RateLimitError)
+# Parameters that belong to one model's endpoint and are not carried over to the models it routes to.
+ENDPOINT_PARAMS = ("base_url", "api_base", "api_version")
+
+_recording = threading.local()
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _record_chunk(source, event: LLMStreamChunkEvent):
+    # Stream events are emitted on the thread that makes the call.
+    if getattr(_recording, "llm", None) is source and event.tool_call is None:
+        _recording.chunks.append(event.chunk)
+
+
+@contextmanager
+def recording_chunks(llm: LLM) -> Iterator[List[str]]:
+    """Collects the stream chunks llm emits on this thread inside the block."""
+    _recording.llm, _recording.chunks = llm, []
+    try:
+        yield _recording.chunks
+    finally:
+        _recording.llm = None
+
+
+def prompt_text(messages) -> str:
+    return messages if isinstance(messages, str) else "\n".join(
+        str(message.get("content") or "") for message in messages)
+
+
+def provider_of(model: str) -> str:
+    """'groq/gemma2-9b-it' -> 'groq'; models without a prefix are OpenAI's."""
+    return model.split("/", 1)[0].lower() if "/" in model else "openai"
+
+
+class TravelLLM(LLM):
+    """crewai LLM whose calls go through the completion cache and the shared rate limiter of the model's provider."""
+
+    def __init__(self, model: str, max_rate_limit_retries: Optional[int] = None,
+                 cache_completions: Optional[bool] = None, route_models: Optional[bool] = None,
+                 hedge: Optional["TravelLLM"] = None, **kwargs: Any):
+        super().__init__(model=model, **kwargs)
+        self.max_rate_limit_retries = (
+            env_int("TA_LLM_MAX_RETRIES", 3) if max_rate_limit_retries is None else max_rate_limit_retries
+        )
+        self.cache_completions = (
+            env_flag("TA_LLM_CACHE", default=False) if cache_completions is None else cache_completions
+        )
+        self.route_models = MODEL_ROUTING if route_models is None else route_models
+        self._routed: Dict[Tuple[str, Optional[float]], "TravelLLM"] = {}
+        self._routed_lock = threading.Lock()
+        if hedge is None and HEDGING and HEDGE_MODEL and HEDGE_MODEL != model:
+            hedge = TravelLLM(model=HEDGE_MODEL, max_rate_limit_retries=self.max_rate_limit_retries,
+                              cache_completions=False, route_models=False, stream=self.stream)
+        self.hedge = hedge  # the secondary of hedged completions
+
+    @property
+    def completion_cache(self) -> LLMCache:
+        return default_llm_cache()
+
+    @property
+    def semantic_cache(self) -> Optional[SemanticCache]:
+        return default_semantic_cache() if SEMANTIC_CACHE else None
+
+    def completion_params(self) -> dict:
+        """The parameters of this LLM that are part of the completion cache key."""
+        params = {name: getattr(self, name, None) for name in COMPLETION_PARAMS}
+        return {name: value for name, value in params.items() if value is not None}
+
+    @property
+    def upstream(self) -> str:
+        provider = provider_of(self.model)
+        return provider if provider in UPSTREAM_LIMITS else f"llm:{provider}"
+
+    def call(self, messages, *args: Any, **kwargs: Any):
+        request = {"model": self.model, "messages": messages, "tools": kwargs.get("tools")}
+        return through_cassette("llm", request, lambda: self._routed_call(messages, *args, **kwargs))
+
+    def _routed_call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if not self.route_models:
+            return self._cached_call(messages, tools, callbacks, available_functions)
+        router = default_router()
+        route = router.route_for(*current_scope())
+        error: Optional[Exception] = None
+        candidates = router.candidates(route, count_tokens(prompt_text(messages)))
+        if not candidates:  # a Route built in code with no models: this LLM's own model answers
+            return self._cached_call(messages, tools, callbacks, available_functions)
+        for index, model in enumerate(candidates):
+            # The next model in line is the hedge of this one (hedging.py).
+            following = candidates[index + 1:]
+            hedge = self.routed_llm(following[0], route.timeout) if HEDGING and following else None
+            try:
+                return self.routed_llm(model, route.timeout)._cached_call(messages, tools, callbacks,
+                                                                          available_functions, hedge=hedge)
+            except FALLBACK_ERRORS as e:
+                logger.warning("%s failed on route '%s', trying the next model: %s", model, route.name, e)
+                router.record_failure(model)
+                error = e
+        raise error
+
+    def routed_llm(self, model: str, timeout: Optional[float] = None) -> "TravelLLM":
+        """A TravelLLM for model with this LLM's parameters, made once per (model, timeout)."""
+        with self._routed_lock:
+            llm = self._routed.get((model, timeout))
+            if llm is None:
+                spec = default_router().models.get(model)
+                params = {name: value for name, value in self.completion_params().items()
+                          if name not in ENDPOINT_PARAMS}
+                llm = TravelLLM(model=model, max_rate_limit_retries=self.max_rate_limit_retries,
+                                cache_completions=self.cache_completions, route_models=False, stream=self.stream,
+                                timeout=timeout or self.timeout, base_url=spec.base_url if spec else None, **params)
+                self._routed[(model, timeout)] = llm
+        llm.stop = self.stop  # crewai sets the agent's stop words on the agent's LLM
+        return llm
+
+    def caches(self, tools=None, available_functions=None) -> bool:
+        """True if this call's completion may be answered from and kept in the caches."""
+        # Tool calls act on the world; only plain text completions are cached, and only unsampled ones.
+        return (self.cache_completions and not tools and not available_functions
+                and deterministic(self.temperature) and not completions_uncached())
+
+    def _cached_call(self, messages, tools=None, callbacks=None, available_functions=None, hedge=None):
+        hedge = hedge or self.hedge
+        if not self.caches(tools, available_functions):
+            return self._live_call(messages, tools, callbacks, available_functions, hedge)
+        key = completion_key(self.model, self.completion_params(), messages)
+        cached = self.completion_cache.get(key)
+        if cached is not None:
+            return self._replay(messages, callbacks, cached)
+        inputs = current_trip_inputs()
+        similar = self.semantic_cache if inputs else None  # without the trip's inputs no scope can be drawn
+        if similar is not None:
+            scope, masked = prompt_scope(self.model, self.completion_params(), messages, inputs)
+            cached = similar.get(scope, masked)
+            if cached is not None:
+                return self._replay(messages, callbacks, cached)
+        started = time.perf_counter()
+        with recording_chunks(self) as chunks:
+            response = self._live_call(messages, tools, callbacks, available_functions, hedge)
+        if isinstance(response, str) and response.strip():
+            prompt = prompt_text(messages)
+            completion = CachedCompletion(
+                response=response,
+                chunks=chunks if "".join(chunks) == response else [response],
+                prompt_tokens=count_tokens(prompt),
+                completion_tokens=count_tokens(response),
+                seconds=time.perf_counter() - started,
+            )
+            self.completion_cache.put(key, self.model, completion)
+            if similar is not None:
+                similar.put(scope, masked, completion)
+        return response
+
+    def _live_call(self, messages, tools, callbacks, available_functions, hedge):
+        if hedge is None or not self.stream or tools or available_functions:
+            return self._limited_call(messages, tools, callbacks, available_functions)
+        return self._hedged_call(messages, callbacks, hedge)
+
+    def _hedged_call(self, messages, callbacks, hedge: "TravelLLM") -> str:
+        """A streamed plain text completion, hedged with hedge, with the events a live call emits."""
+        if callbacks:
+            self.set_callbacks(callbacks)
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(messages=messages, tools=None, callbacks=callbacks,
+                                                              available_functions=None))
+        started = time.perf_counter()
+        response, answered_by, usage = hedged_stream(
+            self, hedge, messages, lambda chunk: crewai_event_bus.emit(self, event=LLMStreamChunkEvent(chunk=chunk))
+        )
+        self._handle_streaming_callbacks(callbacks, usage, None)  # e.g. the agent's TokenCalcHandler
+        if MODEL_ROUTING:
+            default_router().record(answered_by.model, time.perf_counter() - started,
+                                    count_tokens(prompt_text(messages)), count_tokens(response))
+        crewai_event_bus.emit(self, event=LLMCallCompletedEvent(response=response, call_type=LLMCallType.LLM_CALL))
+        return response
+
+    def _replay(self, messages, callbacks, cached: CachedCompletion) -> str:
+        """Answers from the cache with the events a live call emits."""
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(messages=messages, tools=None, callbacks=callbacks,
+                                                              available_functions=None))
+        if self.stream:
+            for chunk in cached.chunks:
+                crewai_event_bus.emit(self, event=LLMStreamChunkEvent(chunk=chunk))
+        crewai_event_bus.emit(self, event=LLMCallCompletedEvent(response=cached.response,
+                                                                call_type=LLMCallType.LLM_CALL))
+        return cached.response
+
+    def _limited_call(self, messages, *args: Any, **kwargs: Any):
+        limiter = limiter_for(self.upstream)
+        attempt = 0
+        while True:
+            with limiter.slot() as outcome:
+                try:
+                    started = time.perf_counter()
+                    response = super().call(messages, *args, **kwargs)
+                    if MODEL_ROUTING and isinstance(response, str):
+                        default_router().record(self.model, time.perf_counter() - started,
+                                                count_tokens(prompt_text(messages)), count_tokens(response))
+                    return response
+                except litellm.RateLimitError as e:
+                    outcome["status"] = 429
+                    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+                    outcome["retry_after"] = parse_retry_after(headers.get("retry-after"))
+                    if attempt >= self.max_rate_limit_retries:
+                        raise
+            attempt += 1
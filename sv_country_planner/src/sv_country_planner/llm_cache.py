@@ -0,0 +1,186 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Exact-match cache of LLM completions.                                     #
+#                                                                             #
+#   The agents send the same prompts again and again, e.g. a resubmitted      #
+#   form. With TA_LLM_CACHE=1 a completion is kept (SQLite in WAL mode) under #
+#   the hash of the model, its sampling parameters and the canonicalized      #
+#   messages, together with the pieces it was streamed in, so TravelLLM       #
+#   (llm.py) can replay it chunk by chunk. Only completions sampled at        #
+#   temperature 0 are kept: replaying a sampled answer would hide the         #
+#   variation the sampling asked for, which is what the iterations of `test`  #
+#   / `train` measure, so those run inside uncached_completions(). The tokens #
+#   and seconds a hit saved are estimated from the entry.                     #
+###############################################################################
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from sv_country_planner.settings import cache_path, env_int
+
+DEFAULT_TTL = env_int("TA_LLM_CACHE_TTL", 7 * 24 * 3600)
+
+# LLM attributes that change what a model answers.
+COMPLETION_PARAMS = ("temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+                     "presence_penalty", "frequency_penalty", "logit_bias", "response_format", "seed",
+                     "logprobs", "top_logprobs", "reasoning_effort", "base_url", "api_base", "api_version")
+
+_uncached: ContextVar[bool] = ContextVar("ta_uncached_completions", default=False)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key               TEXT PRIMARY KEY,
+    model             TEXT NOT NULL,
+    response          TEXT NOT NULL,
+    chunks            TEXT NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    seconds           REAL NOT NULL,
+    created_at        REAL NOT NULL,
+    expires_at        REAL NOT NULL
+)
+"""
+
+
+def canonical_messages(messages: Union[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """The parts of a message list that reach the model, with line endings and trailing spaces normalized."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    canonical = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            content = "\n".join(line.rstrip() for line in content.replace("\r\n", "\n").split("\n")).strip()
+        entry = {"role": message.get("role"), "content": content}
+        for field in ("name", "tool_call_id"):
+            if message.get(field) is not None:
+                entry[field] = message[field]
+        canonical.append(entry)
+    return canonical
+
+
+def completion_key(model: str, params: Dict[str, Any], messages: Union[str, List[Dict[str, Any]]]) -> str:
+    material = json.dumps([model, params, canonical_messages(messages)], sort_keys=True, default=str,
+                          separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def deterministic(temperature: Optional[float]) -> bool:
+    """True if completions sampled at temperature may be replayed (None is the provider's default, not 0)."""
+    return temperature == 0
+
+
+@contextmanager
+def uncached_completions() -> Iterator[None]:
+    """Sends every LLM call made inside the block to the model, e.g. the iterations of `test` / `train`."""
+    token = _uncached.set(True)
+    try:
+        yield
+    finally:
+        _uncached.reset(token)
+
+
+def completions_uncached() -> bool:
+    return _uncached.get()
+
+
+@dataclass
+class CachedCompletion:
+    response: str
+    chunks: List[str]
+    prompt_tokens: int
+    completion_tokens: int
+    seconds: float
+
+
+class LLMCache:
+    """SQLite (WAL) store of completions keyed by completion_key()."""
+
+    def __init__(self, path: Optional[str] = None, ttl: int = DEFAULT_TTL):
+        self.path = path or cache_path("llm_cache.sqlite3")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+        self.saved_seconds = 0.0
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, chunks, prompt_tokens, completion_tokens, seconds FROM completions "
+                "WHERE key = ? AND expires_at >= ?", (key, time.time()),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            completion = CachedCompletion(row[0], json.loads(row[1]), row[2], row[3], row[4])
+            self.hits += 1
+            self.saved_prompt_tokens += completion.prompt_tokens
+            self.saved_completion_tokens += completion.completion_tokens
+            self.saved_seconds += completion.seconds
+        return completion
+
+    def put(self, key: str, model: str, completion: CachedCompletion, ttl: Optional[int] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, response, chunks, prompt_tokens, "
+                "completion_tokens, seconds, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, completion.response, json.dumps(completion.chunks), completion.prompt_tokens,
+                 completion.completion_tokens, completion.seconds, now, now + (self.ttl if ttl is None else ttl)),
+            )
+            self._conn.commit()
+            self.writes += 1
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries and returns how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM completions WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_prompt_tokens": self.saved_prompt_tokens,
+                "saved_completion_tokens": self.saved_completion_tokens,
+                "saved_seconds": round(self.saved_seconds, 1),
+                "entries": entries,
+            }
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_llm_cache() -> LLMCache:
+    """The process-wide completion cache shared by every TA run."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
@@ -2,9 +2,11 @@
 import sys
 import warnings
 
-from datetime import datetime
-
-from sv_country_planner.crew import SvCountryPlanner
+from sv_country_planner.crew import TA
+from sv_country_planner.cassette import cassette_args, use_cassette
+from sv_country_planner.estimator import BudgetExceeded, enforce_budget, estimate_run
+from sv_country_planner.llm_cache import uncached_completions
+from sv_country_planner.trip_run import trip_run
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -12,32 +14,65 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 # crew locally, so refrain from adding unnecessary logic into this file.
 # Replace with inputs you want to test with, it will automatically
 # interpolate any tasks and agents information
+#
+# Every entry point accepts "--cassette PATH" (replay a recorded run offline)
+# and "--cassette PATH --record" (record this run), see cassette.py.
+# `run` prints the estimate of the crew it is about to kick off and refuses
+# runs over the TA_BUDGET_* limits unless given "--force", see estimator.py.
+# `run`, `train` and `test` plan the trip inside trip_run(), as the Streamlit
+# app does (with TA_PREFETCH / TA_SEED_SITES before the estimate). `train` and `test` never answer from
+# the completion cache: each iteration asks the model again, see llm_cache.py.
+
+def _inputs():
+    return {
+        'HomeCountry': 'USA',
+        'Country': 'Indonesia',
+        'StartDate': '10 December 2025',
+        'EndDate': '01 January 2026',
+        'PreferredActivity': 'Kayaking',
+    }
+
 
 def run():
     """
     Run the crew.
     """
-    inputs = {
-        'topic': 'AI LLMs',
-        'current_year': str(datetime.now().year)
-    }
-    
+    cassette, mode = cassette_args()
+    force = "--force" in sys.argv
+    if force:
+        sys.argv.remove("--force")
     try:
-        SvCountryPlanner().crew().kickoff(inputs=inputs)
+        with trip_run(_inputs(), TA.search_tool, TA.website_search_tool, cassette, mode):
+            crew = TA().crew()  # built in the trip's block, as the seed pages note is added to its tasks
+            trip = estimate_run(_inputs(), model=TA.llm.model, tasks=crew.tasks)
+            print(trip.summary())
+            if not force:
+                enforce_budget(trip)
+            crew.kickoff(inputs=_inputs())
+    except BudgetExceeded:
+        raise
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
 
 
+def estimate():
+    """
+    Print the token, cost and time estimate of running the crew.
+    """
+    trip = estimate_run(_inputs(), model=TA.llm.model, tasks=TA().crew().tasks)
+    print(trip.summary())
+    for reason in trip.over_budget():
+        print(f"Over budget: {reason}")
+
+
 def train():
     """
     Train the crew for a given number of iterations.
     """
-    inputs = {
-        "topic": "AI LLMs",
-        'current_year': str(datetime.now().year)
-    }
+    cassette, mode = cassette_args()
     try:
-        SvCountryPlanner().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        with trip_run(_inputs(), TA.search_tool, TA.website_search_tool, cassette, mode), uncached_completions():
+            TA().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=_inputs())
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
@@ -46,8 +81,10 @@ def replay():
     """
     Replay the crew execution from a specific task.
     """
+    cassette, mode = cassette_args()
     try:
-        SvCountryPlanner().crew().replay(task_id=sys.argv[1])
+        with use_cassette(cassette, mode):
+            TA().crew().replay(task_id=sys.argv[1])
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
@@ -56,13 +93,10 @@ def test():
     """
     Test the crew execution and returns the results.
     """
-    inputs = {
-        "topic": "AI LLMs",
-        "current_year": str(datetime.now().year)
-    }
-    
+    cassette, mode = cassette_args()
     try:
-        SvCountryPlanner().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
+        with trip_run(_inputs(), TA.search_tool, TA.website_search_tool, cassette, mode), uncached_completions():
+            TA().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=_inputs())
 
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
@@ -0,0 +1,176 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Map-reduce execution of a sectioned research task (TA_MAP_REDUCE=1).      #
+#                                                                             #
+#   country_research_task lists 35 <section> tags and one agent loop works    #
+#   through them one after the other, which makes it the critical path of     #
+#   every run. MapReduceAgent splits such a task's section list into shards   #
+#   of TA_MAP_REDUCE_SECTIONS sections. Each shard gets the task's own        #
+#   instructions with only its sections, and runs on a copy of the agent      #
+#   limited to TA_MAP_REDUCE_MAX_ITER steps, TA_MAP_REDUCE_WORKERS at a       #
+#   time. The shard reports are joined in section order and become the        #
+#   task's output (and its output_file) as if one loop had written them.      #
+#   A structured task (structured_output.py) gets the joined report parsed    #
+#   into its output model, without another LLM call. While the shards run,    #
+#   the ones finished so far are published for the DAG scheduler to start     #
+#   tasks that may work on partial research (scheduler.py).                   #
+###############################################################################
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence
+
+from crewai import Agent, Task
+
+from sv_country_planner.router import routing_scope
+from sv_country_planner.scheduler import partial_outputs
+from sv_country_planner.sections import section_name, split_title
+from sv_country_planner.settings import env_flag, env_int
+from sv_country_planner.structured_output import output_model, parse_markdown
+
+logger = logging.getLogger(__name__)
+
+ENABLED = env_flag("TA_MAP_REDUCE", default=False)
+WORKERS = env_int("TA_MAP_REDUCE_WORKERS", 4)
+SECTIONS_PER_SHARD = env_int("TA_MAP_REDUCE_SECTIONS", 5)
+SHARD_MAX_ITER = env_int("TA_MAP_REDUCE_MAX_ITER", 10)
+
+# Tasks whose sections are researched independently of each other.
+SHARDED_TASKS = ("country_research_task",)
+
+_SECTIONS_BLOCK_RE = re.compile(r"<sections>(.*?)</sections>", re.DOTALL)
+_SECTION_TAG_RE = re.compile(r"<(?:section|secondtion)>(.*?)</section>", re.DOTALL)
+_TITLE_RE = re.compile(r"\A\s*#\s+[^\n]*\n+")
+
+
+def shard_descriptions(description: str, per_shard: int = SECTIONS_PER_SHARD) -> List[Dict[str, Any]]:
+    """The task description once per shard of its <sections>, each keeping only that shard's sections.
+
+    Returns [{"description": ..., "sections": [names]}]; a description without
+    a <sections> block gives a single shard with the description unchanged.
+    """
+    block = _SECTIONS_BLOCK_RE.search(description)
+    tags = _SECTION_TAG_RE.findall(block.group(1)) if block else []
+    if not tags:
+        return [{"description": description, "sections": []}]
+    prefix, suffix = description[:block.start()], description[block.end():]
+    shards = []
+    for start in range(0, len(tags), max(1, per_shard)):
+        chunk = tags[start:start + per_shard]
+        sections = "\n".join(f"<section> {' '.join(tag.split())} </section>" for tag in chunk)
+        note = (f"These are sections {start + 1} to {start + len(chunk)} of {len(tags)}; the other sections are "
+                f"researched separately, so research and report only these.")
+        shards.append({
+            "description": f"{prefix}<sections>\n{sections}\n</sections>\n{note}\n{suffix}",
+            "sections": [section_name(split_title(tag)[0]) for tag in chunk],
+        })
+    return shards
+
+
+def merge_outputs(outputs: Sequence[str]) -> str:
+    """Joins shard reports in shard order, keeping only the first report's title."""
+    merged = []
+    for index, output in enumerate(outputs):
+        text = output.strip()
+        if index and text.startswith("# "):
+            text = _TITLE_RE.sub("", text, count=1)
+        merged.append(text)
+    return "\n\n".join(part for part in merged if part)
+
+
+class MapReduceStats:
+    """Counters of the map-reduce task runs of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.shards = 0
+        self.failed_shards = 0
+        self.failed_sections = 0
+        self.failures = deque(maxlen=10)  # the latest failed shards, with their error
+        self.seconds = 0.0
+        self.shard_seconds = 0.0
+
+    def add(self, shards: int, failed: int, seconds: float, shard_seconds: float) -> None:
+        with self._lock:
+            self.runs += 1
+            self.shards += shards
+            self.failed_shards += failed
+            self.seconds += seconds
+            self.shard_seconds += shard_seconds
+
+    def add_failure(self, shard: str, sections: Sequence[str], error: Exception) -> None:
+        with self._lock:
+            self.failed_sections += len(sections)
+            self.failures.append({"shard": shard, "error": f"{type(error).__name__}: {error}"})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "shards": self.shards,
+                "failed_shards": self.failed_shards,
+                "null_sections": self.failed_sections,
+                "recent_failures": list(self.failures),
+                "seconds": round(self.seconds, 1),
+                "serial_seconds": round(self.shard_seconds, 1),
+                "speedup": round(self.shard_seconds / self.seconds, 2) if self.seconds else 0.0,
+            }
+
+
+map_reduce_stats = MapReduceStats()
+
+
+class MapReduceAgent(Agent):
+    """Agent that runs the SHARDED_TASKS one shard of sections per agent copy, concurrently (TA_MAP_REDUCE=1)."""
+
+    def execute_task(self, task: Task, context: Optional[str] = None, tools: Optional[List[Any]] = None) -> str:
+        if not ENABLED or task.name not in SHARDED_TASKS:
+            return super().execute_task(task, context=context, tools=tools)
+        shards = shard_descriptions(task.description)
+        if len(shards) < 2:
+            return super().execute_task(task, context=context, tools=tools)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix="ta-shard") as pool:
+            # Each shard runs in a copy of the caller's context, so the trip inputs (semantic_cache.py) follow it.
+            futures = [pool.submit(contextvars.copy_context().run, self._run_shard, task, shard, context, tools)
+                       for shard in shards]
+            for finished, _ in enumerate(as_completed(futures), start=1):
+                # The finished shards, still in section order, for tasks that may start on them.
+                partial_outputs.publish(task, merge_outputs([future.result()[0] for future in futures
+                                                             if future.done()]), finished / len(futures))
+            results = [future.result() for future in futures]
+        partial_outputs.clear(task)
+        map_reduce_stats.add(len(shards), sum(failed for _, failed, _ in results),
+                             time.perf_counter() - started, sum(seconds for _, _, seconds in results))
+        merged = merge_outputs([output for output, _, _ in results])
+        model = output_model(task.name)
+        if model is not None and task.output_pydantic is model:
+            return parse_markdown(model, merged).model_dump_json()
+        return merged
+
+    def _run_shard(self, task: Task, shard: Dict[str, Any], context: Optional[str], tools: Optional[List[Any]]):
+        """(report, failed, seconds) of one shard; a failed shard reports its sections as NULL, as the task asks."""
+        started = time.perf_counter()
+        agent = self.copy()  # an agent's executor runs one task at a time
+        agent.max_iter = SHARD_MAX_ITER
+        subtask = Task(description=shard["description"], expected_output=task.expected_output, agent=agent,
+                       markdown=task.markdown, name=f"{task.name} ({', '.join(shard['sections'])})")
+        try:
+            with routing_scope(task.name, shard["sections"]):
+                output = agent.execute_task(subtask, context=context, tools=tools)
+            failed = 0
+        except Exception as e:
+            logger.warning("Shard %s failed, its sections are reported as NULL: %s", subtask.name, e)
+            map_reduce_stats.add_failure(subtask.name, shard["sections"], e)
+            output = "\n\n".join(f"## {name}\n\nNULL" for name in shard["sections"])
+            failed = 1
+        return output, failed, time.perf_counter() - started
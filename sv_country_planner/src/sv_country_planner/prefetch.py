@@ -0,0 +1,128 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Up-front prefetch of the section searches.                                #
+#                                                                             #
+#   country_research_task lists its sections in tasks.yaml; the agent finds   #
+#   them one ReAct step at a time, so each search waits behind an LLM call.   #
+#   Before kickoff we turn every section into a search query and send them    #
+#   all at once on the shared HTTP client (see http_client.py), bounded by a  #
+#   semaphore. The results land in the search cache, so the agent's searches  #
+#   for those sections return immediately.                                    #
+#   Opt-in (TA_PREFETCH=1): it costs one Serper query per section, whether    #
+#   or not the agents ask it.                                                 #
+###############################################################################
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from sv_country_planner.cassette import replaying
+from sv_country_planner.http_client import shared_http_client
+from sv_country_planner.sections import Section, load_sections
+from sv_country_planner.tools.travel_tools import TravelSearchTool
+
+
+COUNTRY_TASK = "country_research_task"
+CITY_TASK = "city_researcher_task"
+DEFAULT_CONCURRENCY = 8
+
+logger = logging.getLogger(__name__)
+
+
+def _month_span(inputs: Dict[str, str]) -> str:
+    """'10 December 2025'..'01 January 2026' -> 'December 2025 January 2026'."""
+    months: List[str] = []
+    for key in ("StartDate", "EndDate"):
+        value = inputs.get(key)
+        if not value:
+            continue
+        try:
+            month = datetime.strptime(value, "%d %B %Y").strftime("%B %Y")
+        except ValueError:
+            month = value
+        if month not in months:
+            months.append(month)
+    return " ".join(months)
+
+
+def section_query(section: Section, inputs: Dict[str, str]) -> str:
+    """Turns one <section> into a search query, e.g. 'Weather Indonesia December 2025 January 2026'."""
+    parts = [section.name, inputs.get("Country", "")]
+    if "HomeCountry" in section.placeholders and inputs.get("HomeCountry"):
+        parts.append(f"for {inputs['HomeCountry']} citizens")
+    if "StartDate" in section.placeholders or "EndDate" in section.placeholders:
+        parts.append(_month_span(inputs))
+    return " ".join(part for part in parts if part)
+
+
+def section_queries(inputs: Dict[str, str]) -> List[Tuple[Section, str, str]]:
+    """(section, query, topic) for every section of the country research task."""
+    return [(s, section_query(s, inputs), inputs.get("Country", "")) for s in load_sections(COUNTRY_TASK)]
+
+
+async def _fetch_all(tool: TravelSearchTool, pending: List[Tuple[Section, str, str]], headers: Dict[str, str],
+                     concurrency: int) -> Dict[str, int]:
+    stats = {"fetched": 0, "failed": 0}
+    search_type = tool.search_type
+    params = tool.cache_params(search_type)
+    url = tool._get_search_url(search_type)
+    semaphore = asyncio.Semaphore(concurrency)
+    http = shared_http_client()
+
+    async def fetch(section: Section, query: str, topic: str) -> None:
+        async with semaphore:
+            try:
+                response = await http.arequest(
+                    "POST", url, headers=headers, json=tool.search_payload(query), timeout=10, upstream="serper"
+                )
+                response.raise_for_status()
+                result = tool.format_results(query, search_type, response.json())
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning("Prefetch failed for '%s': %s", query, e)
+                stats["failed"] += 1
+                return
+        tool.cache.put(query, result, section=section.name, topic=topic, prefetched=True, **params)
+        stats["fetched"] += 1
+
+    await asyncio.gather(*(fetch(*item) for item in pending))
+    return stats
+
+
+def prefetch_sections(inputs: Dict[str, str], tool: TravelSearchTool,
+                      concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """Runs every section search of the trip concurrently and stores the results in the tool's cache.
+
+    Call this before crew().kickoff(inputs=...). Sections that are already cached
+    are not searched again, only marked as prefetched for this run. Without a
+    SERPER_API_KEY only those are.
+    """
+    if replaying():
+        return {"queries": 0, "skipped": "replaying a cassette"}
+    started = time.perf_counter()
+    params = tool.cache_params(tool.search_type)
+    queries = section_queries(inputs)
+    pending = []
+    for section, query, topic in queries:
+        if tool.cache.contains(query, **params):
+            tool.cache.arm_prefetched(query, section.name, topic, **params)
+        else:
+            pending.append((section, query, topic))
+
+    stats = {"queries": len(queries), "already_cached": len(queries) - len(pending), "fetched": 0, "failed": 0}
+    if pending:
+        try:
+            headers = tool.search_headers()
+        except KeyError as e:
+            logger.warning("Skipping the prefetch of %d searches: %s is not set", len(pending), e.args[0])
+            stats["skipped"] = f"{e.args[0]} is not set"
+        else:
+            stats.update(shared_http_client().run(_fetch_all(tool, pending, headers, concurrency)))
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
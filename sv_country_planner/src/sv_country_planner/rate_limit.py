@@ -0,0 +1,210 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Adaptive rate limiting for the upstreams every TA run shares.             #
+#                                                                             #
+#   One AdaptiveLimiter per upstream (Groq, Serper, each website host) is     #
+#   shared by all TA runs in the process:                                     #
+#     - a token bucket keeps the request rate under the quota,                #
+#     - an AIMD limit caps the requests in flight: it grows by one per        #
+#       "round" of successes and halves on a 429/503,                         #
+#     - a Retry-After from the upstream pauses everyone for that long,        #
+#       instead of every caller retrying on its own.                          #
+#   A rate of 0 (e.g. TA_SERPER_QPS=0) means no rate limit.                   #
+###############################################################################
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from sv_country_planner.settings import env_float, env_int
+
+
+THROTTLE_STATUSES = (429, 503)
+
+# upstream -> (requests per second or 0 for no limit, burst, max concurrency). "web" is the template for each
+# website host.
+UPSTREAM_LIMITS: Dict[str, Tuple[float, int, int]] = {
+    "groq":   (env_float("TA_GROQ_RPM", 30) / 60.0, env_int("TA_GROQ_BURST", 3), env_int("TA_GROQ_CONCURRENCY", 4)),
+    "serper": (env_float("TA_SERPER_QPS", 5), env_int("TA_SERPER_BURST", 10), env_int("TA_SERPER_CONCURRENCY", 8)),
+    "web":    (env_float("TA_WEB_HOST_QPS", 2), env_int("TA_WEB_HOST_BURST", 4), env_int("TA_WEB_HOST_CONCURRENCY", 4)),
+    "llm":    (env_float("TA_LLM_RPM", 60) / 60.0, 5, 4),
+}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (either seconds or an HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """Token bucket + AIMD concurrency limit for one upstream. Thread-safe; usable from sync and async code."""
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self.in_flight = 0
+
+        # metrics
+        self.queued = 0
+        self.max_queued = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    # -- core --------------------------------------------------------------
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _try_acquire(self) -> float:
+        """Takes a slot and returns 0, or returns how long to wait before trying again. Call with the lock held."""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.limit):
+            return 0.05
+        if self.max_rate > 0 and self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate
+        self._tokens -= 1.0
+        self.in_flight += 1
+        self.acquired += 1
+        return 0.0
+
+    def _enter_queue(self) -> float:
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        return time.monotonic()
+
+    def _leave_queue(self, entered: float) -> None:
+        self.queued -= 1
+        self.total_wait += time.monotonic() - entered
+
+    def acquire(self) -> None:
+        """Blocks until a request may be sent."""
+        with self._cond:
+            entered = self._enter_queue()
+            try:
+                while True:
+                    wait = self._try_acquire()
+                    if wait == 0.0:
+                        return
+                    self._cond.wait(wait)
+            finally:
+                self._leave_queue(entered)
+
+    async def aacquire(self) -> None:
+        """Async version of acquire(); waits without blocking the event loop."""
+        with self._cond:
+            entered = self._enter_queue()
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire()
+                if wait == 0.0:
+                    return
+                await asyncio.sleep(min(wait, 0.25))
+        finally:
+            with self._cond:
+                self._leave_queue(entered)
+
+    def release(self, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        """Returns the slot and feeds the outcome back: a 429/503 shrinks the limits, a success grows them."""
+        with self._cond:
+            self.in_flight -= 1
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.rate = max(self.max_rate / 10, self.rate * 0.7)
+                self._tokens = min(self._tokens, 0.0)
+                pause = retry_after if retry_after is not None else 1.0 / self.rate if self.rate > 0 else 1.0
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """with limiter.slot() as outcome: ...; outcome['status'] = 429 to report a throttle."""
+        self.acquire()
+        outcome: Dict[str, Optional[float]] = {"status": None, "retry_after": None}
+        try:
+            yield outcome
+        finally:
+            self.release(outcome["status"], outcome["retry_after"])
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        outcome: Dict[str, Optional[float]] = {"status": None, "retry_after": None}
+        try:
+            yield outcome
+        finally:
+            self.release(outcome["status"], outcome["retry_after"])
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "rate_per_s": round(self.rate, 3),
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "avg_wait_s": round(self.total_wait / self.acquired, 3) if self.acquired else 0.0,
+                "paused_for_s": round(max(self._paused_until - time.monotonic(), 0.0), 2),
+            }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(upstream: str) -> AdaptiveLimiter:
+    """The process-wide limiter of an upstream: 'groq', 'serper' or 'web:<host>'."""
+    with _limiters_lock:
+        limiter = _limiters.get(upstream)
+        if limiter is None:
+            template = UPSTREAM_LIMITS.get(upstream.split(":", 1)[0], UPSTREAM_LIMITS["web"])
+            limiter = _limiters[upstream] = AdaptiveLimiter(upstream, *template)
+        return limiter
+
+
+def set_limits(upstream: str, rate: float, burst: int, max_concurrency: int) -> AdaptiveLimiter:
+    """Replaces the limiter of an upstream, e.g. to match a paid quota or for a benchmark."""
+    with _limiters_lock:
+        limiter = _limiters[upstream] = AdaptiveLimiter(upstream, rate, burst, max_concurrency)
+        return limiter
+
+
+def limiter_stats() -> Dict[str, Dict[str, float]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,248 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Latency- and cost-aware model routing (TA_MODEL_ROUTING=1).               #
+#                                                                             #
+#   config/models.yaml lists the models and, per task or section, the ones    #
+#   acceptable for it in order of preference. The task being executed on a    #
+#   thread is known from crewai's task events (map_reduce.py adds the         #
+#   sections of a shard), and TravelLLM (llm.py) asks the router which        #
+#   model to call for it. Every live completion is timed: the router keeps    #
+#   the latency and token throughput of each model over the last              #
+#   TA_ROUTER_WINDOW seconds and passes over a model whose p95 latency or     #
+#   median throughput is out of the route's bounds, that failed recently,     #
+#   or that would make the call cost more than the route allows. When every   #
+#   model is out of bounds the fastest one is tried first.                    #
+###############################################################################
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import yaml
+from crewai.utilities.events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+
+from sv_country_planner.settings import env_flag, env_int
+
+ENABLED = env_flag("TA_MODEL_ROUTING", default=False)
+MODELS_CONFIG = os.getenv("TA_MODELS_CONFIG", os.path.join(os.path.dirname(__file__), "config", "models.yaml"))
+WINDOW_SECONDS = env_int("TA_ROUTER_WINDOW", 600)
+MIN_SAMPLES = env_int("TA_ROUTER_MIN_SAMPLES", 5)
+COOLDOWN_SECONDS = env_int("TA_ROUTER_COOLDOWN", 60)
+MAX_SAMPLES = 200
+
+DEFAULT_ROUTE = "default"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    input_cost: float = 0.0  # USD per million prompt tokens
+    output_cost: float = 0.0  # USD per million completion tokens
+    base_url: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    models: Tuple[str, ...]
+    max_p95_seconds: Optional[float] = None
+    min_tokens_per_second: Optional[float] = None
+    max_cost_per_call: Optional[float] = None
+    expected_output_tokens: int = 1000
+    timeout: Optional[float] = None
+
+
+def load_routing(path: str = MODELS_CONFIG) -> Tuple[Dict[str, ModelSpec], Dict[str, Route]]:
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    models = {name: ModelSpec(name=name, **(spec or {})) for name, spec in (config.get("models") or {}).items()}
+    routes = {}
+    for name, spec in (config.get("routes") or {}).items():
+        spec = dict(spec or {})
+        if not spec.get("models"):
+            raise ValueError(f"Route '{name}' in {path} lists no models")
+        unknown = [model for model in spec["models"] if model not in models]
+        if unknown:
+            raise ValueError(f"Route '{name}' in {path} uses models missing from 'models': {unknown}")
+        routes[name] = Route(name=name, models=tuple(spec.pop("models", ())), **spec)
+    if DEFAULT_ROUTE not in routes:
+        raise ValueError(f"{path} has no '{DEFAULT_ROUTE}' route")
+    return models, routes
+
+
+# (task name, section names) of the work on this thread, see routing_scope().
+_scope: ContextVar[Tuple[Optional[str], Tuple[str, ...]]] = ContextVar("ta_route_scope", default=(None, ()))
+
+
+@contextmanager
+def routing_scope(task: Optional[str], sections: Sequence[str] = ()) -> Iterator[None]:
+    """Routes the LLM calls made inside the block for this task (and these sections)."""
+    token = _scope.set((task, tuple(sections)))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> Tuple[Optional[str], Tuple[str, ...]]:
+    return _scope.get()
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _task_started(source, event: TaskStartedEvent):
+    # Task events are emitted on the thread that executes the task, async tasks included.
+    _scope.set((getattr(event.task, "name", None), ()))
+
+
+@crewai_event_bus.on(TaskCompletedEvent)
+@crewai_event_bus.on(TaskFailedEvent)
+def _task_finished(source, event):
+    _scope.set((None, ()))
+
+
+class ModelLatency:
+    """Recent (time, seconds, prompt tokens, completion tokens) samples and failures of one model."""
+
+    def __init__(self):
+        self.samples: Deque[Tuple[float, float, int, int]] = deque(maxlen=MAX_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.failed_at = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def recent(self, now: float) -> List[Tuple[float, float, int, int]]:
+        return [sample for sample in self.samples if now - sample[0] <= WINDOW_SECONDS]
+
+    def summary(self, now: float) -> Dict[str, Optional[float]]:
+        recent = self.recent(now)
+        if len(recent) < MIN_SAMPLES:
+            return {"samples": len(recent), "p50": None, "p95": None, "tokens_per_second": None}
+        seconds = sorted(sample[1] for sample in recent)
+        return {
+            "samples": len(recent),
+            "p50": statistics.median(seconds),
+            "p95": seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))],
+            "tokens_per_second": statistics.median(sample[3] / max(sample[1], 1e-3) for sample in recent),
+        }
+
+    def mean_completion_tokens(self, now: float) -> Optional[float]:
+        recent = self.recent(now)
+        return statistics.mean(sample[3] for sample in recent) if recent else None
+
+
+class ModelRouter:
+    """Chooses the model of each LLM call from the routes and the observed latency of the models."""
+
+    def __init__(self, models: Dict[str, ModelSpec], routes: Dict[str, Route]):
+        self.models = models
+        self.routes = routes
+        self._lock = threading.Lock()
+        self._latency: Dict[str, ModelLatency] = {}
+        self.decisions: Dict[str, Dict[str, int]] = {}
+        self.fallbacks = 0
+
+    def route_for(self, task: Optional[str] = None, sections: Sequence[str] = ()) -> Route:
+        """The route of a shard's sections if they all share one, else the task's, else the default."""
+        if sections and all(name in self.routes for name in sections):
+            if len({replace(self.routes[name], name="") for name in sections}) == 1:
+                return self.routes[sections[0]]
+        return self.routes.get(task or "", self.routes[DEFAULT_ROUTE])
+
+    def _stats(self, model: str) -> ModelLatency:
+        return self._latency.setdefault(model, ModelLatency())
+
+    def estimated_cost(self, model: str, prompt_tokens: int, route: Route, now: Optional[float] = None) -> float:
+        spec = self.models[model]
+        completion = self._stats(model).mean_completion_tokens(now or time.time()) or route.expected_output_tokens
+        return (prompt_tokens * spec.input_cost + completion * spec.output_cost) / 1e6
+
+    def _out_of_bounds(self, model: str, route: Route, prompt_tokens: int, now: float) -> Optional[str]:
+        latency = self._stats(model)
+        if now - latency.failed_at < COOLDOWN_SECONDS:
+            return "failed"
+        summary = latency.summary(now)
+        if route.max_p95_seconds and summary["p95"] is not None and summary["p95"] > route.max_p95_seconds:
+            return "slow"
+        if (route.min_tokens_per_second and summary["tokens_per_second"] is not None
+                and summary["tokens_per_second"] < route.min_tokens_per_second):
+            return "slow"
+        if route.max_cost_per_call and self.estimated_cost(model, prompt_tokens, route, now) > route.max_cost_per_call:
+            return "cost"
+        return None
+
+    def candidates(self, route: Route, prompt_tokens: int = 0) -> List[str]:
+        """The route's models in the order to try them: those within bounds first, by preference."""
+        now = time.time()
+        with self._lock:
+            within, outside = [], []
+            for model in route.models:
+                reason = self._out_of_bounds(model, route, prompt_tokens, now)
+                if reason is None:
+                    within.append(model)
+                else:
+                    p50 = self._stats(model).summary(now)["p50"]
+                    outside.append((reason == "failed", p50 or 0.0, model))
+            ordered = within + [model for _, _, model in sorted(outside)]
+            if ordered:
+                counts = self.decisions.setdefault(route.name, {})
+                counts[ordered[0]] = counts.get(ordered[0], 0) + 1
+        return ordered
+
+    def record(self, model: str, seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            latency = self._stats(model)
+            latency.samples.append((time.time(), seconds, prompt_tokens, completion_tokens))
+            latency.calls += 1
+            latency.prompt_tokens += prompt_tokens
+            latency.completion_tokens += completion_tokens
+
+    def record_failure(self, model: str) -> None:
+        with self._lock:
+            latency = self._stats(model)
+            latency.failures += 1
+            latency.failed_at = time.time()
+            self.fallbacks += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            models = {}
+            for model, latency in self._latency.items():
+                summary = latency.summary(now)
+                spec = self.models.get(model)
+                cost = ((latency.prompt_tokens * spec.input_cost + latency.completion_tokens * spec.output_cost) / 1e6
+                        if spec else 0.0)
+                models[model] = {
+                    "calls": latency.calls,
+                    "failures": latency.failures,
+                    "p50_s": round(summary["p50"], 2) if summary["p50"] is not None else None,
+                    "p95_s": round(summary["p95"], 2) if summary["p95"] is not None else None,
+                    "tokens_per_s": round(summary["tokens_per_second"]) if summary["tokens_per_second"] else None,
+                    "cost_usd": round(cost, 4),
+                }
+            return {"routes": {name: dict(counts) for name, counts in self.decisions.items()},
+                    "fallbacks": self.fallbacks, "models": models}
+
+
+_default_router: Optional[ModelRouter] = None
+_default_router_lock = threading.Lock()
+
+
+def default_router() -> ModelRouter:
+    """The process-wide router, built from MODELS_CONFIG."""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter(*load_routing())
+        return _default_router
@@ -0,0 +1,237 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   DAG scheduling of the crew's tasks (TA_DAG_SCHEDULER=1).                  #
+#                                                                             #
+#   The context=[...] lists of crew.py describe which tasks a task needs (a   #
+#   task without one needs all the tasks before it, as in crewai's            #
+#   sequential process). DagScheduler starts every task as soon as those are  #
+#   complete, TA_DAG_WORKERS at a time, instead of one after the other.       #
+#   A task may declare in PARTIAL_CONTEXT that it can start on part of a      #
+#   context task's output: map_reduce.py publishes the shards finished so     #
+#   far, and once TA_DAG_PARTIAL_FRACTION of them are in, the task starts     #
+#   with those. Each run reports its critical path and how long every task    #
+#   waited for its inputs and, once ready, for a free worker.                 #
+###############################################################################
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+
+from sv_country_planner.settings import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+ENABLED = env_flag("TA_DAG_SCHEDULER", default=False)
+WORKERS = env_int("TA_DAG_WORKERS", 2)
+PARTIAL_FRACTION = env_float("TA_DAG_PARTIAL_FRACTION", 0.5)
+POLL_SECONDS = 0.1
+
+# Context tasks whose partial output is enough for a task to start: the planner
+# works from the research's itinerary sections, not from all of it.
+PARTIAL_CONTEXT: Dict[str, Tuple[str, ...]] = {
+    "country_planner_task": ("country_research_task",),
+}
+
+
+class PartialOutputs:
+    """The output published so far by tasks that are still running, with the fraction of it that is done."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._partial: Dict[str, Tuple[str, float]] = {}
+
+    def publish(self, task: Task, text: str, fraction: float) -> None:
+        with self._lock:
+            self._partial[str(task.id)] = (text, fraction)
+
+    def clear(self, task: Task) -> None:
+        with self._lock:
+            self._partial.pop(str(task.id), None)
+
+    def fraction(self, task: Task) -> float:
+        with self._lock:
+            return self._partial.get(str(task.id), ("", 0.0))[1]
+
+    def output(self, task: Task) -> Optional[TaskOutput]:
+        """The partial output of task as a TaskOutput, if it published any."""
+        with self._lock:
+            partial = self._partial.get(str(task.id))
+        if partial is None:
+            return None
+        return TaskOutput(name=task.name, description=task.description, expected_output=task.expected_output,
+                          raw=partial[0], agent=getattr(task.agent, "role", ""))
+
+
+partial_outputs = PartialOutputs()
+
+
+def dependencies(tasks: List[Task]) -> Dict[int, List[int]]:
+    """Index of each task -> indexes of the tasks it needs."""
+    position = {id(task): index for index, task in enumerate(tasks)}
+    needs = {}
+    for index, task in enumerate(tasks):
+        if isinstance(task.context, list):
+            needs[index] = sorted({position[id(t)] for t in task.context if id(t) in position})
+        elif task.context:  # NOT_SPECIFIED: the outputs of every task before it
+            needs[index] = list(range(index))
+        else:
+            needs[index] = []
+    return needs
+
+
+@dataclass
+class TaskTiming:
+    name: str
+    ready: Optional[float] = None  # seconds after the start of the run its context was complete
+    started: float = 0.0
+    finished: float = 0.0
+    partial: bool = False  # started on the partial output of a context task
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+
+def critical_path(timings: List[TaskTiming], needs: Dict[int, List[int]]) -> List[int]:
+    """The chain of tasks that determined when the run finished, first task first."""
+    if not timings:
+        return []
+    path = [max(range(len(timings)), key=lambda index: timings[index].finished)]
+    while True:
+        started = timings[path[-1]].started
+        # The dependency that finished last before this task started held it back.
+        before = [dep for dep in needs[path[-1]] if timings[dep].finished <= started + 1e-6]
+        if not before:
+            break
+        path.append(max(before, key=lambda dep: timings[dep].finished))
+    return path[::-1]
+
+
+class DagStats:
+    """The report of the last DAG-scheduled run, and counters over all of them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.partial_starts = 0
+        self.seconds = 0.0
+        self.serial_seconds = 0.0
+        self.last: Dict[str, Any] = {}
+
+    def add(self, timings: List[TaskTiming], needs: Dict[int, List[int]], seconds: float) -> Dict[str, Any]:
+        path = critical_path(timings, needs)
+        report = {
+            "seconds": round(seconds, 1),
+            "serial_seconds": round(sum(t.seconds for t in timings), 1),
+            "critical_path": [timings[index].name for index in path],
+            "critical_path_seconds": round(sum(timings[index].seconds for index in path), 1),
+            "tasks": {t.name: {"seconds": round(t.seconds, 1), "waited_for_inputs_s": round(t.ready, 1),
+                               "idle_s": round(t.started - t.ready, 1), "partial_start": t.partial}
+                      for t in timings},
+        }
+        with self._lock:
+            self.runs += 1
+            self.partial_starts += sum(t.partial for t in timings)
+            self.seconds += seconds
+            self.serial_seconds += report["serial_seconds"]
+            self.last = report
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "partial_starts": self.partial_starts,
+                "speedup": round(self.serial_seconds / self.seconds, 2) if self.seconds else 0.0,
+                "last_run": self.last,
+            }
+
+
+dag_stats = DagStats()
+
+
+class DagScheduler:
+    """Runs a crew's tasks in dependency order, each as soon as its context is ready.
+
+    Uses the crew's own steps (agent, tools, context, execution log), so a
+    task runs as it would in the sequential process.
+    """
+
+    def __init__(self, crew, workers: int = WORKERS, partial_fraction: float = PARTIAL_FRACTION):
+        self.crew = crew
+        self.tasks: List[Task] = list(crew.tasks)
+        self.needs = dependencies(self.tasks)
+        self.workers = max(1, workers)
+        self.partial_fraction = partial_fraction
+
+    def _ready(self, index: int, done: Dict[int, TaskOutput]) -> Tuple[bool, bool]:
+        """(whether task index can start, whether it starts on a partial output)."""
+        allowed = PARTIAL_CONTEXT.get(self.tasks[index].name or "", ())
+        partial = False
+        for dep in self.needs[index]:
+            if dep in done:
+                continue
+            upstream = self.tasks[dep]
+            if upstream.name in allowed and partial_outputs.fraction(upstream) >= self.partial_fraction:
+                partial = True
+                continue
+            return False, False
+        return True, partial
+
+    def _start(self, pool: ThreadPoolExecutor, index: int, done: Dict[int, TaskOutput]) -> Future:
+        crew, task = self.crew, self.tasks[index]
+        agent = crew._get_agent_to_use(task)
+        if agent is None:
+            raise ValueError(f"No agent available for task: {task.description}.")
+        tools = crew._prepare_tools(agent, task, task.tools or agent.tools or [])
+        crew._log_task_start(task, agent.role)
+        context = crew._get_context(task, [done[i] for i in sorted(done)])
+        # A copy of the caller's context, so the trip inputs (semantic_cache.py) follow the task.
+        return pool.submit(contextvars.copy_context().run, task.execute_sync, agent=agent, context=context,
+                           tools=tools)
+
+    def run(self) -> List[TaskOutput]:
+        """Runs every task and returns their outputs in task order."""
+        started = time.perf_counter()
+        timings = [TaskTiming(name=task.name or f"task {index}") for index, task in enumerate(self.tasks)]
+        waiting = list(range(len(self.tasks)))
+        running: Dict[Future, int] = {}
+        done: Dict[int, TaskOutput] = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ta-dag") as pool:
+            while waiting or running:
+                now = time.perf_counter() - started
+                for index in list(waiting):
+                    ready, partial = self._ready(index, done)
+                    if not ready:
+                        continue
+                    if timings[index].ready is None:
+                        timings[index].ready = now
+                    if len(running) < self.workers:
+                        waiting.remove(index)
+                        timings[index].started, timings[index].partial = now, partial
+                        running[self._start(pool, index, done)] = index
+                if waiting and not running:
+                    raise RuntimeError(f"Tasks {[timings[i].name for i in waiting]} can never start: "
+                                       f"their context tasks are not in the crew")
+                finished, _ = wait(list(running), timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = running.pop(future)
+                    output = future.result()  # a failed task fails the run, as in the sequential process
+                    timings[index].finished = time.perf_counter() - started
+                    done[index] = output
+                    self.crew._process_task_result(self.tasks[index], output)
+                    self.crew._store_execution_log(self.tasks[index], output, index, False)
+        report = dag_stats.add(timings, self.needs, time.perf_counter() - started)  # shown under Execution Data
+        logger.info("DAG run: %ss (serial %ss), critical path %s", report["seconds"], report["serial_seconds"],
+                    " -> ".join(report["critical_path"]))
+        return [done[index] for index in range(len(self.tasks))]
@@ -0,0 +1,219 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   The <section> catalog of config/tasks.yaml.                               #
+#                                                                             #
+#   The research tasks list the topics they want covered as <section> tags.   #
+#   This module parses them once so that the caches, the prefetcher and the   #
+#   retrieval code can all speak the same section names.                      #
+###############################################################################
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+
+TASKS_CONFIG = os.path.join(os.path.dirname(__file__), "config", "tasks.yaml")
+
+# tasks.yaml has one "<secondtion>" typo in the city sections; accept it too.
+_SECTION_RE = re.compile(r"<(?:section|secondtion)>(.*?)</section>", re.DOTALL)
+_TITLE_SPLIT_RE = re.compile(r"\s*-\s+|-\s*(?=[A-Z])")
+_TITLE_TAIL_RE = re.compile(r"\s+(?:about|of)\s+(?:\{\w+\}|the city)\s*$", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+_URL_RE = re.compile(r"https?://[^\s<>\"']+")
+
+
+@dataclass(frozen=True)
+class Section:
+    task: str           # e.g. 'country_research_task'
+    name: str           # canonical name, e.g. 'Weather' or 'Basics'
+    title: str          # title as written, e.g. 'Basics about {Country}'
+    text: str           # the instructions that follow the title
+    placeholders: Tuple[str, ...]  # placeholders used anywhere in the section
+
+    def render(self, inputs: Dict[str, str]) -> str:
+        """Returns the section instructions with {Country}/{StartDate}/... filled in."""
+        return _PLACEHOLDER_RE.sub(lambda m: str(inputs.get(m.group(1), m.group(0))), self.text)
+
+
+# Words a free-text search query may use for each section. The first match wins,
+# so the short-lived topics (news, threats) are listed before the broad ones.
+SECTION_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "Recent News":            ("news", "headline", "latest", "this week", "today"),
+    "Security Threat":        ("security", "threat", "advisory", "advisories", "terror", "level 1", "level 2", "level 3", "level 4"),
+    "Closures":               ("closure", "closed", "shutdown", "strike"),
+    "Political Situation":    ("politic", "government", "election", "unrest", "protest"),
+    "Travel Permits":         ("visa", "permit", "entry requirement", "passport"),
+    "Travel Passes":          ("travel pass", "transit pass", "metro card", "city pass"),
+    "Weather":                ("weather", "climate", "temperature", "rain", "monsoon"),
+    "Holidays":               ("holiday",),
+    "Local Festivals":        ("festival", "events", "event calendar"),
+    "Emergency Contacts":     ("emergency", "ambulance", "police number", "911"),
+    "Health":                 ("health", "vaccin", "malaria", "hospital", "disease"),
+    "Travel Insurance":       ("insurance",),
+    "Travel Safety":          ("safety", "safe", "scam"),
+    "Currency and Cost":      ("currency", "cost", "price", "budget", "exchange rate", "meal"),
+    "Local Cuisine":          ("cuisine", "dish", "dishes"),
+    "Food":                   ("food", "delicac", "dessert", "beverage", "drink"),
+    "Religion and Culture":   ("religio", "culture", "church", "temple", "mosque"),
+    "Local Arts and Culture": ("arts", "museum", "galler", "theater", "theatre"),
+    "Local Customs":          ("custom", "etiquette", "tipping", "dress code"),
+    "Language":               ("language", "phrase", "spoken"),
+    "Local Transportation":   ("local transport", "bus", "taxi", "metro", "tram", "ride hailing"),
+    "Transportation":         ("transport", "train", "flight", "ferry", "getting around"),
+    "Accommodations":         ("hotel", "hostel", "accommodation", "where to stay", "resort"),
+    "Local Laws":             ("law", "legal", "illegal", "banned"),
+    "Local Shopping":         ("shopping", "market", "souvenir", "mall"),
+    "Local Nightlife":        ("nightlife", "bars", "pubs", "clubs", "nightclub"),
+    "Local Entertainment":    ("entertainment", "concert", "shows"),
+    "Local Sports":           ("sport", "football", "soccer", "cricket", "stadium"),
+    "Local History":          ("history", "historic", "ancient", "heritage"),
+    "Local Nature and Parks": ("nature", "park", "beach", "hiking", "national park", "wildlife"),
+    "Suggested Itinerary":    ("itinerary", "days in", "day trip", "route"),
+    "Must Visit":             ("must visit", "must see", "top attraction", "things to do"),
+    "Tourisism Highlights":   ("highlight", "tourism", "tourist attraction"),
+    "Travel Tips":            ("tips", "advice", "know before"),
+    "Basics":                 ("facts", "overview", "basics", "capital", "population", "factbook", "wikipedia"),
+}
+
+# Keywords match at the start of a word, so 'vaccin' finds 'vaccinations' but 'arts' does not find 'starts'.
+_KEYWORD_PATTERNS = {
+    name: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + ")")
+    for name, keywords in SECTION_KEYWORDS.items()
+}
+
+
+def section_name(title: str) -> str:
+    """'Basics about {Country}' -> 'Basics', 'Tourisism Highlights of the city' -> 'Tourisism Highlights'."""
+    return _TITLE_TAIL_RE.sub("", title).strip()
+
+
+def split_title(raw: str) -> Tuple[str, str]:
+    """'Weather- Gather information about ...' -> ('Weather', 'Gather information about ...')."""
+    parts = _TITLE_SPLIT_RE.split(" ".join(raw.split()), maxsplit=1)
+    return parts[0].strip(), parts[1].strip() if len(parts) > 1 else ""
+
+
+def _parse_section(task_name: str, raw: str) -> Section:
+    raw = " ".join(raw.split())
+    title, text = split_title(raw)
+    return Section(
+        task=task_name,
+        name=section_name(title),
+        title=title,
+        text=text,
+        placeholders=tuple(dict.fromkeys(_PLACEHOLDER_RE.findall(raw))),
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_tasks(config_path: str) -> Dict[str, dict]:
+    with open(config_path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_sections(task_name: str, config_path: str = TASKS_CONFIG) -> List[Section]:
+    """Returns the <section> entries of one task in tasks.yaml, in the order they are listed."""
+    task = _load_tasks(config_path).get(task_name) or {}
+    description = task.get("description") or ""
+    return [_parse_section(task_name, raw) for raw in _SECTION_RE.findall(description)]
+
+
+def load_seed_urls(task_name: str, config_path: str = TASKS_CONFIG) -> List[str]:
+    """Returns the website URLs a task lists as preferred sources, in the order they are listed."""
+    task = _load_tasks(config_path).get(task_name) or {}
+    description = _SECTION_RE.sub(" ", task.get("description") or "")
+    return list(dict.fromkeys(url.rstrip(".,;)") for url in _URL_RE.findall(description)))
+
+
+def all_section_names(config_path: str = TASKS_CONFIG) -> List[str]:
+    """Every distinct section name used by any task, in first-seen order."""
+    names: Dict[str, None] = {}
+    for task_name in _load_tasks(config_path):
+        for section in load_sections(task_name, config_path):
+            names.setdefault(section.name, None)
+    return list(names)
+
+
+def section_for_query(query: str) -> Optional[str]:
+    """Best guess of which section a free-text search query belongs to, or None."""
+    text = " ".join((query or "").lower().split())
+    for name, pattern in _KEYWORD_PATTERNS.items():
+        if pattern.search(text):
+            return name
+    return None
+
+
+def section_for_headings(headings: Sequence[str]) -> Optional[str]:
+    """Section of a page chunk from its headings, deepest first: ('Indonesia', 'Climate') -> 'Weather'."""
+    for heading in reversed(headings):
+        name = section_for_query(heading)
+        if name is not None:
+            return name
+    return None
+
+
+def _normalize_space(text: str) -> str:
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=None)
+def _task_markers(config_path: str) -> Dict[str, Tuple[str, Tuple[str, ...]]]:
+    """Per task: a piece of its description no other task has, and the placeholders its prompt uses."""
+    tasks = _load_tasks(config_path)
+    texts = {name: _normalize_space(task.get("description") or "") for name, task in tasks.items()}
+    markers = {}
+    for name, task in tasks.items():
+        fragments = sorted((_normalize_space(f) for f in _PLACEHOLDER_RE.split(texts[name])), key=len, reverse=True)
+        marker = next((f for f in fragments if len(f) >= 40 and not any(
+            f in other for other_name, other in texts.items() if other_name != name)), "")
+        prompt = f"{task.get('description') or ''} {task.get('expected_output') or ''}"
+        markers[name] = (marker, tuple(dict.fromkeys(_PLACEHOLDER_RE.findall(prompt))))
+    return markers
+
+
+@lru_cache(maxsize=None)
+def _section_markers(config_path: str) -> Dict[str, Tuple[Tuple[str, Section], ...]]:
+    """Per task: (a piece of a section's instructions no other section of the task has, the section)."""
+    markers = {}
+    for task_name in _load_tasks(config_path):
+        sections = load_sections(task_name, config_path)
+        texts = [_normalize_space(section.text) for section in sections]
+        entries = []
+        for index, section in enumerate(sections):
+            fragments = sorted((_normalize_space(f) for f in _PLACEHOLDER_RE.split(section.text)), key=len, reverse=True)
+            marker = next((f for f in fragments if len(f) >= 20 and not any(
+                f in other for other_index, other in enumerate(texts) if other_index != index)), "")
+            if marker:  # sections with the same instructions as another one cannot be told apart
+                entries.append((marker, section))
+        markers[task_name] = tuple(entries)
+    return markers
+
+
+def prompt_sections(prompt: str, config_path: str = TASKS_CONFIG) -> List[Section]:
+    """The <section> entries of the tasks.yaml tasks an agent prompt contains, e.g. one map-reduce shard's."""
+    text = _normalize_space(prompt)
+    return [section for name, (marker, _) in _task_markers(config_path).items() if marker and marker in text
+            for section_marker, section in _section_markers(config_path)[name] if section_marker in text]
+
+
+def prompt_placeholders(prompt: str, config_path: str = TASKS_CONFIG) -> Optional[Tuple[str, ...]]:
+    """The placeholders an agent prompt depends on; None if it contains no tasks.yaml task.
+
+    A prompt with <section> entries depends on the placeholders of those
+    sections only: a shard of date-independent sections ('Basics', 'Food')
+    reads the same for any StartDate, though the task's own text names it.
+    """
+    text = _normalize_space(prompt)
+    found = [placeholders for marker, placeholders in _task_markers(config_path).values() if marker and marker in text]
+    if not found:
+        return None
+    in_sections = tuple(dict.fromkeys(name for section in prompt_sections(prompt, config_path)
+                                      for name in section.placeholders))
+    return in_sections or tuple(dict.fromkeys(name for placeholders in found for name in placeholders))
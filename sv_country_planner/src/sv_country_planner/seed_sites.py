@@ -0,0 +1,153 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Seed-site scoped research.                                                #
+#                                                                             #
+#   country_research_task lists the sources it prefers (wikipedia, the CIA    #
+#   factbook, travel.state.gov, lonelyplanet, ...). Before kickoff we run one #
+#   "site:"-scoped search per source, all at once, and index the best         #
+#   matching pages in the website search tool (several pages at a time), so   #
+#   the agent's first website lookup already answers from them. Inside        #
+#   seeded_sites() the research task is told those pages are loaded, if any   #
+#   could be indexed. Opt-in (TA_SEED_SITES=1): it costs one Serper query per #
+#   source plus the page downloads.                                           #
+###############################################################################
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from sv_country_planner.cassette import replaying
+from sv_country_planner.http_client import shared_http_client
+from sv_country_planner.prefetch import COUNTRY_TASK, DEFAULT_CONCURRENCY
+from sv_country_planner.sections import load_seed_urls
+from sv_country_planner.settings import env_int
+from sv_country_planner.tools.travel_tools import TravelSearchTool, TravelWebsiteSearchTool
+
+
+PAGES_PER_SITE = env_int("TA_SEED_PAGES_PER_SITE", 2)
+SEEDED_NOTE = ("Pages about {Country} from these websites are already loaded into the website search tool, "
+               "so search them there first.")
+
+_seeded: ContextVar[bool] = ContextVar("ta_seeded_sites", default=False)
+
+logger = logging.getLogger(__name__)
+
+
+def site_scope(url: str) -> str:
+    """'https://www.cia.gov/the-world-factbook/countries' -> 'cia.gov/the-world-factbook/countries'.
+
+    A path that names a single page (travel.state.gov/.../traveladvisories.html) is cut back to its folder.
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    segments = [s for s in parts.path.split("/") if s]
+    if segments and "." in segments[-1]:
+        segments.pop()
+    return "/".join([host] + segments)
+
+
+def _same_site(link: str, scope: str) -> bool:
+    host = urlsplit(link).netloc.lower()
+    domain = scope.split("/", 1)[0]
+    return host == domain or host.endswith("." + domain)
+
+
+def seed_queries(inputs: Dict[str, str], task_name: str = COUNTRY_TASK) -> List[Tuple[str, str]]:
+    """(scope, query) for every preferred source of the task, e.g. ('lonelyplanet.com', 'Indonesia site:lonelyplanet.com')."""
+    place = inputs.get("Country", "")
+    scopes = dict.fromkeys(site_scope(url) for url in load_seed_urls(task_name))
+    return [(scope, f"{place} site:{scope}".strip()) for scope in scopes]
+
+
+async def _seed_all(search_tool: TravelSearchTool, queries: List[Tuple[str, str]], topic: str,
+                    pages_per_site: int, concurrency: int) -> Tuple[List[str], Dict[str, int]]:
+    stats = {"searched": 0, "failed": 0}
+    links: List[str] = []
+    search_type = search_tool.search_type
+    params = search_tool.cache_params(search_type)
+    url = search_tool._get_search_url(search_type)
+    semaphore = asyncio.Semaphore(concurrency)
+    http = shared_http_client()
+
+    async def search(query: str) -> dict:
+        cached = search_tool.cache.get(query, **params) if search_tool.use_cache else None
+        if cached is not None:
+            return cached
+        response = await http.arequest(
+            "POST", url, headers=search_tool.search_headers(), json=search_tool.search_payload(query), timeout=10,
+            upstream="serper",
+        )
+        response.raise_for_status()
+        result = search_tool.format_results(query, search_type, response.json())
+        if search_tool.use_cache:
+            search_tool.cache.put(query, result, topic=topic, **params)
+        return result
+
+    async def seed(scope: str, query: str) -> None:
+        async with semaphore:
+            try:
+                result = await search(query)
+            except KeyError as e:  # no SERPER_API_KEY: only cached searches can seed
+                logger.warning("Seed search skipped for '%s': %s is not set", query, e.args[0])
+                stats["failed"] += 1
+                return
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning("Seed search failed for '%s': %s", query, e)
+                stats["failed"] += 1
+                return
+        stats["searched"] += 1
+        matches = [item["link"] for item in result.get("organic", []) if _same_site(item.get("link", ""), scope)]
+        links.extend(matches[:pages_per_site])
+
+    await asyncio.gather(*(seed(scope, query) for scope, query in queries))
+    return list(dict.fromkeys(links)), stats
+
+
+def seed_site_pages(inputs: Dict[str, str], search_tool: TravelSearchTool, website_tool: TravelWebsiteSearchTool,
+                    task_name: str = COUNTRY_TASK, pages_per_site: int = PAGES_PER_SITE,
+                    concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, float]:
+    """Searches every preferred source of the task in parallel and indexes the best pages in website_tool.
+
+    Call this before crew().kickoff(inputs=...), next to prefetch_sections().
+    """
+    if replaying():
+        return {"sites": 0, "skipped": "replaying a cassette"}
+    started = time.perf_counter()
+    queries = seed_queries(inputs, task_name)
+    links, stats = shared_http_client().run(
+        _seed_all(search_tool, queries, inputs.get("Country", ""), pages_per_site, concurrency)
+    )
+    indexed = website_tool.add_many(links, concurrency)
+    stats.update({"sites": len(queries), "pages": len(links), "pages_indexed": indexed,
+                  "failed": stats["failed"] + len(links) - indexed,
+                  "seconds": round(time.perf_counter() - started, 2)})
+    return stats
+
+
+@contextmanager
+def seeded_sites(inputs: Dict[str, str], search_tool: TravelSearchTool, website_tool: TravelWebsiteSearchTool,
+                 **kwargs: Any) -> Iterator[Dict[str, float]]:
+    """Runs seed_site_pages(); a crew built inside the block tells its research task the pages are loaded."""
+    stats = seed_site_pages(inputs, search_tool, website_tool, **kwargs)
+    token = _seeded.set(bool(stats.get("pages_indexed")))
+    try:
+        yield stats
+    finally:
+        _seeded.reset(token)
+
+
+def with_seed_note(config: Dict[str, Any]) -> Dict[str, Any]:
+    """The research task's config, with SEEDED_NOTE at the end of its description if seeding indexed pages."""
+    if not _seeded.get():
+        return config
+    return {**config, "description": f"{config['description'].rstrip()}\n\n{SEEDED_NOTE}\n"}
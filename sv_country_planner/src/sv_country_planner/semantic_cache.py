@@ -0,0 +1,233 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Semantic cache of LLM completions (optional, TA_SEMANTIC_CACHE=1).        #
+#                                                                             #
+#   Trips that differ only in inputs a prompt does not use produce almost the #
+#   same prompts. Before a prompt is looked up, the trip inputs the <section> #
+#   entries of its tasks.yaml task do not depend on are masked ('Kayaking' -> #
+#   '{PreferredActivity}' in the country researcher's prompt; the dates in a  #
+#   map-reduce shard of date-independent sections such as 'Basics'); the ones #
+#   they depend on must match exactly, as must the model, its parameters, the #
+#   roles and number of the messages and the end of the last message, which   #
+#   tells the steps of one agent loop apart. A prompt given other tasks'      #
+#   output as context depends on every input, since that output was written   #
+#   for the trip.                                                             #
+#   Among the entries of a scope, the most similar masked prompt is reused    #
+#   if its cosine similarity reaches TA_SEMANTIC_CACHE_THRESHOLD and it is    #
+#   younger than TA_SEMANTIC_CACHE_TTL.                                       #
+#                                                                             #
+#   The embeddings come from one of the EMBEDDERS backends (hashing by        #
+#   default: it reads the whole prompt, where MiniLM stops at 256 tokens).    #
+###############################################################################
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from crewai.utilities import I18N
+
+from sv_country_planner.llm_cache import CachedCompletion, canonical_messages
+from sv_country_planner.sections import prompt_placeholders
+from sv_country_planner.settings import cache_path, env_flag, env_float, env_int
+
+ENABLED = env_flag("TA_SEMANTIC_CACHE", default=False)
+THRESHOLD = env_float("TA_SEMANTIC_CACHE_THRESHOLD", 0.97)
+STALE_AFTER = env_int("TA_SEMANTIC_CACHE_TTL", 3 * 24 * 3600)
+EMBEDDER = os.getenv("TA_SEMANTIC_CACHE_EMBEDDER", "hashing")
+STEP_TAIL = 200  # characters of the last message that are part of the scope
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS semantic_completions (
+    id                INTEGER PRIMARY KEY,
+    scope             TEXT NOT NULL,
+    prompt            TEXT NOT NULL,
+    embedding         BLOB NOT NULL,
+    response          TEXT NOT NULL,
+    chunks            TEXT NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    seconds           REAL NOT NULL,
+    created_at        REAL NOT NULL
+)
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS semantic_completions_scope ON semantic_completions (scope, created_at)"
+
+# What crewai puts between a task and the output of its context tasks.
+CONTEXT_MARKER = I18N().slice("task_with_context").split("{task}")[-1].split("{context}")[0].strip()
+
+_trip_inputs: ContextVar[Optional[Dict[str, str]]] = ContextVar("ta_trip_inputs", default=None)
+
+
+@contextmanager
+def trip_inputs(inputs: Dict[str, str]) -> Iterator[None]:
+    """Tells the semantic cache which trip the LLM calls inside the block belong to."""
+    token = _trip_inputs.set(dict(inputs))
+    try:
+        yield
+    finally:
+        _trip_inputs.reset(token)
+
+
+def current_trip_inputs() -> Optional[Dict[str, str]]:
+    """The inputs of the trip being planned on this thread, if trip_inputs() set them."""
+    return _trip_inputs.get()
+
+
+def _mask(text: str, inputs: Dict[str, str], depends: Tuple[str, ...]) -> str:
+    for name, value in sorted(inputs.items(), key=lambda item: -len(str(item[1]))):
+        if name not in depends and value:
+            # Whole words only: Country 'Oman' is not masked inside 'Romania'.
+            text = re.sub(rf"(?<!\w){re.escape(str(value))}(?!\w)", lambda _, name=name: "{" + name + "}", text)
+    return text
+
+
+def prompt_scope(model: str, params: Dict[str, Any], messages,
+                 inputs: Dict[str, str]) -> Tuple[str, str]:
+    """(scope, masked prompt): the scope must match exactly, the masked prompt only semantically."""
+    canonical = canonical_messages(messages)
+    prompt = "\n\n".join(f"{m['role']}: {m['content']}" for m in canonical)
+    depends = prompt_placeholders(prompt)
+    if not depends or CONTEXT_MARKER in prompt:
+        # Not a known task, a task without placeholders or one given other tasks' output: every input counts.
+        depends = tuple(inputs)
+    # The ReAct step: the next step's prompt is the last one plus a short observation, as similar as a rerun.
+    last = _mask(str(canonical[-1]["content"] or ""), inputs, depends) if canonical else ""
+    scope = json.dumps([model, params, [m["role"] for m in canonical], len(canonical), last[-STEP_TAIL:],
+                        {name: inputs.get(name) for name in sorted(depends)}], sort_keys=True, default=str)
+    return scope, _mask(prompt, inputs, depends)
+
+
+class SemanticCache:
+    """SQLite (WAL) store of completions found by the similarity of their masked prompts within a scope."""
+
+    def __init__(self, path: Optional[str] = None, threshold: float = THRESHOLD, stale_after: int = STALE_AFTER,
+                 embedder: Optional[Any] = None):
+        self.path = path or cache_path("semantic_llm_cache.sqlite3")
+        self.threshold = threshold
+        self.stale_after = stale_after
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_INDEX)
+        self._conn.commit()
+        self.lookups = 0
+        self.hits = 0
+        self.stale = 0
+        self.similarity = 0.0
+        self.hit_age = 0.0
+        self.max_hit_age = 0.0
+        self.saved_tokens = 0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from sv_country_planner.tools.embedders import EMBEDDERS
+
+            self._embedder = EMBEDDERS[EMBEDDER]()
+        return self._embedder
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.embed([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, scope: str, prompt: str) -> Optional[CachedCompletion]:
+        """The completion of the most similar prompt in scope, if similar and fresh enough."""
+        now = time.time()
+        with self._lock:
+            self.lookups += 1
+            rows = self._conn.execute(
+                "SELECT id, embedding, created_at FROM semantic_completions WHERE scope = ?", (scope,)
+            ).fetchall()
+        if not rows:
+            return None
+        vector = self._embed(prompt)
+        similarities = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) @ vector
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.threshold:
+                return None
+            entry_id, _, created_at = rows[index]
+            if now - created_at > self.stale_after:
+                with self._lock:
+                    self.stale += 1
+                continue
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, chunks, prompt_tokens, completion_tokens, seconds FROM semantic_completions "
+                    "WHERE id = ?", (entry_id,),
+                ).fetchone()
+                if row is None:
+                    continue
+                completion = CachedCompletion(row[0], json.loads(row[1]), row[2], row[3], row[4])
+                self.hits += 1
+                self.similarity += float(similarities[index])
+                self.hit_age += now - created_at
+                self.max_hit_age = max(self.max_hit_age, now - created_at)
+                self.saved_tokens += completion.prompt_tokens + completion.completion_tokens
+            return completion
+        return None
+
+    def put(self, scope: str, prompt: str, completion: CachedCompletion) -> None:
+        embedding = self._embed(prompt).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO semantic_completions (scope, prompt, embedding, response, chunks, prompt_tokens, "
+                "completion_tokens, seconds, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, prompt, embedding, completion.response, json.dumps(completion.chunks),
+                 completion.prompt_tokens, completion.completion_tokens, completion.seconds, time.time()),
+            )
+            self._conn.commit()
+
+    def purge_stale(self) -> int:
+        """Deletes entries older than stale_after and returns how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM semantic_completions WHERE created_at < ?",
+                                        (time.time() - self.stale_after,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, stale_entries, oldest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(created_at < ?), 0), MIN(created_at) FROM semantic_completions",
+                (time.time() - self.stale_after,),
+            ).fetchone()
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "avg_hit_similarity": round(self.similarity / self.hits, 4) if self.hits else 0.0,
+                "avg_hit_age_h": round(self.hit_age / self.hits / 3600, 1) if self.hits else 0.0,
+                "max_hit_age_h": round(self.max_hit_age / 3600, 1),
+                "stale_skipped": self.stale,
+                "saved_tokens": self.saved_tokens,
+                "entries": entries,
+                "stale_entries": stale_entries,
+                "oldest_entry_age_h": round((time.time() - oldest) / 3600, 1) if oldest else 0.0,
+            }
+
+
+_default_cache: Optional[SemanticCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_semantic_cache() -> SemanticCache:
+    """The process-wide semantic cache shared by every TA run."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SemanticCache()
+        return _default_cache
@@ -0,0 +1,40 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Process-wide settings read from the environment (or the local .env file). #
+###############################################################################
+import os
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv())
+
+
+# Where the persistent caches (search results, pages, embeddings, ...) live.
+CACHE_DIR = os.getenv("TA_CACHE_DIR", os.path.join(os.getcwd(), ".ta_cache"))
+
+
+def cache_path(filename: str) -> str:
+    """Returns the full path of a file inside the cache directory, creating the directory if needed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Reads a boolean switch such as TA_SEARCH_CACHE=0 from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("", "0", "false", "no", "off")
+
+
+def env_int(name: str, default: int) -> int:
+    """Reads an integer setting such as TA_HTTP_MAX_CONNECTIONS=64 from the environment."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
@@ -0,0 +1,212 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Local stand-in servers for offline benchmarks and experiments.            #
+#                                                                             #
+#   StandInHTTPServer answers like Serper (POST /search, POST /news) and      #
+#   serves travel-ish HTML pages with ETags (GET /page/<name>). It counts the #
+#   TCP connections it accepts, which is what a connection pool should save.  #
+#   It also answers OpenAI-style chat completions (POST /v1/chat/completions, #
+#   streamed or not) after a per-model latency, for routing experiments.      #
+#   A latency may be a list, cycled per request: [0.1] * 9 + [3.0] is a       #
+#   provider with a slow tail, for hedging experiments.                       #
+###############################################################################
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Union
+
+
+def fake_search_results(query: str, n_results: int = 10) -> dict:
+    """A Serper-shaped response for a query, including the bulky fields real responses have."""
+    slug = "-".join(query.lower().split())
+    return {
+        "searchParameters": {"q": query, "type": "search", "engine": "google"},
+        "knowledgeGraph": {"title": query.title(), "type": "Country", "description": f"About {query}.",
+                           "attributes": {"Capital": "Capital City", "Currency": "Local currency"}},
+        "answerBox": {"title": query.title(), "snippet": f"Quick answer for {query}."},
+        "organic": [
+            {
+                "title": f"{query.title()} - result {i}",
+                "link": f"https://example.org/{slug}/{i}",
+                "snippet": f"Snippet {i} about {query}. " * 3,
+                "date": "1 day ago",
+                "position": i,
+                "sitelinks": [{"title": f"More {j}", "link": f"https://example.org/{slug}/{i}/{j}"} for j in range(4)],
+                "attributes": {"Rating": "4.5", "Reviews": "1,234"},
+            }
+            for i in range(1, n_results + 1)
+        ],
+        "peopleAlsoAsk": [
+            {"question": f"What about {query} {i}?", "snippet": "An answer.", "title": "Q", "link": f"https://example.org/paa/{i}"}
+            for i in range(4)
+        ],
+        "relatedSearches": [{"query": f"{query} {word}"} for word in ("tips", "cost", "map", "weather", "visa")],
+        "credits": 1,
+    }
+
+
+_PAGE_TOPICS = ("Climate", "Visa requirements", "Getting around", "Local food", "History", "Where to stay")
+
+
+def fake_page(name: str, paragraphs: int = 40) -> str:
+    """An HTML travel page with navigation, footer and ad boilerplate around the article."""
+    body = "".join(
+        f"<h2>{_PAGE_TOPICS[i % len(_PAGE_TOPICS)]} {i}</h2><p>{name} paragraph {i}. "
+        + "Travel details and local facts. " * 20 + "</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>{name}</title><style>p {{}}</style><script>var x = 1;</script></head><body>"
+        f"<nav><a href='/'>Home</a><a href='/destinations'>Destinations</a></nav>"
+        f"<header>Site header</header><div class='ad-banner'>Buy now!</div>"
+        f"<main><h1>{name}</h1>{body}</main>"
+        f"<aside>Related posts</aside><footer>Copyright</footer></body></html>"
+    )
+
+
+def fake_completion(model: str, messages: list) -> str:
+    """A final answer in the ReAct format the crewai agents parse."""
+    question = " ".join(str(messages[-1].get("content") or "").split())[:80] if messages else ""
+    return f"Thought: I now know the final answer\nFinal Answer: Stand-in answer from {model} to: {question}"
+
+
+def _completion_chunks(model: str, text: str):
+    """Server-sent events of a streamed chat completion, a few words per chunk."""
+    words = text.split(" ")
+    for i in range(0, len(words), 4):
+        piece = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+        yield {"id": "stand-in", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+               "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+    yield {"id": "stand-in", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so reused connections are visible
+
+    def setup(self):
+        super().setup()
+        with self.server.counter_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None,
+              latency: Optional[float] = None):
+        latency = self.server.latency if latency is None else latency
+        if latency:
+            time.sleep(latency)
+        with self.server.counter_lock:
+            self.server.requests += 1
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up waiting, e.g. an LLM call that timed out
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") in ("/search", "/news"):
+            body = json.dumps(fake_search_results(payload.get("q", ""), int(payload.get("num", 10))))
+            self._send(200, body.encode("utf-8"), "application/json")
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat_completion(payload)
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def _chat_completion(self, payload: dict):
+        model = payload.get("model", "")
+        with self.server.counter_lock:
+            latency = self.server.model_latency.get(model, self.server.latency)
+            if isinstance(latency, (list, tuple)):
+                served = self.server.model_requests.get(model, 0)
+                self.server.model_requests[model] = served + 1
+                latency = latency[served % len(latency)]
+        text = fake_completion(model, payload.get("messages") or [])
+        usage = {"prompt_tokens": len(json.dumps(payload.get("messages"))) // 4, "completion_tokens": len(text) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if payload.get("stream"):
+            body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in _completion_chunks(model, text))
+            self._send(200, (body + "data: [DONE]\n\n").encode("utf-8"), "text/event-stream", latency=latency)
+        else:
+            body = json.dumps({
+                "id": "stand-in", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            self._send(200, body.encode("utf-8"), "application/json", latency=latency)
+
+    def do_GET(self):
+        if self.path.startswith("/page/"):
+            name = self.path[len("/page/"):] or "index"
+            body = fake_page(name).encode("utf-8")
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", "text/html; charset=utf-8", {"ETag": etag})
+            else:
+                self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+        else:
+            self._send(404, b"not found", "text/plain")
+
+
+class StandInHTTPServer:
+    """Serper, website and chat completion stand-in on 127.0.0.1. Use as a context manager."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0,
+                 model_latency: Optional[Dict[str, Union[float, Sequence[float]]]] = None):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.latency = latency
+        self._server.model_latency = dict(model_latency or {})  # seconds per chat completion, by model
+        self._server.model_requests: Dict[str, int] = {}
+        self._server.counter_lock = threading.Lock()
+        self._server.connections = 0
+        self._server.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_model_latency(self, model: str, seconds: Union[float, Sequence[float]]) -> None:
+        """Changes how long chat completions of model take from now on (a list is cycled per request)."""
+        with self._server.counter_lock:
+            self._server.model_latency[model] = seconds
+            self._server.model_requests.pop(model, None)
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    def start(self) -> "StandInHTTPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInHTTPServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
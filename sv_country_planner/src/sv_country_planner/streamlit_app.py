@@ -28,6 +28,24 @@ from crew import TA
 import datetime
 from datetime import date
 from crew import StreamToExpander
+from sv_country_planner.tools.singleflight import tool_calls
+from sv_country_planner.tools.embedding_cache import default_embedding_cache
+from sv_country_planner.tools.page_stream import stream_stats
+from sv_country_planner.tools.crawl_dedupe import crawl_ledger
+from sv_country_planner.tools.section_search import search_stats
+from sv_country_planner.llm_cache import default_llm_cache
+from sv_country_planner.context_compaction import context_stats
+from sv_country_planner.estimator import default_task_history, estimate_run
+from sv_country_planner.map_reduce import ENABLED as MAP_REDUCE, map_reduce_stats
+from sv_country_planner.hedging import ENABLED as HEDGING, hedge_stats
+from sv_country_planner.router import ENABLED as MODEL_ROUTING, default_router
+from sv_country_planner.scheduler import ENABLED as DAG_SCHEDULER, dag_stats
+from sv_country_planner.semantic_cache import ENABLED as SEMANTIC_CACHE, default_semantic_cache
+from sv_country_planner.tools.vector_quant import quantized_index
+from sv_country_planner.trip_run import trip_run
+from sv_country_planner.llm import provider_of
+from sv_country_planner.rate_limit import limiter_stats
+from sv_country_planner.tools.serper_projection import projection_stats
 
 
 import importlib
@@ -53,23 +71,39 @@ def icon(emoji: str):
     st.write( f'<span style="font-size: 48px; line-height: 1">{emoji}</span>', unsafe_allow_html=True, )
 
 
-def run(homecountry,country,start_date,end_date, activity='Kayaking', openai_api_key=''):
-    """
-    Run the crew.
-    """
+# Provider of the agents' model -> (name, environment variable of its key, placeholder).
+API_KEYS = {
+    "openai": ("OpenAI", "OPENAI_API_KEY", "sk-..."),
+    "groq": ("Groq", "GROQ_API_KEY", "gsk_..."),
+}
 
-    print(homecountry,country,start_date,end_date)
-    inputs = {
+
+def trip_inputs_of(homecountry, country, start_date, end_date, activity='Kayaking'):
+    """The crew inputs of the trip entered in the form."""
+    return {
         'HomeCountry': ''+ homecountry,
         'StartDate': ''+ start_date.strftime('%d %B %Y'),
         'EndDate': ''+ end_date.strftime('%d %B %Y'),
         'Country': '' + country,
-        'PreferredActivity': '' + activity, 
+        'PreferredActivity': '' + activity,
         }
 
+
+def run(homecountry,country,start_date,end_date, activity='Kayaking', openai_api_key='',
+        cassette=os.getenv("TA_CASSETTE"), cassette_mode=os.getenv("TA_CASSETTE_MODE", "replay")):
+    """
+    Run the crew.
+    Pass cassette='trip.cassette.gz' with cassette_mode='record' to record the run,
+    or with cassette_mode='replay' to serve it offline (see cassette.py).
+    """
+
+    print(homecountry,country,start_date,end_date)
+    inputs = trip_inputs_of(homecountry, country, start_date, end_date, activity)
+
     try:
         print(inputs)
-        result = TA().crew().kickoff(inputs=inputs)
+        with trip_run(inputs, TA.search_tool, TA.website_search_tool, cassette, cassette_mode):
+            result = TA().crew().kickoff(inputs=inputs)
         return result
 
     except Exception as e:
@@ -150,13 +184,15 @@ if __name__ == "__main__":
     with st.sidebar:
         st.header("👇 Enter your trip details")
         with st.form("my_form"):
-            openai_api_key = st.text_input("OpenAI API Key", type="password", placeholder="sk-...")
+            # The key of the provider of the agents' model (TA_MODEL in crew.py).
+            provider, key_env, key_hint = API_KEYS.get(provider_of(TA.llm.model), API_KEYS["openai"])
+            openai_api_key = st.text_input(f"{provider} API Key", type="password", placeholder=key_hint)
             if openai_api_key:
                 st.session_state.openai_api_key = openai_api_key
-                os.environ["OPENAI_API_KEY"] = openai_api_key
-                st.write("OpenAI API Key set successfully!")
+                os.environ[key_env] = openai_api_key
+                st.write(f"{provider} API Key set successfully!")
             else:   
-                st.write("Please enter your OpenAI API Key to proceed.")
+                st.write(f"Please enter your {provider} API Key to proceed.")
 
                 
             st.divider()
@@ -176,9 +212,21 @@ if __name__ == "__main__":
                                           max_value=date(2030, 12, 31) ) # Optional: Maximum date
             
             activity            = st.text_input("Any preferred activity you like to do ?", placeholder="Kayaking")
+            over_budget_ok      = st.checkbox("Run even if over budget")
             submitted = st.form_submit_button("Submit")
 
         st.divider()
+        if submitted:
+            # Tokens, cost and time of this trip from the rendered prompts and earlier runs (estimator.py).
+            trip_estimate = estimate_run(trip_inputs_of(homecountry, country, start_date, end_date, activity),
+                                         model=TA.llm.model, tasks=TA().crew().tasks)
+            st.markdown("**Estimate**")
+            st.text(trip_estimate.summary())
+            over_budget = trip_estimate.over_budget()
+            for reason in over_budget:
+                st.warning(f"Over budget: {reason}")
+            if over_budget and not over_budget_ok:
+                submitted = False
         st.sidebar.markdown(body="", unsafe_allow_html=True,)
     
 
@@ -187,7 +235,8 @@ if __name__ == "__main__":
             with st.container(height=500, border=False):
                 #sys.stdout = StreamToExpander(st)
                 
-                result     = run(homecountry,country,start_date,end_date,openai_api_key)
+                projection_start = projection_stats.snapshot()
+                result     = run(homecountry,country,start_date,end_date,activity,openai_api_key)
                 
 
             status.update(label="✅ Trip Plan Ready!",state="complete", expanded=False)
@@ -198,6 +247,31 @@ if __name__ == "__main__":
         st.subheader("Execution Data", anchor=False, divider="rainbow")
         st.markdown(f"**Token Usage:** {result.token_usage}")
         st.markdown(f"**Token Usage:** {result.to_dict()}")
+        st.markdown(f"**Search Cache:** {TA.search_tool.cache.stats()}")
+        st.markdown(f"**Coalesced Tool Calls:** {tool_calls.stats()}")
+        st.markdown(f"**Website Index:** {TA.website_search_tool.pages.stats()} {stream_stats.stats()}")
+        st.markdown(f"**Crawl Dedupe:** {crawl_ledger.stats()}")
+        st.markdown(f"**Website Lookups:** {search_stats.stats()}")
+        quantized = quantized_index(TA.website_search_tool.adapter.embedchain_app)
+        if quantized is not None:
+            st.markdown(f"**Quantized Vectors:** {quantized.stats()}")
+        st.markdown(f"**Page Cache:** {TA.website_search_tool.page_cache.stats()}")
+        st.markdown(f"**Embeddings:** {default_embedding_cache().stats()}")
+        st.markdown(f"**LLM Completion Cache:** {default_llm_cache().stats()}")
+        st.markdown(f"**Context Compaction:** {context_stats.stats()}")
+        st.markdown(f"**Estimate:** {trip_estimate.as_dict()} **Task History:** {default_task_history().stats()}")
+        if MAP_REDUCE:
+            st.markdown(f"**Map-Reduce Research:** {map_reduce_stats.stats()}")
+        if SEMANTIC_CACHE:
+            st.markdown(f"**Semantic LLM Cache:** {default_semantic_cache().stats()}")
+        if MODEL_ROUTING:
+            st.markdown(f"**Model Routing:** {default_router().stats()}")
+        if HEDGING:
+            st.markdown(f"**Hedged Completions:** {hedge_stats.stats()}")
+        if DAG_SCHEDULER:
+            st.markdown(f"**DAG Scheduler:** {dag_stats.stats()}")
+        st.markdown(f"**Rate Limiters:** {limiter_stats()}")
+        st.markdown(f"**Search Result Projection:** {projection_stats.report(since=projection_start)}")
 
 
 
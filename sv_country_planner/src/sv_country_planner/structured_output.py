@@ -0,0 +1,253 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Structured task outputs (TA_STRUCTURED_OUTPUT=1).                         #
+#                                                                             #
+#   Each task gets a pydantic output model built from its <section> tags in   #
+#   tasks.yaml: one field per section holding its text and source URLs, per   #
+#   city for the city tasks, per day for the planners. crewai asks the agent  #
+#   for that schema and validates the answer. Markdown is then only a view:   #
+#   render_markdown() turns the object into the task's output_file (the JSON  #
+#   is saved next to it), and a downstream task is given only the sections    #
+#   of its context tasks it needs (CONTEXT_SECTIONS) instead of whole         #
+#   documents. parse_markdown() structures a markdown report without an LLM   #
+#   call, e.g. the merged shards of map_reduce.py.                            #
+###############################################################################
+import contextvars
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple, Type
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+from sv_country_planner.sections import load_sections
+from sv_country_planner.settings import env_flag
+
+ENABLED = env_flag("TA_STRUCTURED_OUTPUT", default=False)
+
+# Sections of the country research a planner works from; a context task not
+# listed for a task is passed on whole.
+PLANNING_SECTIONS = (
+    "Tourisism Highlights", "Must Visit", "Suggested Itinerary", "Weather", "Holidays", "Closures",
+    "Local Festivals", "Transportation", "Local Transportation", "Accommodations", "Currency and Cost",
+    "Local Cuisine", "Local Nature and Parks",
+)
+CONTEXT_SECTIONS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "country_planner_task": {"country_research_task": PLANNING_SECTIONS},
+    "city_researcher_task": {"country_research_task": ("Basics", "Tourisism Highlights", "Must Visit",
+                                                       "Suggested Itinerary", "Transportation")},
+    "city_planner_task": {"country_research_task": PLANNING_SECTIONS},
+}
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+_NON_WORD_RE = re.compile(r"[^0-9a-z]+")
+
+
+class SectionText(BaseModel):
+    text: str = Field("NULL", description="Everything found for the section, in markdown; NULL if nothing was found")
+    sources: List[str] = Field(default_factory=list, description="URLs of the sources the text is based on")
+
+
+class DayPlan(SectionText):
+    day: int = Field(description="Day of the trip, starting at 1")
+    title: str = Field("", description="Where the day is spent, e.g. the city")
+
+
+class CountryPlan(BaseModel):
+    days: List[DayPlan] = Field(default_factory=list, description="One plan per day of the trip")
+
+
+class CityPlan(BaseModel):
+    city: str
+    days: List[DayPlan] = Field(default_factory=list, description="One plan per day spent in the city")
+
+
+class CityPlans(BaseModel):
+    cities: List[CityPlan] = Field(default_factory=list)
+
+
+def field_name(section: str) -> str:
+    """'Tourisism Highlights' -> 'tourisism_highlights'."""
+    return _NON_WORD_RE.sub("_", section.lower()).strip("_")
+
+
+def section_model(model_name: str, sections: Sequence[str], **fields: Any) -> Type[BaseModel]:
+    """A model with a SectionText field per section, titled with the section name, plus fields."""
+    section_fields = {
+        field_name(name): (SectionText, Field(default_factory=SectionText, title=name))
+        for name in dict.fromkeys(sections)
+    }
+    return create_model(model_name, **fields, **section_fields)
+
+
+@lru_cache(maxsize=None)
+def _models() -> Dict[str, Type[BaseModel]]:
+    country_sections = [section.name for section in load_sections("country_research_task")]
+    city_sections = [section.name for section in load_sections("city_researcher_task")]
+    country_research = section_model("CountryResearch", country_sections)
+    city_research = section_model("CityResearch", city_sections, city=(str, ...))
+    city_report = section_model("CityReport", city_sections + ["Travel Planner"], city=(str, ...))
+    return {
+        "country_research_task": country_research,
+        "country_planner_task": CountryPlan,
+        "city_researcher_task": create_model("CityResearchReport", cities=(List[city_research], ...)),
+        "city_planner_task": CityPlans,
+        "final_reporting_task": create_model("FinalReport", country=(country_research, ...),
+                                             cities=(List[city_report], Field(default_factory=list))),
+    }
+
+
+def output_model(task_name: str) -> Optional[Type[BaseModel]]:
+    """The output model of a task, or None when structured outputs are off or the task has none."""
+    return _models().get(task_name) if ENABLED else None
+
+
+###############################################################################
+# Markdown views
+###############################################################################
+def _sources(sources: Sequence[str]) -> str:
+    return "Sources:\n" + "\n".join(f"- {url}" for url in sources) if sources else ""
+
+
+def _section(title: str, section: SectionText, level: int) -> str:
+    return "\n\n".join(part for part in (f"{'#' * level} {title}", section.text.strip(), _sources(section.sources))
+                       if part)
+
+
+def to_markdown(output: BaseModel, level: int = 2, only: Optional[Collection[str]] = None,
+                skip_empty: bool = False) -> str:
+    """Markdown of output with a heading per section; only keeps the named sections (days and cities stay)."""
+    parts = []
+    for name, info in type(output).model_fields.items():
+        value = getattr(output, name)
+        if isinstance(value, SectionText):
+            title = info.title or name
+            empty = value.text.strip() in ("", "NULL") and not value.sources
+            if (only is None or title in only) and not (skip_empty and empty):
+                parts.append(_section(title, value, level))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, DayPlan):
+                    parts.append(_section(f"Day {item.day}" + (f" - {item.title}" if item.title else ""), item, level))
+                elif isinstance(item, BaseModel):
+                    city = getattr(item, "city", None)
+                    body = to_markdown(item, level + 1 if city else level, only, skip_empty)
+                    parts.append(f"{'#' * level} {city}\n\n{body}" if city else body)
+        elif isinstance(value, BaseModel):
+            parts.append(to_markdown(value, level, only, skip_empty))
+    return "\n\n".join(part for part in parts if part)
+
+
+def render_markdown(output: BaseModel, title: Optional[str] = None) -> str:
+    body = to_markdown(output)
+    return f"# {title}\n\n{body}" if title else body
+
+
+def context_text(task_name: Optional[str], context_name: Optional[str], output: TaskOutput) -> str:
+    """What task_name is given of a context task's output: its sections in CONTEXT_SECTIONS (or all of them)
+    that have something in them."""
+    if output.pydantic is None:
+        return output.raw
+    only = CONTEXT_SECTIONS.get(task_name or "", {}).get(context_name or "")
+    return to_markdown(output.pydantic, only=only, skip_empty=True)
+
+
+def parse_markdown(model: Type[BaseModel], text: str) -> BaseModel:
+    """Fills a flat section model from a markdown report whose headings start with the section names.
+
+    Text under a heading that names no section stays with the section before it;
+    the URLs of a section's text become its sources.
+    """
+    titles = {info.title: name for name, info in model.model_fields.items() if info.title}
+    by_length = sorted(titles, key=len, reverse=True)
+    found: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    headings = list(_HEADING_RE.finditer(text))
+    for index, heading in enumerate(headings):
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(text)
+        body = text[heading.end():end].strip()
+        label = heading.group(2).strip().strip("*").lower()
+        match = next((title for title in by_length if label.startswith(title.lower())), None)
+        if match is not None:
+            current = titles[match]
+            found.setdefault(current, [])
+        elif current is not None:
+            body = f"{heading.group(0).strip()}\n\n{body}"
+        if current is not None and body:
+            found[current].append(body)
+    values = {}
+    for name, bodies in found.items():
+        body = "\n\n".join(bodies).strip()
+        values[name] = SectionText(text=body or "NULL", sources=list(dict.fromkeys(
+            url.rstrip(".,;:") for url in _URL_RE.findall(body))))
+    return model(**values)
+
+
+###############################################################################
+# Tasks
+###############################################################################
+def markdown_guardrail(output: TaskOutput) -> Tuple[bool, TaskOutput]:
+    """Makes a structured output's raw text its markdown view, which is what callbacks and the crew's result show."""
+    if output.pydantic is not None:
+        output.raw = render_markdown(output.pydantic)
+    return True, output
+
+
+def structured(task_name: str) -> Dict[str, Any]:
+    """The Task arguments that give task_name its output model (none when TA_STRUCTURED_OUTPUT is off)."""
+    model = output_model(task_name)
+    return {"output_pydantic": model, "guardrail": markdown_guardrail} if model is not None else {}
+
+
+class StructuredTask(Task):
+    """Task whose output_file is the markdown view of its structured output, with the JSON saved next to it.
+
+    Run with async_execution, it keeps the caller's context (cassette, trip inputs, crawl run).
+    """
+
+    def execute_async(self, agent=None, context: Optional[str] = None, tools: Optional[List[Any]] = None) -> Future:
+        # crewai starts a bare thread, which would see none of the caller's ContextVars.
+        future: Future = Future()
+        threading.Thread(daemon=True, target=contextvars.copy_context().run,
+                         args=(self._execute_task_async, agent, context, tools, future)).start()
+        return future
+
+    def prompt(self) -> str:
+        if self.output_pydantic is None:
+            return super().prompt()
+        # The answer is the JSON of the schema crewai appends; markdown only goes inside the sections' text.
+        return "\n".join([self.description,
+                          self.i18n.slice("expected_output").format(expected_output=self.expected_output)])
+
+    def _save_file(self, result: Any) -> None:
+        if self.output is None or self.output.pydantic is None or not self.output_file:
+            return super()._save_file(result)
+        path = Path(os.path.splitext(self.output_file)[0] + ".json").expanduser().resolve()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.output.pydantic.model_dump(), ensure_ascii=False, indent=2), encoding="utf-8")
+        return super()._save_file(self.output.raw)
+
+
+def load_output(task_name: str, output_file: str) -> Optional[BaseModel]:
+    """The structured output a task saved next to output_file, if any (e.g. to reuse sections of an earlier run)."""
+    model = _models().get(task_name)
+    path = os.path.splitext(output_file)[0] + ".json"
+    if model is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return model.model_validate(json.load(f))
+    except (ValueError, ValidationError) as e:
+        print(f"Could not load {path}: {e}")
+        return None
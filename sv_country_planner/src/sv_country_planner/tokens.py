@@ -0,0 +1,37 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Local token counting, used to report prompt savings.                      #
+#                                                                             #
+#   tiktoken's cl100k_base is close enough for Groq/OpenAI style models;      #
+#   without tiktoken we fall back to the usual ~4 characters per token.       #
+###############################################################################
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # the encoding file may not be downloadable offline
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Approximate number of prompt tokens in text."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,141 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   URL canonicalization and duplicate page detection for the website tool.   #
+#                                                                             #
+#   The agents reach the same page under many URLs: tracking parameters,      #
+#   mobile hosts (en.m.wikipedia.org), AMP variants, trailing slashes and     #
+#   #fragments. canonical_url() folds those into one URL, and the crawl       #
+#   ledger remembers which canonical URLs a run (crawl_run()) has read. Pages #
+#   that are copies of another URL (mirrors, print views, syndicated          #
+#   advisories) are caught by a SimHash of their leading text.                #
+###############################################################################
+import hashlib
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from sv_country_planner.settings import env_int
+
+_TRACKING_PARAMS = {"gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl",
+                    "ref", "ref_src", "referrer", "cmpid", "spm", "amp", "outputtype", "ved", "ei", "usg"}
+_TRACKING_PREFIXES = ("utm_", "pk_", "hsa_", "oly_")
+_MOBILE_PREFIX_RE = re.compile(r"^(?:m|mobile|amp)\.")           # m.lonelyplanet.com -> www.lonelyplanet.com
+_MOBILE_LABEL_RE = re.compile(r"(?<=\.)(?:m|mobile)\.(?=[^.]+\.)")  # en.m.wikipedia.org -> en.wikipedia.org
+_AMP_PATH_RE = re.compile(r"(?:/amp/?|\.amp)$")
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+NEAR_DUPLICATE_BITS = env_int("TA_NEAR_DUP_BITS", 3)
+FINGERPRINT_WINDOW = env_int("TA_NEAR_DUP_WINDOW", 8000)
+
+
+def canonical_url(url: str) -> str:
+    """'https://en.m.wikipedia.org/wiki/Bali/?utm_source=x#Climate' -> 'https://en.wikipedia.org/wiki/Bali'."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+    host = _MOBILE_LABEL_RE.sub("", _MOBILE_PREFIX_RE.sub("www.", host))
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    path = _AMP_PATH_RE.sub("", path)
+    path = path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in _TRACKING_PARAMS and not key.lower().startswith(_TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the word 3-shingles of text."""
+    words = _WORD_RE.findall(text.lower())
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+_run_urls: ContextVar[Optional[Dict[str, None]]] = ContextVar("ta_crawl_run", default=None)
+
+
+@contextmanager
+def crawl_run() -> Iterator[None]:
+    """Gives the website tool calls inside the block their own set of URLs read, e.g. one trip of one session."""
+    token = _run_urls.set({})
+    try:
+        yield
+    finally:
+        _run_urls.reset(token)
+
+
+class CrawlLedger:
+    """Canonical URLs read in the current run, and fingerprints of the pages read in this process.
+
+    Outside crawl_run() the URLs go into one set for the whole process.
+    """
+
+    def __init__(self, max_bits: int = NEAR_DUPLICATE_BITS):
+        self.max_bits = max_bits
+        self._lock = threading.Lock()
+        self._seen: Dict[str, None] = {}
+        self._fingerprints: List[Tuple[int, str]] = []
+        self.urls_read = 0
+        self.duplicate_urls = 0
+        self.near_duplicates = 0
+
+    def _urls(self) -> Dict[str, None]:
+        urls = _run_urls.get()
+        return self._seen if urls is None else urls
+
+    def seen(self, url: str) -> bool:
+        """Whether this run has already read a canonical URL (counted as a duplicate if so)."""
+        urls = self._urls()
+        with self._lock:
+            if url in urls:
+                self.duplicate_urls += 1
+                return True
+            return False
+
+    def mark_seen(self, url: str) -> None:
+        """Records that this run has read a canonical URL; called once its page is in the index."""
+        urls = self._urls()
+        with self._lock:
+            if url not in urls:
+                urls[url] = None
+                self.urls_read += 1
+
+    def near_duplicate_of(self, url: str, text: str) -> Optional[str]:
+        """The URL of an earlier page whose text is (almost) the same, or None; remembers this one."""
+        fingerprint = simhash(text[:FINGERPRINT_WINDOW])
+        with self._lock:
+            for other, other_url in self._fingerprints:
+                if other_url != url and hamming(fingerprint, other) <= self.max_bits:
+                    self.near_duplicates += 1
+                    return other_url
+            self._fingerprints = [(f, u) for f, u in self._fingerprints if u != url]
+            self._fingerprints.append((fingerprint, url))
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"urls_read": self.urls_read, "duplicate_urls": self.duplicate_urls,
+                    "near_duplicates": self.near_duplicates, "fingerprints": len(self._fingerprints)}
+
+
+# Shared by every TravelWebsiteSearchTool in the process.
+crawl_ledger = CrawlLedger()
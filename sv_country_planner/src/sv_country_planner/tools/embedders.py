@@ -0,0 +1,121 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Embedding backends for the website search tool.                           #
+#                                                                             #
+#   remote   the embedder embedchain is configured with (OpenAI by default)   #
+#   local    all-MiniLM-L6-v2 on the CPU through onnxruntime (shipped with    #
+#            chromadb, the model is downloaded once), batches run on a pool   #
+#   hashing  a dependency-free hashing vectorizer for tests and air-gapped    #
+#            runs: no model, no network, weaker recall                        #
+#                                                                             #
+#   Pick one with TravelWebsiteSearchTool(embedder=...) or TA_EMBEDDER.       #
+###############################################################################
+import hashlib
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from embedchain import App
+from embedchain.config import AppConfig, ChromaDbConfig
+from embedchain.config.embedder.base import BaseEmbedderConfig
+from embedchain.embedder.base import BaseEmbedder, EmbeddingFunc
+from embedchain.vectordb.chroma import ChromaDB
+
+from sv_country_planner.settings import env_int
+
+Vector = List[float]
+REMOTE = "remote"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and word pairs into `dimension` buckets, L2-normalized."""
+
+    def __init__(self, dimension: int = env_int("TA_HASH_EMBED_DIM", 512)):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed_one(self, text: str) -> Vector:
+        counts: Dict[int, float] = {}
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            index = digest % self.dimension
+            counts[index] = counts.get(index, 0.0) + (1.0 if digest >> 63 else -1.0)
+        vector = [0.0] * self.dimension
+        for index, count in counts.items():
+            vector[index] = math.copysign(1.0 + math.log(abs(count)), count) if count else 0.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed(self, texts: Sequence[str]) -> List[Vector]:
+        return [self.embed_one(text) for text in texts]
+
+
+class LocalEmbedder:
+    """all-MiniLM-L6-v2 on onnxruntime's CPU provider; input batches are spread over a thread pool."""
+
+    def __init__(self, batch_size: int = env_int("TA_LOCAL_EMBED_BATCH_SIZE", 32),
+                 workers: int = env_int("TA_LOCAL_EMBED_WORKERS", min(4, os.cpu_count() or 1))):
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        self._model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+        self.batch_size = batch_size
+        self.dimension = 384
+        self.name = f"{ONNXMiniLM_L6_V2.MODEL_NAME}-onnx"
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ta-local-embed")
+
+    def embed(self, texts: Sequence[str]) -> List[Vector]:
+        batches = [list(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        vectors: List[Vector] = []
+        # onnxruntime releases the GIL, so the batches really run in parallel.
+        for result in self._pool.map(self._model, batches):
+            vectors.extend([float(x) for x in vector] for vector in result)
+        return vectors
+
+
+EMBEDDERS: Dict[str, Callable[[], object]] = {
+    "local": LocalEmbedder,
+    "hashing": HashingEmbedder,
+}
+
+
+class PluggedEmbedder(BaseEmbedder):
+    """Presents one of the EMBEDDERS backends to embedchain."""
+
+    def __init__(self, backend):
+        super().__init__(config=BaseEmbedderConfig(model=backend.name))
+        self.backend = backend
+        self.set_embedding_fn(EmbeddingFunc(backend.embed))
+        self.set_vector_dimension(backend.dimension)
+
+
+def website_app(config: Optional[dict], name: str = REMOTE) -> App:
+    """The embedchain App behind the website tool, embedding with backend name.
+
+    'remote' builds the App from config as RagTool would. Other backends get
+    their own Chroma collection, since their vectors cannot be mixed, and never
+    construct embedchain's remote embedder (which needs an API key).
+    """
+    if name == REMOTE:
+        return App.from_config(config=config) if config else App()
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}', expected '{REMOTE}' or one of {sorted(EMBEDDERS)}")
+    config = config or {}
+    db_config = dict(config.get("vectordb", {}).get("config", {}))
+    db_config["collection_name"] = f"{db_config.get('collection_name') or 'embedchain_store'}_{name}"
+    return App(
+        config=AppConfig(**config.get("app", {}).get("config", {})),
+        db=ChromaDB(config=ChromaDbConfig(**db_config)),
+        embedding_model=PluggedEmbedder(EMBEDDERS[name]()),
+    )
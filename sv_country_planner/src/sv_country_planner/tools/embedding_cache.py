@@ -0,0 +1,217 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Batched, cached embeddings for the website search tool.                   #
+#                                                                             #
+#   Every text the vector store embeds (page chunks and lookups) is keyed by  #
+#   the hash of the embedding model and the text. Vectors already computed,   #
+#   by this run or any earlier one, come from a memory LRU or the SQLite      #
+#   file behind it; e.g. the city researcher re-reading a country page the    #
+#   country researcher embedded costs nothing. The rest is collected from     #
+#   all callers into batches of TA_EMBED_BATCH_SIZE texts, waiting at most    #
+#   TA_EMBED_BATCH_WAIT_MS for a batch to fill, and embedded in one call.     #
+###############################################################################
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from chromadb.api.types import EmbeddingFunction
+
+from sv_country_planner.settings import cache_path, env_float, env_int
+
+Vector = List[float]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    vector     BLOB NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """chunk-hash -> vector, in a memory LRU in front of a SQLite (WAL) file."""
+
+    def __init__(self, path: Optional[str] = None, max_memory: int = env_int("TA_EMBED_LRU_SIZE", 4096)):
+        self.path = path or cache_path("embeddings.sqlite3")
+        self.max_memory = max_memory
+        self._memory: "OrderedDict[str, Vector]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.computed = 0
+
+    def _remember(self, key: str, vector: Vector) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.memory_hits += len(found)
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            for start in range(0, len(missing), 500):
+                part = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, Vector]) -> None:
+        now = time.time()
+        with self._lock:
+            # Concurrent callers missing the same text all end up here; count it once.
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                [(key, model, array("f", vector).tobytes(), now) for key, vector in vectors.items()],
+            ).rowcount
+            self._conn.commit()
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            self.computed += inserted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        served = self.memory_hits + self.disk_hits
+        return {
+            "computed": self.computed,
+            "served_from_cache": served,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "cache_rate": round(served / (served + self.computed), 3) if served + self.computed else 0.0,
+            "stored": stored,
+        }
+
+
+class EmbeddingBatcher:
+    """Collects texts from all callers and embeds them in batches of batch_size, waiting at most max_wait."""
+
+    def __init__(self, embed: Callable[[List[str]], Sequence[Vector]],
+                 batch_size: int = env_int("TA_EMBED_BATCH_SIZE", 64),
+                 max_wait: float = env_float("TA_EMBED_BATCH_WAIT_MS", 20) / 1000):
+        self._embed = embed
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, Future]] = []
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.batches = 0
+
+    def embed(self, texts: Sequence[str]) -> List[Vector]:
+        futures = [Future() for _ in texts]
+        with self._cond:
+            self._pending.extend(zip(texts, futures))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="ta-embed-batcher", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return [future.result() for future in futures]
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            return batch
+
+    def _run(self) -> None:
+        # Runs for the life of the process: whatever a batch raises goes to its callers, never out of here.
+        while True:
+            batch = self._next_batch()
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _deliver(self, batch: List[Tuple[str, Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        embedded = list(self._embed(texts))
+        if len(embedded) != len(texts):
+            raise ValueError(f"Embedder returned {len(embedded)} vectors for {len(texts)} texts")
+        vectors = {text: [float(x) for x in vector] for text, vector in zip(texts, embedded)}
+        self.batches += 1
+        for text, future in batch:
+            future.set_result(vectors[text])
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function that serves cached vectors and batches the rest through inner."""
+
+    def __init__(self, inner: Callable[[List[str]], Sequence[Vector]], model: str,
+                 cache: Optional[EmbeddingCache] = None, batcher: Optional[EmbeddingBatcher] = None):
+        self.inner = inner
+        self.model = model
+        self.cache = cache or default_embedding_cache()
+        self.batcher = batcher or EmbeddingBatcher(inner)
+
+    def __call__(self, input):
+        keys = [embedding_key(self.model, text) for text in input]
+        found = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, input) if key not in found}
+        if missing:
+            vectors = dict(zip(missing, self.batcher.embed(list(missing.values()))))
+            self.cache.put_many(self.model, vectors)
+            found.update(vectors)
+        return [found[key] for key in keys]
+
+
+def install_embedding_cache(app) -> CachedEmbeddingFunction:
+    """Puts the cache in front of an embedchain App's embedder and re-opens its collection with it."""
+    embedder = app.embedding_model
+    model = getattr(embedder.config, "model", None) or type(embedder).__name__
+    cached = CachedEmbeddingFunction(embedder.embedding_fn, model=f"{type(embedder).__name__}:{model}")
+    embedder.set_embedding_fn(cached)
+    app.db._get_or_create_collection(app.db.config.collection_name)
+    return cached
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_embedding_cache() -> EmbeddingCache:
+    """The process-wide embedding cache shared by every TA run."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
@@ -0,0 +1,140 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Conditional-GET cache of the pages the website search tool reads.         #
+#                                                                             #
+#   The body of every page is kept (zlib-compressed, SQLite in WAL mode)      #
+#   with its ETag and Last-Modified. The next fetch of the page sends         #
+#   If-None-Match / If-Modified-Since; a 304 means nothing has changed, so    #
+#   the page is neither downloaded, parsed nor embedded again.                #
+###############################################################################
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from sv_country_planner.settings import cache_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url           TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    body          BLOB NOT NULL,
+    size          INTEGER NOT NULL,
+    fetched_at    REAL NOT NULL,
+    validated_at  REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class CachedPage:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int
+    _body: bytes
+
+    @property
+    def body(self) -> bytes:
+        return zlib.decompress(self._body)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """Page bodies with their HTTP validators, keyed by URL."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or cache_path("page_cache.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.revalidations = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self.revalidation_seconds = 0.0
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, size, body FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return CachedPage(url, *row) if row else None
+
+    def capture(self, url: str, pieces: Iterable[bytes], headers) -> Iterator[bytes]:
+        """Passes a streamed body through and stores it (compressed on the fly) once it is complete."""
+        compressor = zlib.compressobj()
+        body, size = [], 0
+        for piece in pieces:
+            body.append(compressor.compress(piece))
+            size += len(piece)
+            yield piece
+        body.append(compressor.flush())
+        if headers.get("etag") or headers.get("last-modified"):
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, size, fetched_at, validated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, headers.get("etag"), headers.get("last-modified"), b"".join(body), size, now, now),
+                )
+                self._conn.commit()
+
+    def revalidated(self, page: CachedPage, status: int, seconds: float, headers) -> None:
+        """Records the outcome of a conditional request for page."""
+        with self._lock:
+            self.revalidations += 1
+            self.revalidation_seconds += seconds
+            if status != 304:
+                return
+            self.not_modified += 1
+            self.bytes_saved += page.size
+            # A 304 may carry fresher validators.
+            self._conn.execute(
+                "UPDATE pages SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+                "validated_at = ? WHERE url = ?",
+                (headers.get("etag"), headers.get("last-modified"), time.time(), page.url),
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pages, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            return {
+                "cached_pages": pages,
+                "cached_bytes": size,
+                "revalidations": self.revalidations,
+                "not_modified": self.not_modified,
+                "bytes_saved": self.bytes_saved,
+                "avg_revalidation_ms": round(1000 * self.revalidation_seconds / self.revalidations, 1)
+                if self.revalidations else 0.0,
+            }
+
+
+_default_cache: Optional[PageCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_page_cache() -> PageCache:
+    """The process-wide page cache shared by every TA run."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PageCache()
+        return _default_cache
@@ -0,0 +1,153 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Persistent vector store behind the website search tool.                   #
+#                                                                             #
+#   The embeddings live in a Chroma store under the cache directory with a    #
+#   fixed app id and collection, so every run and every Streamlit worker      #
+#   process uses the same index. embedchain keys chunks by the hash of their  #
+#   text; PageIndex additionally remembers the content hash of every page we  #
+#   indexed, so a page that has not changed is neither re-chunked nor         #
+#   re-embedded, and one checked recently is not even downloaded again.       #
+#   Writes to the store take a file lock, readers never wait.                 #
+###############################################################################
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+from sv_country_planner.settings import cache_path, env_flag, env_int
+
+APP_ID = "ta-website-search"
+INDEX_VERSION = 2  # 2: chunks carry their headings and section
+COLLECTION = f"ta_website_pages_v{INDEX_VERSION}"
+RECHECK_AFTER = env_int("TA_PAGE_RECHECK_SECONDS", 24 * 3600)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url          TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    indexed_at   REAL NOT NULL,
+    checked_at   REAL NOT NULL
+)
+"""
+
+
+def website_store_config(directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """embedchain App config for WebsiteSearchTool(config=...); None keeps embedchain's default store."""
+    if not env_flag("TA_VECTOR_STORE", default=True):
+        return None
+    return {
+        "app": {"config": {"id": APP_ID, "collect_metrics": False}},
+        "vectordb": {
+            "provider": "chroma",
+            "config": {"collection_name": COLLECTION, "dir": directory or cache_path("vectors")},
+        },
+    }
+
+
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def store_write_lock(path: Optional[str] = None) -> Iterator[None]:
+    """Serializes writes to the vector store across threads and processes."""
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path or cache_path("vectors.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PageIndex:
+    """SQLite (WAL) record of the pages in the vector store and the content hash they were indexed with."""
+
+    def __init__(self, path: Optional[str] = None, recheck_after: int = RECHECK_AFTER):
+        self.path = path or cache_path(f"pages_v{INDEX_VERSION}.sqlite3")
+        self.recheck_after = recheck_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.fresh_skips = 0
+        self.unchanged_skips = 0
+        self.indexed = 0
+
+    def _row(self, url: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT content_hash, checked_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def is_fresh(self, url: str) -> bool:
+        """True if the page was indexed and checked for changes less than recheck_after seconds ago."""
+        row = self._row(url)
+        if row is not None and time.time() - row[1] < self.recheck_after:
+            self.fresh_skips += 1
+            return True
+        return False
+
+    def is_unchanged(self, url: str, content_hash: str) -> bool:
+        """True if the page is already indexed with this content; records the check."""
+        row = self._row(url)
+        if row is None or row[0] != content_hash:
+            return False
+        with self._lock:
+            self._conn.execute("UPDATE pages SET checked_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        self.unchanged_skips += 1
+        return True
+
+    def touch(self, url: str) -> bool:
+        """Records that the page was found unchanged (e.g. a 304); False if it is not in the index."""
+        with self._lock:
+            updated = self._conn.execute("UPDATE pages SET checked_at = ? WHERE url = ?", (time.time(), url)).rowcount
+            self._conn.commit()
+        if updated:
+            self.unchanged_skips += 1
+        return bool(updated)
+
+    def mark_indexed(self, url: str, content_hash: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, content_hash, indexed_at, checked_at) VALUES (?, ?, ?, ?)",
+                (url, content_hash, now, now),
+            )
+            self._conn.commit()
+        self.indexed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pages = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {"pages": pages, "indexed": self.indexed, "fresh_skips": self.fresh_skips,
+                "unchanged_skips": self.unchanged_skips}
+
+
+_default_index: Optional[PageIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def default_page_index() -> PageIndex:
+    """The process-wide page index shared by every TA run."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = PageIndex()
+        return _default_index
@@ -0,0 +1,322 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Streaming page ingestion for the website search tool.                     #
+#                                                                             #
+#   A page is downloaded piece by piece (stopping at TA_PAGE_MAX_BYTES), fed  #
+#   to an incremental HTML parser that drops scripts, navigation, footers,    #
+#   cookie banners, ads and similar boilerplate, and cut into chunks while    #
+#   it is still arriving. Chunks are written to the vector store (and so      #
+#   embedded) in small batches as they are produced, so a Wikipedia country   #
+#   article never sits in memory whole and the first chunk is searchable      #
+#   early.                                                                    #
+###############################################################################
+import codecs
+import hashlib
+import itertools
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sv_country_planner.sections import section_for_headings
+from sv_country_planner.settings import env_int
+from sv_country_planner.tools.page_index import store_write_lock
+from sv_country_planner.tools.vector_quant import quantized_index
+
+MAX_PAGE_BYTES = env_int("TA_PAGE_MAX_BYTES", 2_000_000)
+CHUNK_SIZE = 2000  # same as embedchain's web page chunker
+MIN_SECTION_CHUNK = 200
+WRITE_BATCH = env_int("TA_PAGE_WRITE_BATCH", 8)
+
+# Elements whose whole content is dropped.
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "nav", "footer", "header", "aside",
+              "form", "button", "select", "dialog"}
+_SKIP_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog", "menu"}
+_BOILERPLATE_RE = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|menu|footer|sidebar|cookie|consent|banner|advert|ads?|promo|sponsor|share|social"
+    r"|newsletter|subscribe|breadcrumbs?|related|comments?|popup|modal|toolbar|skip)(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd", "table", "tr",
+               "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr", "blockquote", "pre", "figcaption"}
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def _is_boilerplate(tag: str, attrs: List[tuple]) -> bool:
+    if tag in _SKIP_TAGS:
+        return True
+    values = dict(attrs)
+    if (values.get("role") or "").lower() in _SKIP_ROLES or "hidden" in values or values.get("aria-hidden") == "true":
+        return True
+    return bool(_BOILERPLATE_RE.search(f"{values.get('class') or ''} {values.get('id') or ''}"))
+
+
+Headings = Tuple[str, ...]
+
+
+class ContentExtractor(HTMLParser):
+    """Incremental HTML to text: feed() markup as it arrives, collect the finished paragraphs.
+
+    Every paragraph comes with the <h1>..<h6> headings it sits under,
+    e.g. ('Indonesia', 'Climate', 'Rainy season').
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._text: List[str] = []
+        self._heading_level = 0
+        self.headings: Headings = ()
+        self.paragraphs: List[Tuple[Headings, str]] = []
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._text).split())
+        self._text = []
+        if self._heading_level:
+            level, self._heading_level = self._heading_level, 0
+            if text:
+                # A heading replaces the one of its level and ends the deeper ones.
+                self.headings = self.headings[:level - 1] + ("",) * (level - 1 - len(self.headings)) + (text,)
+        if text:
+            self.paragraphs.append((self.headings, text))
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if tag not in _VOID_TAGS and _is_boilerplate(tag, attrs):
+            self._flush()
+            self._skip_tag, self._skip_depth = tag, 1
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+            if tag in _HEADING_TAGS:
+                self._heading_level = int(tag[1])
+
+    def handle_endtag(self, tag):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip_tag is None:
+            self._text.append(data)
+
+    def take(self) -> List[Tuple[Headings, str]]:
+        paragraphs, self.paragraphs = self.paragraphs, []
+        return paragraphs
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+
+def page_paragraphs(pieces: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Tuple[Headings, str]]:
+    """Main-content paragraphs of an HTML page given as a stream of byte pieces, with their headings."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = ContentExtractor()
+    for piece in pieces:
+        parser.feed(decoder.decode(piece))
+        yield from parser.take()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.take()
+
+
+def chunk_paragraphs(paragraphs: Iterable[str], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Packs paragraphs into chunks of at most chunk_size characters, splitting long ones on spaces."""
+    current: List[str] = []
+    length = 0
+    for paragraph in paragraphs:
+        while len(paragraph) > chunk_size:
+            cut = paragraph.rfind(" ", 0, chunk_size)
+            cut = cut if cut > 0 else chunk_size
+            if current:
+                yield "\n".join(current)
+                current, length = [], 0
+            yield paragraph[:cut]
+            paragraph = paragraph[cut:].lstrip()
+        if current and length + len(paragraph) + 1 > chunk_size:
+            yield "\n".join(current)
+            current, length = [], 0
+        if paragraph:
+            current.append(paragraph)
+            length += len(paragraph) + 1
+    if current:
+        yield "\n".join(current)
+
+
+def chunk_sections(paragraphs: Iterable[Tuple[Headings, str]], chunk_size: int = CHUNK_SIZE,
+                   min_size: int = MIN_SECTION_CHUNK) -> Iterator[Tuple[Headings, str]]:
+    """Like chunk_paragraphs, but a chunk does not span two headings; each chunk comes with its headings.
+
+    A heading with less than min_size characters under it (a page title, an
+    <h2> directly followed by an <h3>) is carried into the next chunk instead.
+    """
+    carry: List[str] = []
+    headings: Headings = ()
+    for headings, group in itertools.groupby(paragraphs, key=lambda paragraph: paragraph[0]):
+        chunks = chunk_paragraphs(itertools.chain(carry, (text for _, text in group)), chunk_size)
+        carry = []
+        first = next(chunks, None)
+        second = next(chunks, None)
+        if second is None and first is not None and len(first) < min_size:
+            carry = [first]
+            continue
+        for chunk in itertools.chain([first, second] if second is not None else [first], chunks):
+            yield headings, chunk
+    if carry:
+        yield headings, carry[0]
+
+
+class StreamStats:
+    """Counters of the pages streamed into the vector store by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.bytes_read = 0
+        self.truncated = 0
+        self.chunks = 0
+        self.chunks_written = 0
+        self.first_chunk_seconds = 0.0
+        self.skipped = 0
+
+    def skip(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def add(self, bytes_read: int, truncated: bool, chunks: int, written: int, first_chunk: float) -> None:
+        with self._lock:
+            self.pages += 1
+            self.bytes_read += bytes_read
+            self.truncated += truncated
+            self.chunks += chunks
+            self.chunks_written += written
+            self.first_chunk_seconds += first_chunk
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pages_streamed": self.pages,
+                "bytes_read": self.bytes_read,
+                "truncated_pages": self.truncated,
+                "chunks": self.chunks,
+                "chunks_embedded": self.chunks_written,
+                "skipped_pages": self.skipped,
+                "avg_first_chunk_s": round(self.first_chunk_seconds / self.pages, 3) if self.pages else 0.0,
+            }
+
+
+stream_stats = StreamStats()
+
+
+def index_page(app, url: str, pieces: Iterable[bytes], max_bytes: Optional[int] = MAX_PAGE_BYTES,
+               chunk_size: int = CHUNK_SIZE, write_batch: int = WRITE_BATCH,
+               accept: Optional[Callable[[str], bool]] = None, head_size: int = 8000) -> Optional[str]:
+    """Streams one page into an embedchain App's Chroma collection and returns its content hash.
+
+    Chunk ids and metadata follow embedchain's web page loader, so the App's
+    queries find them; chunks already in the store are not written (or embedded)
+    again, and chunks the page no longer has are removed at the end. Each chunk
+    also records its headings and the tasks.yaml section they map to, for
+    section_search.py.
+    accept, if given, sees the first head_size characters of text before anything
+    is written; when it returns False the download stops and None is returned.
+    """
+    started = time.perf_counter()
+    app_id = app.config.id
+    source_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
+    content_hash = hashlib.sha256()
+    counted = {"bytes": 0}
+
+    def capped(stream: Iterable[bytes]) -> Iterator[bytes]:
+        for piece in stream:
+            if max_bytes is not None and counted["bytes"] + len(piece) > max_bytes:
+                piece = piece[:max_bytes - counted["bytes"]]
+            counted["bytes"] += len(piece)
+            yield piece
+            if max_bytes is not None and counted["bytes"] >= max_bytes:
+                return
+
+    quantized = quantized_index(app)
+    ids: Dict[str, None] = {}
+    batch: Dict[str, Tuple[Headings, str]] = {}
+    written = 0
+    first_chunk = 0.0
+
+    def write(batch: Dict[str, Tuple[Headings, str]]) -> int:
+        with store_write_lock():
+            existing = set(app.db.collection.get(ids=list(batch), include=[])["ids"])
+            new = {chunk_id: chunk for chunk_id, chunk in batch.items() if chunk_id not in existing}
+            if new:
+                metadatas = [{"url": url, "data_type": "web_page", "app_id": app_id, "hash": source_hash,
+                              "headings": " > ".join(filter(None, headings)),
+                              "section": section_for_headings(headings) or ""}
+                             for headings, _ in new.values()]
+                documents = [chunk for _, chunk in new.values()]
+                if quantized is None:
+                    app.db.collection.upsert(ids=list(new), documents=documents, metadatas=metadatas)
+                else:
+                    # Embedded here once, for the collection and its int8 copy.
+                    vectors = app.db.embedder.embedding_fn(documents)
+                    app.db.collection.upsert(ids=list(new), documents=documents, metadatas=metadatas,
+                                             embeddings=vectors)
+                    quantized.put(app_id, url, [(chunk_id, metadata["section"], vector) for chunk_id, metadata, vector
+                                                in zip(new, metadatas, vectors)])
+        return len(new)
+
+    chunks = chunk_sections(page_paragraphs(capped(pieces)), chunk_size)
+    if accept is not None:
+        head: List[Tuple[Headings, str]] = []
+        for item in chunks:
+            head.append(item)
+            if sum(len(chunk) for _, chunk in head) >= head_size:
+                break
+        if not accept("\n".join(chunk for _, chunk in head)):
+            chunks.close()
+            stream_stats.skip()
+            return None
+        chunks = itertools.chain(head, chunks)
+
+    for headings, chunk in chunks:
+        if not ids:
+            first_chunk = time.perf_counter() - started
+        content_hash.update(chunk.encode("utf-8"))
+        chunk_id = hashlib.sha256((chunk + url).encode()).hexdigest()
+        chunk_id = f"{app_id}--{chunk_id}" if app_id is not None else chunk_id
+        if chunk_id in ids:
+            continue
+        ids[chunk_id] = None
+        batch[chunk_id] = (headings, chunk)
+        if len(batch) >= write_batch:
+            written += write(batch)
+            batch = {}
+    if batch:
+        written += write(batch)
+
+    # Drop what an earlier version of the page had and this one does not.
+    with store_write_lock():
+        where = {"$and": [{"url": url}, {"app_id": app_id}]} if app_id is not None else {"url": url}
+        stale = set(app.db.collection.get(where=where, include=[])["ids"]) - set(ids)
+        if stale:
+            app.db.collection.delete(ids=list(stale))
+            if quantized is not None:
+                quantized.delete(list(stale))
+
+    truncated = max_bytes is not None and counted["bytes"] >= max_bytes
+    stream_stats.add(counted["bytes"], truncated, len(ids), written, first_chunk)
+    content_hash.update(url.encode("utf-8"))
+    return content_hash.hexdigest()
@@ -0,0 +1,239 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Persistent on-disk cache for Serper search results.                       #
+#                                                                             #
+#   Results are stored in a SQLite file in WAL mode so several Streamlit      #
+#   sessions (and worker processes) can read it while one of them writes.     #
+#   How long an entry lives depends on the section the query is about:        #
+#   "Basics" or "Local History" rarely change, "Recent News" does by the hour.#
+###############################################################################
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sv_country_planner.sections import section_for_query
+from sv_country_planner.settings import cache_path
+
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Time to live of a cached search, per section (see sections.SECTION_KEYWORDS).
+SECTION_TTLS: Dict[str, int] = {
+    "Recent News":            3 * HOUR,
+    "Security Threat":        6 * HOUR,
+    "Closures":               12 * HOUR,
+    "Political Situation":    1 * DAY,
+    "Currency and Cost":      3 * DAY,
+    "Local Festivals":        3 * DAY,
+    "Weather":                7 * DAY,
+    "Holidays":               7 * DAY,
+    "Travel Permits":         7 * DAY,
+    "Health":                 7 * DAY,
+    "Emergency Contacts":     30 * DAY,
+    "Food":                   30 * DAY,
+    "Local Cuisine":          30 * DAY,
+    "Local Customs":          60 * DAY,
+    "Religion and Culture":   60 * DAY,
+    "Language":               90 * DAY,
+    "Basics":                 90 * DAY,
+    "Local History":          90 * DAY,
+}
+DEFAULT_TTL = 7 * DAY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_results (
+    key        TEXT PRIMARY KEY,
+    query      TEXT NOT NULL,
+    section    TEXT,
+    payload    TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    topic      TEXT,                -- e.g. the country a prefetched search was about
+    params     TEXT,                -- search parameters of the entry, as a key
+    prefetched INTEGER DEFAULT 0    -- 1 = prefetched and not yet handed to an agent
+)
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases the query, drops quotes/punctuation at the edges and collapses whitespace."""
+    query = (query or "").lower().replace('"', " ").replace("'", " ")
+    query = re.sub(r"[\s,;:!?]+", " ", query)
+    return query.strip(" .")
+
+
+def ttl_for_section(section: Optional[str]) -> int:
+    return SECTION_TTLS.get(section or "", DEFAULT_TTL)
+
+
+class SearchCache:
+    """SQLite (WAL) cache of search results keyed by the normalized query and search parameters."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or cache_path("search_cache.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+        self.prefetch_hits = 0
+
+    @staticmethod
+    def make_key(query: str, **params: Any) -> str:
+        material = json.dumps([normalize_query(query), params], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def params_key(**params: Any) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def contains(self, query: str, **params: Any) -> bool:
+        """True if a fresh entry exists. Does not count as a hit or a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM search_results WHERE key = ? AND expires_at >= ?",
+                (self.make_key(query, **params), time.time()),
+            ).fetchone()
+        return row is not None
+
+    def get(self, query: str, **params: Any) -> Optional[Any]:
+        """Returns the cached result for the query, or None on a miss or an expired entry."""
+        return self._count(self._fresh(query, params))
+
+    def lookup(self, query: str, **params: Any) -> Optional[Any]:
+        """Like get(), but a miss may still be answered by take_prefetched(); counts one hit or miss either way."""
+        result, expired = self._fresh(query, params)
+        if result is None:
+            result = self.take_prefetched(query, **params)
+        return self._count((result, expired))
+
+    def _fresh(self, query: str, params: Dict[str, Any]) -> Tuple[Optional[Any], bool]:
+        """(the fresh cached result or None, whether an expired entry was found). Counts nothing."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM search_results WHERE key = ?", (self.make_key(query, **params),)
+            ).fetchone()
+        if row is None:
+            return None, False
+        if row[1] < time.time():
+            return None, True
+        return json.loads(row[0]), False
+
+    def _count(self, found: Tuple[Optional[Any], bool]) -> Optional[Any]:
+        result, expired = found
+        with self._lock:
+            self.expired += expired
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, query: str, result: Any, section: Optional[str] = None, ttl: Optional[int] = None,
+            topic: Optional[str] = None, prefetched: bool = False, **params: Any) -> None:
+        """Stores a result. The TTL defaults to the one of the section the query is about."""
+        section = section or section_for_query(query)
+        ttl = ttl_for_section(section) if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results "
+                "(key, query, section, payload, created_at, expires_at, topic, params, prefetched) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(query, **params), normalize_query(query), section,
+                 json.dumps(result, default=str), now, now + ttl,
+                 normalize_query(topic) if topic else None, self.params_key(**params), int(prefetched)),
+            )
+            self._conn.commit()
+            self.writes += 1
+
+    def arm_prefetched(self, query: str, section: Optional[str], topic: str, **params: Any) -> None:
+        """Marks an already cached entry as prefetched for the run that is about to start."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE search_results SET prefetched = 1, section = COALESCE(?, section), topic = ? WHERE key = ?",
+                (section, normalize_query(topic), self.make_key(query, **params)),
+            )
+            self._conn.commit()
+
+    def take_prefetched(self, query: str, **params: Any) -> Optional[Any]:
+        """Hands out the prefetched result for the section and topic of a query the agent phrased differently.
+
+        The agent's own queries rarely match the prefetched ones word for word, so the
+        first query about a section of a prefetched topic gets the prefetched result.
+        Each prefetched entry is handed out once; follow-up queries go upstream.
+        """
+        section = section_for_query(query)
+        if section is None:
+            return None
+        text = " " + normalize_query(query) + " "
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, topic, payload FROM search_results "
+                "WHERE prefetched = 1 AND section = ? AND params = ? AND expires_at >= ?",
+                (section, self.params_key(**params), time.time()),
+            ).fetchall()
+            for key, topic, payload in rows:
+                if topic and f" {topic} " in text:
+                    self._conn.execute("UPDATE search_results SET prefetched = 2 WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.prefetch_hits += 1
+                    return json.loads(payload)
+        return None
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries and returns how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM search_results WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus the size of the store, to help size the TTLs."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM search_results"
+            ).fetchone()
+            by_section = dict(self._conn.execute(
+                "SELECT COALESCE(section, '-'), COUNT(*) FROM search_results GROUP BY section"
+            ).fetchall())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "writes": self.writes,
+            "prefetch_hits": self.prefetch_hits,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "payload_bytes": size,
+            "entries_by_section": by_section,
+        }
+
+
+_default_cache: Optional[SearchCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_search_cache() -> SearchCache:
+    """The process-wide search cache shared by every TA run."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SearchCache()
+        return _default_cache
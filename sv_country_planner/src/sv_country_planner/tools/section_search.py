@@ -0,0 +1,133 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Section-targeted retrieval for the website search tool.                   #
+#                                                                             #
+#   page_stream.py stores every chunk with the headings it sits under and     #
+#   the tasks.yaml section those headings map to ('Climate' -> Weather).      #
+#   A lookup whose query names a section ("rainy season weather Bali")        #
+#   ranks that section's chunks ahead of the rest, and drops off-section      #
+#   chunks that score worse than the best on-section one, so the agent        #
+#   gets fewer, more relevant chunks than a plain top-k over the whole page.  #
+###############################################################################
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sv_country_planner.sections import section_for_query
+from sv_country_planner.settings import env_float, env_int
+from sv_country_planner.tools.vector_quant import RERANK_FACTOR, QuantizedIndex, exact_rerank, quantized_index
+
+SEARCH_CHUNKS = env_int("TA_WEBSITE_CHUNKS", 3)  # embedchain's default number_documents
+SECTION_BOOST = env_float("TA_SECTION_BOOST", 0.15)
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    url: str
+    headings: str
+    section: str
+    distance: float
+
+
+def _chunk(chunk_id: str, text: str, metadata: Dict[str, Any], distance: float) -> Chunk:
+    return Chunk(chunk_id, text, metadata.get("url", ""), metadata.get("headings", ""), metadata.get("section", ""),
+                 distance)
+
+
+def _query(app, query: str, where: Dict[str, str], n_results: int) -> List[Chunk]:
+    quantized = quantized_index(app)
+    if quantized is not None and len(quantized) >= app.db.count():
+        return _query_quantized(app, quantized, query, where, n_results)
+    clauses = [{key: value} for key, value in where.items()]
+    clause = {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else None)
+    result = app.db.collection.query(query_texts=[query], n_results=n_results, where=clause,
+                                     include=["documents", "metadatas", "distances"])
+    return [_chunk(*row) for row in zip(result["ids"][0], result["documents"][0], result["metadatas"][0],
+                                        result["distances"][0])]
+
+
+def _query_quantized(app, quantized: QuantizedIndex, query: str, where: Dict[str, str],
+                     n_results: int) -> List[Chunk]:
+    vector = app.db.embedder.embedding_fn([query])[0]
+    ids = quantized.search(vector, n_results * RERANK_FACTOR, where)
+    if not ids:
+        return []
+    result = app.db.collection.get(ids=ids, include=["documents", "metadatas"])
+    stored = quantized.vectors(result["ids"])
+    rows = [row for row in zip(result["ids"], result["documents"], result["metadatas"]) if row[0] in stored]
+    distances = exact_rerank(vector, [stored[row[0]] for row in rows])
+    chunks = [_chunk(*row, distance) for row, distance in zip(rows, distances)]
+    return sorted(chunks, key=lambda chunk: chunk.distance)[:n_results]
+
+
+def search_chunks(app, query: str, section: Optional[str] = None, url: Optional[str] = None,
+                  k: int = SEARCH_CHUNKS, boost: float = SECTION_BOOST) -> List[Chunk]:
+    """The k best chunks of the App's store for query, favouring section (guessed from the query if None).
+
+    url restricts the lookup to one page, when that page is in the store.
+    """
+    if app.db.count() == 0:
+        return []
+    section = section or section_for_query(query)
+    where = {"app_id": app.config.id} if app.config.id is not None else {}
+    if url and app.db.collection.get(where={"url": url}, limit=1, include=[])["ids"]:
+        where["url"] = url
+
+    candidates = {chunk.id: chunk for chunk in _query(app, query, where, k)}
+    if section:
+        for chunk in _query(app, query, {**where, "section": section}, k):
+            candidates.setdefault(chunk.id, chunk)
+
+    def score(chunk: Chunk) -> float:
+        return chunk.distance - (boost if section and chunk.section == section else 0.0)
+
+    ranked = sorted(candidates.values(), key=score)[:k]
+    on_section = [i for i, chunk in enumerate(ranked) if section and chunk.section == section]
+    if on_section:
+        # Off-section chunks are only kept if they beat every chunk of the section.
+        ranked = [chunk for i, chunk in enumerate(ranked) if i < on_section[0] or chunk.section == section]
+    search_stats.add(section is not None, ranked)
+    return ranked
+
+
+def format_chunks(chunks: List[Chunk]) -> str:
+    """The tool output for chunks, each preceded by its headings."""
+    return "Relevant Content:\n" + "\n\n".join(
+        f"[{chunk.headings}]\n{chunk.text}" if chunk.headings else chunk.text for chunk in chunks
+    )
+
+
+class SearchStats:
+    """Counters of the website lookups of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.targeted = 0
+        self.chunks = 0
+        self.characters = 0
+
+    def add(self, targeted: bool, chunks: List[Chunk]) -> None:
+        with self._lock:
+            self.searches += 1
+            self.targeted += targeted
+            self.chunks += len(chunks)
+            self.characters += sum(len(chunk.text) for chunk in chunks)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "searches": self.searches,
+                "section_targeted": self.targeted,
+                "avg_chunks": round(self.chunks / self.searches, 2) if self.searches else 0.0,
+                "avg_characters": round(self.characters / self.searches) if self.searches else 0,
+            }
+
+
+search_stats = SearchStats()
@@ -0,0 +1,105 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Slim projection of Serper results before they reach the agent prompt.     #
+#                                                                             #
+#   The raw SerperDevTool output carries sitelinks, attributes, "people also  #
+#   ask" and related searches, all of which end up in the agent scratchpad.   #
+#   The projection keeps only the fields the research tasks use, drops        #
+#   duplicate URLs and caps the number of results per query.                  #
+###############################################################################
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from sv_country_planner.settings import env_flag, env_int
+from sv_country_planner.tokens import count_tokens
+
+
+@dataclass
+class ProjectionConfig:
+    enabled: bool = env_flag("TA_SERPER_PROJECTION", default=True)
+    max_results: int = env_int("TA_SERPER_MAX_RESULTS", 6)
+    result_fields: Tuple[str, ...] = ("title", "link", "snippet", "date")
+    news_fields: Tuple[str, ...] = ("title", "link", "snippet", "date", "source")
+    answer_box_fields: Tuple[str, ...] = ("title", "answer", "snippet", "link")
+    knowledge_graph_fields: Tuple[str, ...] = ("title", "type", "description", "descriptionLink", "website")
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit(url or "")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+def _pick(item: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    return {name: item[name] for name in fields if item.get(name)}
+
+
+def project_results(results: Any, config: ProjectionConfig) -> Any:
+    """Returns the slim version of a formatted Serper result (as produced by SerperDevTool._run)."""
+    if not config.enabled or not isinstance(results, dict):
+        return results
+
+    projected: Dict[str, Any] = {}
+    query = (results.get("searchParameters") or {}).get("q")
+    if query:
+        projected["query"] = query
+    if results.get("answerBox"):
+        projected["answerBox"] = _pick(results["answerBox"], config.answer_box_fields)
+    if results.get("knowledgeGraph"):
+        projected["knowledgeGraph"] = _pick(results["knowledgeGraph"], config.knowledge_graph_fields)
+
+    seen = {_url_key(box["link"]) for box in projected.values() if isinstance(box, dict) and box.get("link")}
+    for name, fields in (("organic", config.result_fields), ("news", config.news_fields)):
+        kept = []
+        for item in results.get(name) or []:
+            key = _url_key(item.get("link", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(_pick(item, fields))
+            if len(kept) >= config.max_results:
+                break
+        if kept:
+            projected[name] = kept
+    return projected
+
+
+@dataclass
+class ProjectionStats:
+    """Prompt tokens of the raw vs. projected results handed to the agents."""
+    calls: int = 0
+    raw_tokens: int = 0
+    projected_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, raw: Any, projected: Any) -> None:
+        # crewai puts str(result) into the prompt, so that is what we count.
+        raw_tokens, projected_tokens = count_tokens(str(raw)), count_tokens(str(projected))
+        with self._lock:
+            self.calls += 1
+            self.raw_tokens += raw_tokens
+            self.projected_tokens += projected_tokens
+
+    def snapshot(self) -> Tuple[int, int, int]:
+        with self._lock:
+            return self.calls, self.raw_tokens, self.projected_tokens
+
+    def report(self, since: Tuple[int, int, int] = (0, 0, 0)) -> Dict[str, Any]:
+        """Savings since an earlier snapshot(), e.g. the start of a run."""
+        calls, raw, projected = (now - then for now, then in zip(self.snapshot(), since))
+        return {
+            "search_calls": calls,
+            "raw_tokens": raw,
+            "projected_tokens": projected,
+            "tokens_saved": raw - projected,
+            "saved_pct": round(100.0 * (raw - projected) / raw, 1) if raw else 0.0,
+        }
+
+
+# Process-wide counters, reported per run by snapshotting before kickoff.
+projection_stats = ProjectionStats()
@@ -0,0 +1,264 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   The search tools used by the TA crew.                                     #
+#                                                                             #
+#   These are drop-in replacements for the crewai_tools classes: the agents   #
+#   see the same tool names, descriptions and arguments.                      #
+###############################################################################
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Iterable, Optional
+
+import httpx
+from crewai_tools import SerperDevTool, WebsiteSearchTool
+from crewai_tools.adapters.embedchain_adapter import EmbedchainAdapter
+from crewai_tools.tools.rag.rag_tool import RagTool
+from pydantic import Field, PrivateAttr, model_validator
+
+from sv_country_planner.cassette import replaying, through_cassette
+from sv_country_planner.http_client import shared_http_client
+from sv_country_planner.settings import env_flag
+from sv_country_planner.tools.crawl_dedupe import FINGERPRINT_WINDOW, canonical_url, crawl_ledger
+from sv_country_planner.tools.embedders import REMOTE, website_app
+from sv_country_planner.tools.embedding_cache import install_embedding_cache
+from sv_country_planner.tools.page_cache import PageCache, default_page_cache
+from sv_country_planner.tools.page_index import PageIndex, default_page_index, website_store_config
+from sv_country_planner.tools.page_stream import MAX_PAGE_BYTES, index_page
+from sv_country_planner.tools.search_cache import SearchCache, default_search_cache, normalize_query
+from sv_country_planner.tools.section_search import format_chunks, search_chunks
+from sv_country_planner.tools.serper_projection import ProjectionConfig, project_results, projection_stats
+from sv_country_planner.tools.singleflight import tool_calls
+from sv_country_planner.tools.vector_quant import open_collection
+
+
+class TravelSearchTool(SerperDevTool):
+    """SerperDevTool whose results are kept in the persistent search cache.
+
+    Cache misses go through the process-wide singleflight group, so identical
+    queries issued at the same time by different agents or sessions cost one
+    Serper request, which is sent on the shared HTTP connection pool.
+    What reaches the agent is the slim projection of the results (see
+    serper_projection.py); the cache keeps the full results.
+    """
+
+    use_cache: bool = env_flag("TA_SEARCH_CACHE", default=True)
+    projection: ProjectionConfig = Field(default_factory=ProjectionConfig)
+    _cache: Optional[SearchCache] = PrivateAttr(default=None)
+
+    @property
+    def cache(self) -> SearchCache:
+        return self._cache or default_search_cache()
+
+    def cache_params(self, search_type: str) -> dict:
+        return {
+            "search_type": search_type,
+            "n_results": self.n_results,
+            "country": self.country,
+            "location": self.location,
+            "locale": self.locale,
+        }
+
+    def _run(self, **kwargs: Any) -> Any:
+        request = {"query": kwargs.get("search_query") or kwargs.get("query"),
+                   "type": kwargs.get("search_type", self.search_type), "n": self.n_results}
+        results = through_cassette("search", request, partial(self._cached_run, **kwargs))
+        projected = project_results(results, self.projection)
+        if projected is not results:
+            projection_stats.add(results, projected)
+        return projected
+
+    def _cached_run(self, **kwargs: Any) -> Any:
+        search_query = kwargs.get("search_query") or kwargs.get("query")
+        search_type = kwargs.get("search_type", self.search_type)
+        if not search_query:
+            return super()._run(**kwargs)
+
+        params = self.cache_params(search_type)
+        if self.use_cache:
+            cached = self.cache.lookup(search_query, **params)  # prefetched results count as hits
+            if cached is not None:
+                return cached
+
+        key = ("serper", self.base_url, SearchCache.make_key(search_query, **params))
+        return tool_calls.do(key, partial(self._search, search_query, params, kwargs))
+
+    def search_headers(self) -> dict:
+        return {"X-API-KEY": os.environ["SERPER_API_KEY"], "content-type": "application/json"}
+
+    def search_payload(self, search_query: str) -> dict:
+        """The JSON body SerperDevTool sends for a query."""
+        payload = {"q": search_query, "num": self.n_results}
+        if self.country != "":
+            payload["gl"] = self.country
+        if self.location != "":
+            payload["location"] = self.location
+        if self.locale != "":
+            payload["hl"] = self.locale
+        return payload
+
+    def _process_search_results(self, results: dict, search_type: str) -> dict:
+        # SerperDevTool drops the answer box, which is often the best single fact for a query.
+        formatted_results = super()._process_search_results(results, search_type)
+        if results.get("answerBox"):
+            formatted_results["answerBox"] = results["answerBox"]
+        return formatted_results
+
+    def format_results(self, search_query: str, search_type: str, results: dict) -> dict:
+        """Turns a raw Serper response into the full results SerperDevTool._run returns (and the cache keeps)."""
+        formatted_results = {
+            "searchParameters": {"q": search_query, "type": search_type, **results.get("searchParameters", {})}
+        }
+        formatted_results.update(self._process_search_results(results, search_type))
+        formatted_results["credits"] = results.get("credits", 1)
+        return formatted_results
+
+    def _make_api_request(self, search_query: str, search_type: str) -> dict:
+        response = shared_http_client().post(
+            self._get_search_url(search_type),
+            headers=self.search_headers(),
+            json=self.search_payload(search_query),
+            timeout=10,
+            upstream="serper",
+        )
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            raise ValueError("Empty response from Serper API")
+        return results
+
+    def _search(self, search_query: str, params: dict, kwargs: dict) -> Any:
+        result = super()._run(**kwargs)
+        if self.use_cache:
+            self.cache.put(search_query, result, **params)
+        return result
+
+
+class TravelWebsiteSearchTool(WebsiteSearchTool):
+    """WebsiteSearchTool whose page loads and lookups are coalesced across agents and sessions.
+
+    Pages are streamed from the shared HTTP connection pool into the persistent
+    store of page_index.py (page_stream.py); unchanged chunks are not embedded again.
+    Pages are revalidated with conditional GETs against page_cache.py.
+    Embeddings come from the backend named by embedder (embedders.py) and are
+    batched and cached by chunk hash (embedding_cache.py). Lookups favour the
+    chunks under headings of the section the query is about (section_search.py),
+    optionally from int8 copies of the vectors (vector_quant.py).
+    """
+
+    config: Optional[dict] = Field(default_factory=website_store_config)
+    embedder: str = os.getenv("TA_EMBEDDER", REMOTE)
+    cache_embeddings: bool = env_flag("TA_EMBED_CACHE", default=True)
+    section_search: bool = env_flag("TA_SECTION_SEARCH", default=True)
+    _pages: Optional[PageIndex] = PrivateAttr(default=None)
+    _page_cache: Optional[PageCache] = PrivateAttr(default=None)
+
+    @property
+    def pages(self) -> PageIndex:
+        return self._pages or default_page_index()
+
+    @property
+    def page_cache(self) -> PageCache:
+        return self._page_cache or default_page_cache()
+
+    @model_validator(mode="after")
+    def _set_default_adapter(self):
+        # Replaces RagTool's validator of the same name, which always builds the remote embedder.
+        if isinstance(self.adapter, RagTool._AdapterPlaceholder):
+            app = website_app(self.config, self.embedder)
+            if self.cache_embeddings:
+                install_embedding_cache(app)
+            open_collection(app)  # with the TA_HNSW_* settings
+            self.adapter = EmbedchainAdapter(embedchain_app=app, summarize=self.summarize)
+        return self
+
+    def add(self, website: str) -> None:
+        if replaying():
+            return  # lookups come off the cassette, nothing to index
+        url = canonical_url(website)
+        if crawl_ledger.seen(url):
+            return  # read earlier in this run, maybe under another URL
+        # A caller of a page that is still being read waits for it here instead of searching without it.
+        tool_calls.do(("website-add", url), partial(self._add_new_page, url, website))
+
+    def _add_new_page(self, url: str, website: str) -> None:
+        self._add_page(url, website)
+        crawl_ledger.mark_seen(url)  # only once the page is in the index
+
+    def add_many(self, websites: Iterable[str], concurrency: int = 8) -> int:
+        """Indexes several pages at once, e.g. the seed pages of seed_sites.py. Returns how many could be read."""
+        if replaying():
+            return 0
+
+        def add_one(website: str) -> bool:
+            try:
+                self.add(website)
+                return True
+            except Exception as e:  # best effort: an embedding or store error skips the page, not the run
+                print(f"Could not index '{website}': {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ta-website-add") as pool:
+            # Each page is added in a copy of the caller's context, so it counts towards the caller's crawl run.
+            futures = [pool.submit(contextvars.copy_context().run, add_one, website) for website in websites]
+            return sum(future.result() for future in futures)
+
+    def _add_page(self, website: str, source: Optional[str] = None) -> None:
+        """Indexes website (a canonical URL); source is the URL as given, fetched if website cannot be."""
+        if self.pages.is_fresh(website):
+            return
+        cached = self.page_cache.get(website)
+        started = time.perf_counter()
+        headers = cached.conditional_headers() if cached else None
+        try:
+            response = shared_http_client().stream("GET", website, max_bytes=MAX_PAGE_BYTES, timeout=30,
+                                                   headers=headers)
+        except httpx.HTTPError:
+            if not source or source == website:
+                raise
+            response = shared_http_client().stream("GET", source, max_bytes=MAX_PAGE_BYTES, timeout=30,
+                                                   headers=headers)
+        try:  # the download waits for index_page, so it is stopped whichever way this ends
+            if cached is not None:
+                self.page_cache.revalidated(cached, response.status_code, time.perf_counter() - started,
+                                            response.headers)
+            if response.status_code == 304:
+                response.close()
+                if self.pages.touch(website):
+                    return  # unchanged and already in the index: nothing to parse or embed
+                pieces = [cached.body]
+            else:
+                pieces = self.page_cache.capture(website, response, response.headers)
+            content_hash = index_page(
+                self.adapter.embedchain_app, website, pieces, head_size=FINGERPRINT_WINDOW,
+                accept=lambda text: crawl_ledger.near_duplicate_of(website, text) is None,
+            )
+        finally:
+            response.close()
+        if content_hash is None:
+            return  # a copy of a page already in the index
+        if not self.pages.is_unchanged(website, content_hash):
+            self.pages.mark_indexed(website, content_hash)
+
+    def search(self, search_query: str, website: Optional[str] = None, section: Optional[str] = None) -> str:
+        """Lookup targeted at the tasks.yaml section the query names (section_search.py)."""
+        if website is not None:
+            self.add(website)
+        chunks = search_chunks(self.adapter.embedchain_app, search_query, section=section,
+                               url=canonical_url(website) if website else None)
+        return format_chunks(chunks)
+
+    def _run(self, search_query: str, website: Optional[str] = None) -> str:
+        key = ("website-search", website or "", normalize_query(search_query))
+        if self.section_search and not self.summarize:
+            search = partial(self.search, search_query, website)
+        else:
+            search = partial(super()._run, search_query=search_query, website=website)
+        lookup = partial(tool_calls.do, key, search)
+        return through_cassette("website", {"query": search_query, "website": website}, lookup)
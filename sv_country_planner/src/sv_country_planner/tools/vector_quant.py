@@ -0,0 +1,232 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   Quantized vectors and HNSW settings for the website vector store.         #
+#                                                                             #
+#   Chroma keeps every chunk as a float32 vector in an in-memory HNSW graph,  #
+#   which each Streamlit worker loads in full. With TA_VECTOR_QUANT=int8 a    #
+#   copy of each vector is also kept as int8 codes with one scale per vector  #
+#   (SQLite in WAL mode next to the store). Lookups scan the int8 matrix, a   #
+#   quarter of the float32 size, for TA_RERANK_FACTOR times the chunks wanted #
+#   and re-rank those exactly with their float vectors, read by id from the   #
+#   same table (nothing is embedded again); Chroma's HNSW graph is then only  #
+#   loaded by the workers that write pages. Only that memory shrinks: on disk #
+#   the store grows, since Chroma still indexes the float32 vectors (lookups  #
+#   fall back to it until the int8 copy covers every chunk) and the table     #
+#   keeps a float32 copy of each vector next to its codes.                    #
+#                                                                             #
+#   TA_HNSW_M, TA_HNSW_EF_CONSTRUCTION and TA_HNSW_EF_SEARCH tune the graph   #
+#   itself; M and the construction ef apply when a store is created.          #
+###############################################################################
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sv_country_planner.settings import cache_path, env_int
+from sv_country_planner.tools.page_index import store_write_lock
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION = os.getenv("TA_VECTOR_QUANT", "none").lower()  # none | int8
+RERANK_FACTOR = env_int("TA_RERANK_FACTOR", 4)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    collection TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    app_id     TEXT NOT NULL,
+    url        TEXT NOT NULL,
+    section    TEXT NOT NULL,
+    scale      REAL NOT NULL,
+    norm       REAL NOT NULL,
+    codes      BLOB NOT NULL,
+    vector     BLOB NOT NULL,
+    PRIMARY KEY (collection, id)
+)
+"""
+
+
+def hnsw_metadata() -> Dict[str, Any]:
+    """Chroma collection metadata with the HNSW parameters from the environment (Chroma's defaults otherwise)."""
+    return {
+        "hnsw:space": "l2",
+        "hnsw:M": env_int("TA_HNSW_M", 16),
+        "hnsw:construction_ef": env_int("TA_HNSW_EF_CONSTRUCTION", 100),
+        "hnsw:search_ef": env_int("TA_HNSW_EF_SEARCH", 10),
+    }
+
+
+def open_collection(app) -> None:
+    """Gives an embedchain App's Chroma collection the hnsw_metadata() settings while it is still empty.
+
+    embedchain creates collections without metadata, and Chroma fixes the
+    HNSW parameters when the index is built, so a store that already holds
+    vectors keeps the settings it was created with (delete the store to rebuild it with new ones).
+    """
+    metadata = hnsw_metadata()
+    name = app.db.config.collection_name
+    with store_write_lock():
+        collection = app.db.client.get_or_create_collection(name=name, embedding_function=app.db.embedder.embedding_fn)
+        if (collection.metadata or {}) != metadata and collection.count():
+            logger.warning("Collection '%s' keeps its HNSW settings %s; delete the store to rebuild it with %s",
+                           name, collection.metadata, metadata)
+        elif (collection.metadata or {}) != metadata:
+            logger.info("Re-creating the empty collection '%s' with HNSW settings %s", name, metadata)
+            app.db.client.delete_collection(name)
+            collection = app.db.client.create_collection(
+                name=name, embedding_function=app.db.embedder.embedding_fn, metadata=metadata
+            )
+    app.db.collection = collection
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 codes and one scale per row: row ~= codes * scale."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedIndex:
+    """int8 copies of one Chroma collection's vectors, searched by brute force and re-ranked exactly."""
+
+    def __init__(self, collection: str, path: Optional[str] = None):
+        self.collection = collection
+        self.path = path or cache_path("vectors_int8.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._version: Optional[Tuple[int, int]] = None
+        self._ids: List[str] = []
+        self._meta = np.empty((0, 3), dtype=object)  # app_id, url, section
+        self._codes = np.empty((0, 0), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self.searches = 0
+        self.candidates = 0
+
+    def put(self, app_id: str, url: str, items: Sequence[Tuple[str, str, Sequence[float]]]) -> None:
+        """Stores (chunk id, section, float vector) items of one page."""
+        if not items:
+            return
+        vectors = np.asarray([vector for _, _, vector in items], dtype=np.float32)
+        codes, scales = quantize(vectors)
+        norms = (vectors * vectors).sum(axis=1)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (collection, id, app_id, url, section, scale, norm, codes, vector) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(self.collection, chunk_id, app_id or "", url, section, float(scale), float(norm), row.tobytes(),
+                  vector.tobytes())
+                 for (chunk_id, section, _), scale, norm, row, vector in zip(items, scales, norms, codes, vectors)],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM vectors WHERE collection = ? AND id = ?",
+                                   [(self.collection, chunk_id) for chunk_id in ids])
+            self._conn.commit()
+
+    def _load(self) -> None:
+        """(Re)reads the matrix when this or another process has changed the table since the last load."""
+        version = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM vectors WHERE collection = ?", (self.collection,)
+        ).fetchone()
+        if version == self._version:
+            return
+        rows = self._conn.execute(
+            "SELECT id, app_id, url, section, scale, norm, codes FROM vectors WHERE collection = ? ORDER BY rowid",
+            (self.collection,),
+        ).fetchall()
+        self._version = version
+        self._ids = [row[0] for row in rows]
+        self._meta = np.array([row[1:4] for row in rows], dtype=object).reshape(len(rows), 3)
+        self._scales = np.array([row[4] for row in rows], dtype=np.float32)
+        self._norms = np.array([row[5] for row in rows], dtype=np.float32)
+        self._codes = np.frombuffer(b"".join(row[6] for row in rows), dtype=np.int8).reshape(len(rows), -1) \
+            if rows else np.empty((0, 0), dtype=np.int8)
+
+    def vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """The float32 vectors of the chunks with these ids, read from disk (not kept in memory)."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, vector FROM vectors WHERE collection = ? AND id IN ({placeholders})",
+                (self.collection, *ids),
+            ).fetchall()
+        return {chunk_id: np.frombuffer(vector, dtype=np.float32) for chunk_id, vector in rows}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors WHERE collection = ?",
+                                      (self.collection,)).fetchone()[0]
+
+    def search(self, query: Sequence[float], n_results: int, where: Optional[Dict[str, str]] = None) -> List[str]:
+        """Ids of the n_results chunks nearest to query (approximate squared L2) that match where."""
+        vector = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            self._load()
+            ids, meta, codes, scales, norms = self._ids, self._meta, self._codes, self._scales, self._norms
+            self.searches += 1
+        if not ids:
+            return []
+        mask = np.ones(len(ids), dtype=bool)
+        for column, key in enumerate(("app_id", "url", "section")):
+            if where and where.get(key) is not None:
+                mask &= meta[:, column] == where[key]
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+        distances = norms[rows] - 2.0 * scales[rows] * (codes[rows].astype(np.float32) @ vector)
+        top = rows[np.argsort(distances)[:n_results]]
+        with self._lock:
+            self.candidates += len(top)
+        return [ids[i] for i in top]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load()
+            vectors, dimension = self._codes.shape
+            return {
+                "vectors": vectors,
+                "int8_bytes": int(self._codes.nbytes + self._scales.nbytes + self._norms.nbytes),
+                "float32_bytes": vectors * dimension * 4,
+                "searches": self.searches,
+                "avg_candidates": round(self.candidates / self.searches, 1) if self.searches else 0.0,
+            }
+
+
+_indexes: Dict[str, QuantizedIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def quantized_index(app) -> Optional[QuantizedIndex]:
+    """The process-wide int8 index of an App's collection, or None unless TA_VECTOR_QUANT=int8."""
+    if QUANTIZATION != "int8":
+        return None
+    collection = app.db.config.collection_name
+    with _indexes_lock:
+        if collection not in _indexes:
+            _indexes[collection] = QuantizedIndex(collection)
+        return _indexes[collection]
+
+
+def exact_rerank(query_vector: Sequence[float], vectors: Sequence[np.ndarray]) -> List[float]:
+    """Exact squared L2 distances of the stored float vectors to the query."""
+    if not len(vectors):
+        return []
+    difference = np.stack(vectors) - np.asarray(query_vector, dtype=np.float32)
+    return [float(d) for d in (difference * difference).sum(axis=1)]
@@ -0,0 +1,39 @@
+###############################################################################
+#   Travel Research and Planning Crew                                         #
+#                                                                             #
+#   Author: Shyam Vaidhyanathan                                               #
+#                                                                             #
+###############################################################################
+#   The steps every entry point takes around a kickoff.                       #
+#                                                                             #
+#   streamlit_app.run() and main.py's run / train / test plan a trip inside   #
+#   trip_run(): the cassette (cassette.py), the trip's inputs for the         #
+#   semantic cache (semantic_cache.py), a crawl run of its own                #
+#   (crawl_dedupe.py), then, if turned on, the section prefetch (prefetch.py) #
+#   and the seed pages (seed_sites.py) before the agents start.               #
+###############################################################################
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator, Optional
+
+from sv_country_planner.cassette import REPLAY, use_cassette
+from sv_country_planner.prefetch import prefetch_sections
+from sv_country_planner.seed_sites import seeded_sites
+from sv_country_planner.semantic_cache import trip_inputs
+from sv_country_planner.settings import env_flag
+from sv_country_planner.tools.crawl_dedupe import crawl_run
+from sv_country_planner.tools.travel_tools import TravelSearchTool, TravelWebsiteSearchTool
+
+
+@contextmanager
+def trip_run(inputs: Dict[str, str], search_tool: TravelSearchTool, website_tool: TravelWebsiteSearchTool,
+             cassette: Optional[str] = None, cassette_mode: str = REPLAY) -> Iterator[None]:
+    """Kick the crew off inside this block (TA_PREFETCH=1 / TA_SEED_SITES=1 add the warm-up steps)."""
+    # A crawl run of its own: pages read by an earlier trip may have changed since.
+    with use_cassette(cassette, cassette_mode), trip_inputs(inputs), crawl_run(), ExitStack() as seeding:
+        if env_flag("TA_PREFETCH", default=False):
+            # Warm the search cache with every section search before the agents start.
+            print(prefetch_sections(inputs, search_tool))
+        if env_flag("TA_SEED_SITES", default=False):
+            # Index the best pages of the task's preferred sources in the website tool.
+            print(seeding.enter_context(seeded_sites(inputs, search_tool, website_tool)))
+        yield
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# The units under test never call a model or the network; keep crewai's telemetry off too.
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+# Caches opened without an explicit path stay out of the project's .ta_cache.
+os.environ["TA_CACHE_DIR"] = tempfile.mkdtemp(prefix="ta-tests-")
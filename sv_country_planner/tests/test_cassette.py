@@ -0,0 +1,59 @@
+import contextvars
+import threading
+
+import pytest
+
+from sv_country_planner.cassette import (
+    RECORD, REPLAY, CassetteMiss, active_cassette, cassette_args, replaying, through_cassette, use_cassette,
+)
+
+
+def test_record_then_replay_in_order(tmp_path):
+    path = str(tmp_path / "trip.cassette.gz")
+    answers = iter(["first", "second"])
+    with use_cassette(path, RECORD):
+        assert through_cassette("llm", {"q": "plan"}, lambda: next(answers)) == "first"
+        assert through_cassette("llm", {"q": "plan"}, lambda: next(answers)) == "second"
+        assert not replaying()
+    with use_cassette(path, REPLAY) as cassette:
+        assert replaying()
+        live = lambda: pytest.fail("a replayed call goes upstream")  # noqa: E731
+        assert [through_cassette("llm", {"q": "plan"}, live) for _ in range(3)] == ["first", "second", "second"]
+        with pytest.raises(CassetteMiss):
+            through_cassette("search", {"q": "plan"}, live)
+        assert cassette.stats()["replayed"] == 3
+    assert active_cassette() is None
+
+
+def test_without_a_cassette_calls_go_through(tmp_path):
+    with use_cassette(None) as cassette:
+        assert cassette is None
+        assert through_cassette("llm", {}, lambda: "live") == "live"
+
+
+def test_a_cassette_applies_to_its_own_context_only(tmp_path):
+    path = str(tmp_path / "trip.cassette.gz")
+    other = []
+    with use_cassette(path, RECORD) as cassette:
+        thread = threading.Thread(target=lambda: other.append(active_cassette()))
+        thread.start()
+        thread.join()
+        assert contextvars.copy_context().run(active_cassette) is cassette
+    assert other == [None]
+
+
+def test_cassette_args(monkeypatch):
+    monkeypatch.delenv("TA_CASSETTE", raising=False)
+    monkeypatch.delenv("TA_CASSETTE_MODE", raising=False)
+    argv = ["run", "3", "--cassette", "trip.gz", "--record", "out.pkl"]
+    assert cassette_args(argv) == ("trip.gz", RECORD)
+    assert argv == ["run", "3", "out.pkl"]
+    assert cassette_args(["run", "--cassette=trip.gz"]) == ("trip.gz", REPLAY)
+    monkeypatch.setenv("TA_CASSETTE", "env.gz")
+    assert cassette_args(["run"]) == ("env.gz", REPLAY)
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        with use_cassette(str(tmp_path / "trip.gz"), "rewind"):
+            pass
@@ -0,0 +1,58 @@
+from sv_country_planner.context_compaction import DIVIDER, compact_outputs
+
+LONG = ("Bali has a tropical climate with a dry season from April to October and a wet season "
+        "from November to March, when afternoon showers are common across the island.")
+
+
+def test_repeated_paragraphs_are_dropped():
+    first = f"# Weather\n\n{LONG}\n\nPack light clothes."
+    second = f"# Summary\n\n{LONG}\n\nPack light clothes.\n\nBook ferries early."
+    compaction = compact_outputs([first, second])
+    assert compaction.text.count(LONG) == 1
+    assert compaction.text.count("Pack light clothes.") == 1
+    assert "Book ferries early." in compaction.text
+    assert compaction.dropped_paragraphs == 2
+    assert compaction.tokens_after < compaction.tokens_before
+
+
+def test_near_duplicate_paragraphs_are_dropped():
+    reworded = LONG.replace("are common", "are very common")
+    compaction = compact_outputs([f"# Weather\n\n{LONG}", f"# Plan\n\n{reworded}\n\nRent a scooter."])
+    assert reworded not in compaction.text
+    assert "Rent a scooter." in compaction.text
+
+
+def test_short_paragraphs_are_only_dropped_verbatim():
+    compaction = compact_outputs(["Visit Ubud in May.", "Visit Ubud in June."])
+    assert compaction.text == f"Visit Ubud in May.{DIVIDER}Visit Ubud in June."
+
+
+def test_links_already_given_are_reduced_to_their_text():
+    link = "[Wikipedia](https://en.wikipedia.org/wiki/Bali)"
+    first = f"Source: {link}"
+    second = (f"The island's history, temples and rice terraces are described in detail by {link} "
+              f"and by the [tourism board](https://www.indonesia.travel/bali).")
+    compaction = compact_outputs([first, second, f"- {link.replace('en.', 'en.m.')}"])
+    parts = compaction.text.split(DIVIDER)
+    assert parts[0] == first
+    assert "described in detail by Wikipedia and" in parts[1]
+    assert "(https://www.indonesia.travel/bali)" in parts[1]
+    # A list of sources that were all given before says nothing new.
+    assert len(parts) == 2
+
+
+def test_sections_are_kept_within_budget():
+    paragraphs = "\n\n".join(f"Day {day}: " + " ".join(f"stop{day}x{n}" for n in range(30)) for day in range(1, 30))
+    compaction = compact_outputs([f"# Itinerary\n\n{paragraphs}\n\n# Budget\n\nAbout 80 USD a day."],
+                                 section_budget=200)
+    assert compaction.truncated_sections == 1
+    assert "Day 1:" in compaction.text
+    assert "Day 29:" not in compaction.text
+    assert "# Budget\n\nAbout 80 USD a day." in compaction.text
+
+
+def test_headings_without_text_left_are_dropped():
+    compaction = compact_outputs([f"# Weather\n\n{LONG}", f"# Climate\n\n{LONG}\n\n# Food\n\nTry nasi goreng."])
+    assert "# Climate" not in compaction.text
+    assert compaction.dropped_sections == 1
+    assert "# Food\n\nTry nasi goreng." in compaction.text
@@ -0,0 +1,68 @@
+import contextvars
+import threading
+
+import pytest
+
+from sv_country_planner.tools.crawl_dedupe import CrawlLedger, canonical_url, crawl_run
+
+
+@pytest.mark.parametrize("url, canonical", [
+    ("https://en.m.wikipedia.org/wiki/Bali/?utm_source=x#Climate", "https://en.wikipedia.org/wiki/Bali"),
+    ("HTTPS://WWW.Lonelyplanet.com/indonesia", "https://www.lonelyplanet.com/indonesia"),
+    ("https://m.lonelyplanet.com/indonesia", "https://www.lonelyplanet.com/indonesia"),
+    ("https://www.example.com/guide/amp/", "https://www.example.com/guide"),
+    ("https://www.example.com/guide.amp", "https://www.example.com/guide"),
+    ("https://www.example.com:443//a//b/", "https://www.example.com/a/b"),
+    ("http://www.example.com:8080/a", "http://www.example.com:8080/a"),
+    ("https://www.example.com/?b=2&a=1&gclid=x&fbclid=y", "https://www.example.com/?a=1&b=2"),
+    ("https://www.example.com", "https://www.example.com/"),
+])
+def test_canonical_url(url, canonical):
+    assert canonical_url(url) == canonical
+
+
+def test_canonical_url_keeps_meaningful_query():
+    assert canonical_url("https://www.example.com/search?q=bali&page=2") == \
+        "https://www.example.com/search?page=2&q=bali"
+
+
+def test_urls_are_seen_once_marked_and_per_run():
+    ledger = CrawlLedger()
+    url = "https://en.wikipedia.org/wiki/Bali"
+    with crawl_run():
+        assert not ledger.seen(url)
+        ledger.mark_seen(canonical_url(url + "?utm_medium=x"))
+        assert ledger.seen(canonical_url("https://en.m.wikipedia.org/wiki/Bali/"))
+        assert ledger.stats()["urls_read"] == 1
+    with crawl_run():
+        # A new run reads the page again.
+        assert not ledger.seen(url)
+
+
+def test_runs_on_other_threads_do_not_share_urls():
+    ledger = CrawlLedger()
+    url = "https://en.wikipedia.org/wiki/Bali"
+    seen = []
+
+    def other_run():
+        with crawl_run():
+            seen.append(ledger.seen(url))
+
+    with crawl_run():
+        ledger.mark_seen(url)
+        thread = threading.Thread(target=other_run)
+        thread.start()
+        thread.join()
+        # A worker that copies the run's context shares its URLs.
+        assert contextvars.copy_context().run(ledger.seen, url)
+    assert seen == [False]
+
+
+def test_near_duplicate_pages():
+    ledger = CrawlLedger(max_bits=3)
+    text = " ".join(f"Bali paragraph {n} about beaches, temples and rice terraces." for n in range(40))
+    assert ledger.near_duplicate_of("https://a.com/bali", text) is None
+    assert ledger.near_duplicate_of("https://b.com/bali", text + " Updated.") == "https://a.com/bali"
+    assert ledger.near_duplicate_of("https://c.com/java", "Java is a different island entirely.") is None
+    # A page read again is not a copy of itself.
+    assert ledger.near_duplicate_of("https://a.com/bali", text) is None
@@ -0,0 +1,37 @@
+import math
+
+import pytest
+
+from sv_country_planner.tools.embedders import HashingEmbedder, website_app
+
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_hashing_embedder_is_normalized_and_deterministic():
+    embedder = HashingEmbedder(dimension=64)
+    first, second = embedder.embed(["Bali weather in December", "Bali weather in December"])
+    assert len(first) == 64
+    assert math.isclose(sum(x * x for x in first), 1.0)
+    assert first == second == HashingEmbedder(dimension=64).embed_one("bali WEATHER in december")
+
+
+def test_hashing_embedder_ranks_related_text_higher():
+    embedder = HashingEmbedder()
+    query, related, other = embedder.embed(["rainy season in Bali", "Bali has a rainy season from November",
+                                            "Visa requirements for US citizens"])
+    assert cosine(query, related) > cosine(query, other)
+
+
+def test_local_backends_get_their_own_collection(tmp_path):
+    config = {"app": {"config": {"id": "test", "collect_metrics": False}},
+              "vectordb": {"provider": "chroma", "config": {"collection_name": "pages", "dir": str(tmp_path)}}}
+    app = website_app(config, "hashing")
+    assert app.db.config.collection_name == "pages_hashing"
+    assert app.embedding_model.vector_dimension == HashingEmbedder().dimension
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown embedder"):
+        website_app(None, "word2vec")
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sv_country_planner.tools.embedding_cache import CachedEmbeddingFunction, EmbeddingBatcher, EmbeddingCache
+
+
+def test_callers_share_batches():
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1] for text in texts]
+
+    batcher = EmbeddingBatcher(embed, batch_size=8, max_wait=0.05)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(batcher.embed, [["a", "bb"], ["ccc"], ["a"], ["dddd"]]))
+    assert results == [[[1.0, 1.0], [2.0, 1.0]], [[3.0, 1.0]], [[1.0, 1.0]], [[4.0, 1.0]]]
+    assert all(isinstance(x, float) for vector in results[0] for x in vector)
+    # Repeated texts are embedded once per batch.
+    assert sum(len(batch) for batch in calls) == 4
+    assert len(calls) == batcher.batches < 4
+
+
+def test_batches_are_at_most_batch_size():
+    calls = []
+    batcher = EmbeddingBatcher(lambda texts: calls.append(len(texts)) or [[0.0]] * len(texts),
+                               batch_size=3, max_wait=0.01)
+    assert len(batcher.embed([str(n) for n in range(7)])) == 7
+    assert calls == [3, 3, 1]
+
+
+@pytest.mark.parametrize("bad", [
+    lambda texts: [[0.0]] * (len(texts) - 1),  # too few vectors
+    lambda texts: [["not a number"]] * len(texts),
+    lambda texts: 1 / 0,
+])
+def test_bad_embedder_output_fails_the_callers_not_the_worker(bad):
+    broken = threading.Event()
+
+    def embed(texts):
+        if not broken.is_set():
+            broken.set()
+            return bad(texts)
+        return [[1.0]] * len(texts)
+
+    batcher = EmbeddingBatcher(embed, batch_size=4, max_wait=0.01)
+    with pytest.raises(Exception):
+        batcher.embed(["a", "b"])
+    assert batcher.embed(["a", "b"]) == [[1.0], [1.0]]
+    assert batcher._worker.is_alive()
+
+
+def test_cache_serves_memory_then_disk(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(path, max_memory=1)
+    cache.put_many("model", {"a": [0.5, 1.0], "b": [2.0, 0.25]})
+    assert cache.get_many(["b", "a", "c"]) == {"b": [2.0, 0.25], "a": [0.5, 1.0]}
+    assert (cache.memory_hits, cache.disk_hits) == (1, 1)
+    assert EmbeddingCache(path).get_many(["a"]) == {"a": [0.5, 1.0]}
+    cache.put_many("model", {"a": [0.5, 1.0]})
+    assert cache.stats()["computed"] == 2
+
+
+def test_cached_embedding_function_embeds_each_text_once(tmp_path):
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    cached = CachedEmbeddingFunction(embed, model="test", cache=EmbeddingCache(str(tmp_path / "e.sqlite3")),
+                                     batcher=EmbeddingBatcher(embed, batch_size=8, max_wait=0.0))
+    assert cached(["a", "bb"]) == [[1.0], [2.0]]
+    assert cached(["bb", "ccc", "a"]) == [[2.0], [3.0], [1.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
@@ -0,0 +1,74 @@
+import pytest
+from crewai import Task
+
+from sv_country_planner import estimator
+from sv_country_planner.estimator import (
+    DEFAULT_PROMPT_FACTOR, BudgetExceeded, TaskHistory, TaskRun, enforce_budget, estimate_run, interpolate,
+    rendered_prompts, task_context, trip_days,
+)
+from sv_country_planner.router import load_routing
+from sv_country_planner.tokens import count_tokens
+
+INPUTS = {"HomeCountry": "USA", "Country": "Indonesia", "StartDate": "10 December 2025",
+          "EndDate": "01 January 2026", "PreferredActivity": "Kayaking"}
+
+
+def tasks():
+    research = Task(name="country_research_task", description="Research.", expected_output="Report.")
+    planner = Task(name="country_planner_task", description="Plan.", expected_output="Plan.", context=[research])
+    final = Task(name="final_reporting_task", description="Report.", expected_output="Report.")
+    return [research, planner, final]
+
+
+def test_trip_days():
+    assert trip_days(INPUTS) == 23
+    assert trip_days({"StartDate": "2025-12-10", "EndDate": "10 Dec 2025"}) == 1
+    assert trip_days({"StartDate": "soon", "EndDate": "2026-01-01"}) is None
+
+
+def test_prompts_are_rendered_with_the_trip():
+    assert interpolate("{Country} from {HomeCountry} {Unknown}", INPUTS) == "Indonesia from USA {Unknown}"
+    prompts = rendered_prompts(INPUTS)
+    assert list(prompts)[0] == "country_research_task"
+    assert "Indonesia" in prompts["country_research_task"] and "{Country}" not in prompts["country_research_task"]
+
+
+def test_task_context_follows_the_crew():
+    assert task_context(tasks()) == {
+        "country_research_task": (),
+        "country_planner_task": ("country_research_task",),
+        "final_reporting_task": ("country_research_task", "country_planner_task"),
+    }
+
+
+def test_estimate_without_history_uses_the_defaults(tmp_path):
+    trip = estimate_run(INPUTS, model="gpt-4o-mini", tasks=tasks(), history=TaskHistory(str(tmp_path / "h.sqlite3")))
+    _, routes = load_routing()
+    research = trip.tasks[0]
+    rendered = count_tokens(rendered_prompts(INPUTS)["country_research_task"])
+    assert research.rendered_tokens == rendered
+    assert research.prompt_tokens == int(rendered * DEFAULT_PROMPT_FACTOR)
+    assert research.completion_tokens == routes["country_research_task"].expected_output_tokens
+    assert research.model == "gpt-4o-mini" and research.samples == 0
+    assert trip.days == 23 and trip.tokens > 0 and trip.cost > 0
+
+
+def test_planner_output_scales_with_the_days_of_past_runs(tmp_path):
+    history = TaskHistory(str(tmp_path / "h.sqlite3"))
+    for _ in range(3):
+        history.record("country_planner_task", "gpt-4o-mini", TaskRun(1000, 4000, 1000, 1000, 4, 20.0, days=10))
+        history.record("country_research_task", "gpt-4o-mini", TaskRun(1000, 6000, 1500, 800, 9, 60.0, days=10))
+    trip = estimate_run(INPUTS, model="gpt-4o-mini", tasks=tasks(), history=history)
+    research, planner = trip.tasks[0], trip.tasks[1]
+    assert research.output_tokens == 800 and research.samples == 3  # not a per-day task
+    assert planner.output_tokens == 2300 and planner.completion_tokens == 2300  # 100 per day, 23 days
+    assert planner.rendered_tokens == count_tokens(rendered_prompts(INPUTS)["country_planner_task"]) + 800
+
+
+def test_runs_over_budget_are_refused(monkeypatch, tmp_path):
+    trip = estimate_run(INPUTS, model="gpt-4o-mini", tasks=tasks(), history=TaskHistory(str(tmp_path / "h.sqlite3")))
+    enforce_budget(trip)  # no limits set
+    monkeypatch.setattr(estimator, "BUDGET_TOKENS", 1000)
+    assert trip.over_budget() == [f"{trip.tokens:,} tokens > TA_BUDGET_TOKENS=1,000"]
+    with pytest.raises(BudgetExceeded, match="over budget"):
+        enforce_budget(trip)
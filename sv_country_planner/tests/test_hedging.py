@@ -0,0 +1,69 @@
+import time
+from types import SimpleNamespace
+
+import litellm
+import pytest
+
+from sv_country_planner import hedging
+from sv_country_planner.hedging import hedge_stats, hedged_stream, percentile
+from sv_country_planner.llm import TravelLLM
+
+
+def chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    """litellm.completion streaming from fake models: 'slow' waits before its first token."""
+    calls = []
+
+    def completion(**params):
+        calls.append(params)
+
+        def stream():
+            if params["model"] == "slow":
+                time.sleep(0.5)
+            for word in ("Dry ", "season."):
+                yield chunk(word)
+            yield chunk(usage={"prompt_tokens": 12, "completion_tokens": 2, "total_tokens": 14})
+        return stream()
+
+    monkeypatch.setattr(litellm, "completion", completion)
+    monkeypatch.setattr(litellm, "callbacks", list(litellm.callbacks))  # set_callbacks replaces them
+    monkeypatch.setattr(hedging, "DEFAULT_DELAY", 0.05)
+    return calls
+
+
+def test_percentile():
+    assert percentile([], 95) is None
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([1.0, 2.0, 3.0], 100) == 3.0
+
+
+def test_slow_primary_is_hedged_and_usage_is_requested(completions):
+    chunks = []
+    before = hedge_stats.stats()
+    text, answered_by, usage = hedged_stream(TravelLLM(model="slow"), TravelLLM(model="fast"),
+                                             [{"role": "user", "content": "Weather?"}], chunks.append)
+    assert (text, answered_by.model, chunks) == ("Dry season.", "fast", ["Dry ", "season."])
+    assert usage["total_tokens"] == 14
+    assert all(params["stream_options"] == {"include_usage": True} for params in completions)
+    stats = hedge_stats.stats()
+    assert stats["hedged"] - before["hedged"] == 1
+    assert stats["secondary_wins"] - before["secondary_wins"] == 1
+
+
+def test_hedged_call_reports_usage_to_callbacks(completions):
+    class TokenCounter:
+        def __init__(self):
+            self.usage = []
+
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            self.usage.append(response_obj["usage"])
+
+    counter = TokenCounter()
+    llm = TravelLLM(model="fast", stream=True, hedge=TravelLLM(model="slow"))
+    assert llm._hedged_call([{"role": "user", "content": "Weather?"}], [counter], llm.hedge) == "Dry season."
+    assert counter.usage == [{"prompt_tokens": 12, "completion_tokens": 2, "total_tokens": 14}]
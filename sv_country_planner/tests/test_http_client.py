@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from sv_country_planner.http_client import PooledHTTPClient
+from sv_country_planner.rate_limit import set_limits
+
+
+def pooled_client(handler, upstream="test-http"):
+    set_limits(upstream, rate=1000, burst=100, max_concurrency=16)
+    http = PooledHTTPClient(per_host_limit=2)
+    http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return http
+
+
+def test_requests_from_threads_share_the_client():
+    http = pooled_client(lambda request: httpx.Response(200, json={"q": request.url.params["q"]}))
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda q: http.get(f"https://example.com/?q={q}", upstream="test-http"),
+                                  "abcdefgh"))
+    assert [response.json()["q"] for response in responses] == list("abcdefgh")
+    assert http.stats()["requests"] == 8
+
+
+def test_throttled_requests_are_retried_after_retry_after():
+    answers = [httpx.Response(429, headers={"retry-after": "0"}), httpx.Response(200, text="ok")]
+    http = pooled_client(lambda request: answers.pop(0), upstream="test-throttled")
+    response = http.post("https://google.serper.dev/search", json={"q": "bali"}, upstream="test-throttled")
+    assert (response.status_code, response.text) == (200, "ok")
+    assert http.stats()["throttled"] == 1
+
+
+def test_throttled_requests_give_up_after_max_retries():
+    http = pooled_client(lambda request: httpx.Response(503, headers={"retry-after": "0"}), upstream="test-down")
+    http.max_retries = 1
+    assert http.get("https://example.com/", upstream="test-down").status_code == 503
+    assert http.stats()["requests"] == 2
+
+
+def test_per_host_limit():
+    running, peak = 0, 0
+
+    async def handler(request):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return httpx.Response(200)
+
+    http = pooled_client(handler, upstream="test-host")
+
+    async def fetch_all():
+        await asyncio.gather(*(http.arequest("GET", "https://example.com/", upstream="test-host")
+                               for _ in range(6)))
+
+    http.run(fetch_all())
+    assert peak == 2
+
+
+def streaming_client(pieces, produced, upstream="test-stream"):
+    async def body():
+        for piece in pieces:
+            produced.append(piece)
+            yield piece
+
+    return pooled_client(lambda request: httpx.Response(200, content=body()), upstream=upstream)
+
+
+def test_stream_is_capped():
+    http = streaming_client([b"abcd"] * 10, [])
+    response = http.stream("GET", "https://example.com/", max_bytes=10, upstream="test-stream")
+    assert response.status_code == 200
+    assert b"".join(response) == b"abcdabcdab"
+
+
+def test_stream_waits_for_a_slow_reader():
+    produced = []
+    http = streaming_client([bytes([n]) * 1000 for n in range(100)], produced)
+    http.stream_buffer = 4
+    response = http.stream("GET", "https://example.com/", upstream="test-stream")
+    pieces = iter(response)
+    next(pieces)
+    time.sleep(0.1)
+    assert len(produced) <= 1 + http.stream_buffer + 1
+    response.close()
+    time.sleep(0.05)
+    assert len(produced) < 100
+    assert list(pieces) == []
+
+
+def test_stream_raises_for_error_statuses():
+    http = pooled_client(lambda request: httpx.Response(404), upstream="test-404")
+    with pytest.raises(httpx.HTTPStatusError):
+        http.stream("GET", "https://example.com/missing", upstream="test-404")
@@ -0,0 +1,54 @@
+from sv_country_planner.llm import TravelLLM
+from sv_country_planner.llm_cache import (
+    CachedCompletion, LLMCache, canonical_messages, completion_key, uncached_completions,
+)
+
+MESSAGES = [{"role": "system", "content": "You are a travel researcher."},
+            {"role": "user", "content": "Weather in Bali in December?  \r\n"}]
+
+
+def test_messages_are_canonicalized():
+    assert canonical_messages("hi") == [{"role": "user", "content": "hi"}]
+    assert canonical_messages(MESSAGES)[1] == {"role": "user", "content": "Weather in Bali in December?"}
+
+
+def test_key_depends_on_model_params_and_messages():
+    key = completion_key("gpt-4o-mini", {"temperature": 0}, MESSAGES)
+    same = [dict(m, content=m["content"].strip()) for m in MESSAGES]
+    assert completion_key("gpt-4o-mini", {"temperature": 0}, same) == key
+    assert completion_key("gpt-4o", {"temperature": 0}, MESSAGES) != key
+    assert completion_key("gpt-4o-mini", {"temperature": 0.7}, MESSAGES) != key
+    assert completion_key("gpt-4o-mini", {"temperature": 0}, MESSAGES[1:]) != key
+
+
+def test_put_get_and_expiry(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    completion = CachedCompletion("Rainy season.", ["Rainy ", "season."], 20, 3, 1.5)
+    assert cache.get("k") is None
+    cache.put("k", "gpt-4o-mini", completion)
+    assert cache.get("k") == completion
+    cache.put("old", "gpt-4o-mini", completion, ttl=-1)
+    assert cache.get("old") is None
+    assert cache.purge_expired() == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"], stats["entries"]) == (1, 2, 2, 1)
+    assert stats["saved_prompt_tokens"] == 20 and stats["saved_seconds"] == 1.5
+
+
+def test_cache_is_off_by_default():
+    assert not TravelLLM(model="gpt-4o-mini", temperature=0).caches()
+
+
+def test_only_unsampled_plain_completions_are_cached():
+    llm = TravelLLM(model="gpt-4o-mini", temperature=0, cache_completions=True)
+    assert llm.caches()
+    assert not llm.caches(tools=[{"type": "function"}])
+    assert not TravelLLM(model="gpt-4o-mini", temperature=0.7, cache_completions=True).caches()
+    assert not TravelLLM(model="gpt-4o-mini", cache_completions=True).caches()  # the provider's default samples
+
+
+def test_test_and_train_bypass_the_cache():
+    llm = TravelLLM(model="gpt-4o-mini", temperature=0, cache_completions=True)
+    with uncached_completions():
+        assert not llm.caches()
+    assert llm.caches()
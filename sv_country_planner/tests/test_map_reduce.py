@@ -0,0 +1,57 @@
+import logging
+from functools import partial
+
+import pytest
+from crewai import Agent, Task
+
+from sv_country_planner import map_reduce
+from sv_country_planner.map_reduce import MapReduceAgent, map_reduce_stats, merge_outputs, shard_descriptions
+
+DESCRIPTION = """Research {Country}.
+<sections>
+<section> Basics about {Country} - Gather the facts. </section>
+<section> Weather- Gather the weather between {StartDate} and {EndDate}. </section>
+<section> Food - Gather the dishes. </section>
+</sections>
+Report every section."""
+
+
+def test_sections_are_split_into_shards():
+    shards = shard_descriptions(DESCRIPTION, per_shard=2)
+    assert [shard["sections"] for shard in shards] == [["Basics", "Weather"], ["Food"]]
+    assert "Food" not in shards[0]["description"] and "Research {Country}." in shards[1]["description"]
+    assert "sections 3 to 3 of 3" in shards[1]["description"]
+    assert shard_descriptions("No sections here.") == [{"description": "No sections here.", "sections": []}]
+
+
+def test_shard_reports_keep_the_first_title_only():
+    assert merge_outputs(["# Bali\n\n## Basics\n\nIsland.", "# Bali\n\n## Food\n\nRice.", ""]) == \
+        "# Bali\n\n## Basics\n\nIsland.\n\n## Food\n\nRice."
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(map_reduce, "ENABLED", True)
+    monkeypatch.setattr(map_reduce, "shard_descriptions", partial(shard_descriptions, per_shard=2))
+
+    def execute_task(self, task, context=None, tools=None):
+        if "Food" in task.description:
+            raise RuntimeError("rate limited")
+        return "# Bali\n\n## Basics\n\nIsland.\n\n## Weather\n\nDry."
+
+    monkeypatch.setattr(Agent, "execute_task", execute_task)
+    return MapReduceAgent(role="Researcher", goal="Research", backstory="Travels", llm="gpt-4o-mini")
+
+
+def test_failed_shard_is_logged_and_counted(agent, caplog):
+    task = Task(name="country_research_task", description=DESCRIPTION, expected_output="A report.", agent=agent)
+    before = map_reduce_stats.stats()
+    with caplog.at_level(logging.WARNING, logger="sv_country_planner.map_reduce"):
+        output = agent.execute_task(task)
+    assert output == "# Bali\n\n## Basics\n\nIsland.\n\n## Weather\n\nDry.\n\n## Food\n\nNULL"
+    assert "country_research_task (Food) failed" in caplog.text
+    stats = map_reduce_stats.stats()
+    assert stats["shards"] - before["shards"] == 2
+    assert stats["failed_shards"] - before["failed_shards"] == 1
+    assert stats["null_sections"] - before["null_sections"] == 1
+    assert stats["recent_failures"][-1] == {"shard": "country_research_task (Food)", "error": "RuntimeError: rate limited"}
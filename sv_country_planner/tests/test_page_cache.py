@@ -0,0 +1,33 @@
+from sv_country_planner.tools.page_cache import PageCache
+
+URL = "https://en.wikipedia.org/wiki/Bali"
+
+
+def test_captured_page_is_stored_once_complete(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    pieces = cache.capture(URL, iter([b"<p>Bali", b"</p>"]), {"etag": '"v1"'})
+    assert next(pieces) == b"<p>Bali"
+    assert cache.get(URL) is None
+    assert list(pieces) == [b"</p>"]
+    page = cache.get(URL)
+    assert (page.body, page.size) == (b"<p>Bali</p>", 11)
+    assert page.conditional_headers() == {"If-None-Match": '"v1"'}
+
+
+def test_pages_without_validators_are_not_stored(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    assert list(cache.capture(URL, [b"body"], {})) == [b"body"]
+    assert cache.get(URL) is None
+
+
+def test_not_modified_counts_bytes_saved_and_updates_validators(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    list(cache.capture(URL, [b"x" * 100], {"last-modified": "Mon, 01 Dec 2025 00:00:00 GMT"}))
+    page = cache.get(URL)
+    cache.revalidated(page, 304, 0.02, {"etag": '"v2"'})
+    cache.revalidated(page, 200, 0.04, {})
+    assert cache.get(URL).conditional_headers() == {"If-None-Match": '"v2"',
+                                                    "If-Modified-Since": "Mon, 01 Dec 2025 00:00:00 GMT"}
+    stats = cache.stats()
+    assert (stats["revalidations"], stats["not_modified"], stats["bytes_saved"]) == (2, 1, 100)
+    assert stats["avg_revalidation_ms"] == 30.0
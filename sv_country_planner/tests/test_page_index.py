@@ -0,0 +1,55 @@
+import threading
+import time
+
+from sv_country_planner.tools.page_index import COLLECTION, PageIndex, store_write_lock, website_store_config
+
+
+def test_pages_are_fresh_until_recheck(tmp_path):
+    index = PageIndex(str(tmp_path / "pages.sqlite3"), recheck_after=60)
+    url = "https://en.wikipedia.org/wiki/Bali"
+    assert not index.is_fresh(url)
+    index.mark_indexed(url, "hash-1")
+    assert index.is_fresh(url)
+    assert not PageIndex(str(tmp_path / "pages.sqlite3"), recheck_after=0).is_fresh(url)
+
+
+def test_unchanged_content_is_not_indexed_again(tmp_path):
+    index = PageIndex(str(tmp_path / "pages.sqlite3"))
+    url = "https://en.wikipedia.org/wiki/Bali"
+    assert not index.is_unchanged(url, "hash-1")
+    index.mark_indexed(url, "hash-1")
+    assert index.is_unchanged(url, "hash-1")
+    assert not index.is_unchanged(url, "hash-2")
+    assert index.touch(url) and not index.touch("https://example.com")
+    assert index.stats() == {"pages": 1, "indexed": 1, "fresh_skips": 0, "unchanged_skips": 2}
+
+
+def test_index_is_shared_through_the_file(tmp_path):
+    PageIndex(str(tmp_path / "pages.sqlite3")).mark_indexed("https://example.com", "hash")
+    assert PageIndex(str(tmp_path / "pages.sqlite3")).is_unchanged("https://example.com", "hash")
+
+
+def test_store_config(tmp_path, monkeypatch):
+    config = website_store_config(str(tmp_path))
+    assert config["vectordb"]["config"] == {"collection_name": COLLECTION, "dir": str(tmp_path)}
+    monkeypatch.setenv("TA_VECTOR_STORE", "0")
+    assert website_store_config() is None
+
+
+def test_store_writes_are_serialized(tmp_path):
+    lock_path = str(tmp_path / "vectors.lock")
+    inside, overlaps = [], []
+
+    def write():
+        with store_write_lock(lock_path):
+            overlaps.append(bool(inside))
+            inside.append(1)
+            time.sleep(0.01)
+            inside.pop()
+
+    threads = [threading.Thread(target=write) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == [False] * 5
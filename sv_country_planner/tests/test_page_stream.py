@@ -0,0 +1,43 @@
+from sv_country_planner.tools.page_stream import chunk_paragraphs, chunk_sections, page_paragraphs
+
+PAGE = """<html><head><title>Bali</title><script>var x = "<p>not text</p>";</script></head><body>
+<nav><a href="/">Home</a></nav>
+<div class="cookie-banner">We use cookies</div>
+<h1>Bali</h1><p>An island of &amp; Indonesia.</p>
+<h2>Climate</h2><p>Tropical.</p><div aria-hidden="true">hidden</div>
+<h3>Rainy season</h3><p>November to March.</p>
+<h2>Food</h2><ul><li>Nasi goreng</li><li>Babi guling</li></ul>
+<footer>Copyright</footer></body></html>"""
+
+
+def test_page_paragraphs_strip_boilerplate_and_keep_headings():
+    # Fed in small pieces, as a streamed page arrives, with a multi-byte character split between two.
+    data = PAGE.replace("Tropical", "Tropical ☀").encode("utf-8")
+    paragraphs = list(page_paragraphs(data[i:i + 7] for i in range(0, len(data), 7)))
+    assert paragraphs == [
+        ((), "Bali"),  # the <title>
+        (("Bali",), "Bali"),
+        (("Bali",), "An island of & Indonesia."),
+        (("Bali", "Climate"), "Climate"),
+        (("Bali", "Climate"), "Tropical ☀."),
+        (("Bali", "Climate", "Rainy season"), "Rainy season"),
+        (("Bali", "Climate", "Rainy season"), "November to March."),
+        (("Bali", "Food"), "Food"),
+        (("Bali", "Food"), "Nasi goreng"),
+        (("Bali", "Food"), "Babi guling"),
+    ]
+
+
+def test_chunk_paragraphs_packs_and_splits():
+    assert list(chunk_paragraphs(["aaa", "bbb", "ccc"], chunk_size=8)) == ["aaa\nbbb", "ccc"]
+    assert list(chunk_paragraphs(["one two three four"], chunk_size=8)) == ["one two", "three", "four"]
+
+
+def test_chunk_sections_do_not_span_headings_and_carry_short_ones():
+    paragraphs = [(("Bali",), "Bali"), (("Bali", "Climate"), "x" * 30), (("Bali", "Climate"), "y" * 30),
+                  (("Bali", "Food"), "z" * 30)]
+    assert list(chunk_sections(paragraphs, chunk_size=40, min_size=10)) == [
+        (("Bali", "Climate"), "Bali\n" + "x" * 30),
+        (("Bali", "Climate"), "y" * 30),
+        (("Bali", "Food"), "z" * 30),
+    ]
@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+import pytest
+
+from sv_country_planner import prefetch
+from sv_country_planner.prefetch import prefetch_sections, section_queries
+from sv_country_planner.tools.search_cache import SearchCache
+from sv_country_planner.tools.travel_tools import TravelSearchTool
+
+INPUTS = {"HomeCountry": "USA", "Country": "Indonesia", "StartDate": "10 December 2025",
+          "EndDate": "01 January 2026", "PreferredActivity": "Kayaking"}
+
+
+class FakeHTTP:
+    """Answers every Serper POST with one organic result about the query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def run(self, coroutine):
+        return asyncio.run(coroutine)
+
+    async def arequest(self, method, url, json=None, **kwargs):
+        self.queries.append(json["q"])
+        return httpx.Response(200, json={"organic": [{"title": json["q"], "link": "https://example.com"}]},
+                              request=httpx.Request(method, url))
+
+
+@pytest.fixture
+def tool(tmp_path):
+    tool = TravelSearchTool()
+    tool._cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    return tool
+
+
+def test_section_queries():
+    queries = {section.name: (query, topic) for section, query, topic in section_queries(INPUTS)}
+    assert queries["Weather"] == ("Weather Indonesia December 2025 January 2026", "Indonesia")
+    assert all(topic == "Indonesia" and "Indonesia" in query for query, topic in queries.values())
+
+
+def test_prefetch_fills_and_arms_the_cache(tool, monkeypatch):
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    http = FakeHTTP()
+    monkeypatch.setattr(prefetch, "shared_http_client", lambda: http)
+    first = prefetch_sections(INPUTS, tool)
+    assert first["fetched"] == first["queries"] == len(http.queries) > 0
+    second = prefetch_sections(INPUTS, tool)
+    assert (second["already_cached"], second["fetched"]) == (second["queries"], 0)
+    params = tool.cache_params(tool.search_type)
+    assert tool.cache.take_prefetched("what is the weather like in indonesia", **params) is not None
+
+
+def test_prefetch_without_a_serper_key_is_skipped(tool, monkeypatch):
+    monkeypatch.delenv("SERPER_API_KEY", raising=False)
+    monkeypatch.setattr(prefetch, "shared_http_client", lambda: pytest.fail("no request without a key"))
+    cached_query = section_queries(INPUTS)[0][1]
+    tool.cache.put(cached_query, {"organic": []}, **tool.cache_params(tool.search_type))
+    stats = prefetch_sections(INPUTS, tool)
+    assert stats["skipped"] == "SERPER_API_KEY is not set"
+    assert (stats["already_cached"], stats["fetched"]) == (1, 0)
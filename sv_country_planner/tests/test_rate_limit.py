@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from sv_country_planner.rate_limit import AdaptiveLimiter, limiter_for, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(later) <= 30
+
+
+def test_token_bucket_holds_the_rate_after_the_burst():
+    limiter = AdaptiveLimiter("test", rate=20, burst=2, max_concurrency=10)
+    started = time.monotonic()
+    for _ in range(4):
+        with limiter.slot():
+            pass
+    # Two requests from the burst, then one every 1/20 s.
+    assert 0.08 <= time.monotonic() - started < 0.5
+    assert limiter.stats()["acquired"] == 4
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_a_rate_of_zero_is_no_rate_limit(rate):
+    limiter = AdaptiveLimiter("test", rate=rate, burst=1, max_concurrency=4)
+    started = time.monotonic()
+    for _ in range(50):
+        with limiter.slot():
+            pass
+    assert time.monotonic() - started < 0.5
+    with limiter.slot() as outcome:
+        outcome["status"] = 429  # throttled without a Retry-After
+    assert limiter.stats()["paused_for_s"] > 0
+
+
+def test_concurrency_limit():
+    limiter = AdaptiveLimiter("test", rate=1000, burst=100, max_concurrency=2)
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def call():
+        nonlocal running, peak
+        with limiter.slot():
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+
+
+def test_throttle_halves_the_limits_and_pauses_everyone():
+    limiter = AdaptiveLimiter("test", rate=10, burst=5, max_concurrency=8)
+    with limiter.slot() as outcome:
+        outcome["status"], outcome["retry_after"] = 429, 0.2
+    stats = limiter.stats()
+    assert (stats["concurrency_limit"], stats["rate_per_s"], stats["throttled"]) == (4, 7, 1)
+    started = time.monotonic()
+    asyncio.run(limiter.aacquire())
+    assert time.monotonic() - started >= 0.15
+    limiter.release()
+    assert limiter.stats()["concurrency_limit"] > 4
+
+
+def test_upstreams_share_one_limiter():
+    assert limiter_for("web:example.com") is limiter_for("web:example.com")
+    assert limiter_for("web:example.com") is not limiter_for("web:example.org")
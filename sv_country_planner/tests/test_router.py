@@ -0,0 +1,59 @@
+import pytest
+
+from sv_country_planner.router import DEFAULT_ROUTE, MIN_SAMPLES, ModelRouter, ModelSpec, Route, load_routing
+from sv_country_planner.sections import all_section_names
+
+MODELS = {name: ModelSpec(name, input_cost=cost, output_cost=cost)
+          for name, cost in (("fast", 0.05), ("big", 10.0), ("mid", 0.2))}
+
+
+def router(**routes):
+    return ModelRouter(MODELS, {DEFAULT_ROUTE: Route(DEFAULT_ROUTE, ("mid", "fast")), **routes})
+
+
+def test_shipped_table_routes_per_task():
+    models, routes = load_routing()
+    assert DEFAULT_ROUTE in routes and "final_reporting_task" in routes
+    # Section routes only apply to shards whose sections all share one; the table has none.
+    assert not set(routes) & set(all_section_names())
+    assert all(model in models for route in routes.values() for model in route.models)
+
+
+@pytest.mark.parametrize("routes, error", [
+    ("routes:\n  default:\n    models: [unknown]\n", "missing from 'models'"),
+    ("routes:\n  other:\n    models: [m]\n", "no 'default' route"),
+    ("routes:\n  default:\n    models: []\n", "lists no models"),
+])
+def test_bad_tables_are_refused(tmp_path, routes, error):
+    path = tmp_path / "models.yaml"
+    path.write_text("models:\n  m:\n    input_cost: 1\n" + routes)
+    with pytest.raises(ValueError, match=error):
+        load_routing(str(path))
+
+
+def test_route_for_shard_task_and_default():
+    facts = Route("Language", ("fast",), max_p95_seconds=15)
+    routes = router(country_research_task=Route("country_research_task", ("fast", "mid")),
+                    Language=facts, Holidays=Route("Holidays", ("fast",), max_p95_seconds=15),
+                    Weather=Route("Weather", ("mid",)))
+    assert routes.route_for("country_research_task", ("Language", "Holidays")) is facts
+    assert routes.route_for("country_research_task", ("Language", "Weather")).name == "country_research_task"
+    assert routes.route_for("country_research_task", ("Language", "Food")).name == "country_research_task"
+    assert routes.route_for("city_planner_task").name == DEFAULT_ROUTE
+    assert routes.route_for().name == DEFAULT_ROUTE
+
+
+def test_slow_failed_and_costly_models_go_last():
+    routes = router()
+    route = Route("r", ("big", "mid", "fast"), max_p95_seconds=10, max_cost_per_call=0.01,
+                  expected_output_tokens=1000)
+    assert routes.candidates(route, prompt_tokens=1000) == ["mid", "fast", "big"]  # big costs 0.02
+    for _ in range(MIN_SAMPLES):
+        routes.record("mid", 30.0, 1000, 200)
+    assert routes.candidates(route, prompt_tokens=1000) == ["fast", "big", "mid"]
+    routes.record_failure("fast")
+    assert routes.candidates(route, prompt_tokens=1000)[-1] == "fast"
+    assert routes.decisions["r"] == {"mid": 1, "fast": 1, "big": 1}
+    stats = routes.stats()
+    assert stats["fallbacks"] == 1
+    assert stats["models"]["mid"]["calls"] == MIN_SAMPLES and stats["models"]["fast"]["failures"] == 1
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from crewai.utilities.constants import NOT_SPECIFIED
+
+from sv_country_planner.scheduler import (
+    DagScheduler, TaskTiming, critical_path, dag_stats, dependencies, partial_outputs,
+)
+
+
+def fake_task(name, context=NOT_SPECIFIED, seconds=0.05, partial=None):
+    return SimpleNamespace(id=uuid.uuid4(), name=name, context=context, tools=[], description=name,
+                           expected_output="", agent=None, seconds=seconds, partial=partial)
+
+
+class FakeCrew:
+    """The crew steps DagScheduler uses, recording when each task starts and finishes."""
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.events = []
+        self._lock = threading.Lock()
+        for task in tasks:
+            task.execute_sync = lambda task=task, **kwargs: self._execute(task, **kwargs)
+
+    def _log(self, *event):
+        with self._lock:
+            self.events.append(event)
+
+    def _execute(self, task, agent, context, tools):
+        self._log("start", task.name, context)
+        if task.partial is not None:
+            partial_outputs.publish(task, "first shards", task.partial)
+        time.sleep(task.seconds)
+        partial_outputs.clear(task)
+        self._log("end", task.name)
+        return f"output of {task.name}"
+
+    def _get_agent_to_use(self, task):
+        return SimpleNamespace(role="agent", tools=[])
+
+    def _prepare_tools(self, agent, task, tools):
+        return tools
+
+    def _log_task_start(self, task, role):
+        pass
+
+    def _get_context(self, task, outputs):
+        return " | ".join(outputs)
+
+    def _process_task_result(self, task, output):
+        pass
+
+    def _store_execution_log(self, task, output, index, was_replayed):
+        pass
+
+    def position(self, kind, name):
+        return next(i for i, event in enumerate(self.events) if event[:2] == (kind, name))
+
+
+def test_dependencies():
+    a, b = fake_task("a"), fake_task("b", context=[])
+    c = fake_task("c", context=[b, a, fake_task("elsewhere")])
+    d = fake_task("d")
+    assert dependencies([a, b, c, d]) == {0: [], 1: [], 2: [0, 1], 3: [0, 1, 2]}
+
+
+def test_critical_path():
+    timings = [TaskTiming("a", 0, 0, 1), TaskTiming("b", 0, 0, 3), TaskTiming("c", 3, 3, 4),
+               TaskTiming("d", 1, 1, 2)]
+    needs = {0: [], 1: [], 2: [0, 1], 3: [0]}
+    assert critical_path(timings, needs) == [1, 2]
+    assert critical_path([], {}) == []
+
+
+def test_tasks_run_in_dag_order_and_in_parallel():
+    a = fake_task("a", context=[], seconds=0.2)
+    b = fake_task("b", context=[], seconds=0.2)
+    c = fake_task("c", context=[a, b])
+    d = fake_task("d", context=[c])
+    crew = FakeCrew([a, b, c, d])
+    started = time.perf_counter()
+    outputs = DagScheduler(crew, workers=2).run()
+    assert outputs == ["output of a", "output of b", "output of c", "output of d"]
+    # a and b overlap; c waits for both, d for c.
+    assert max(crew.position("start", "a"), crew.position("start", "b")) < \
+        min(crew.position("end", "a"), crew.position("end", "b"))
+    assert crew.position("start", "c") > max(crew.position("end", "a"), crew.position("end", "b"))
+    assert crew.position("start", "d") > crew.position("end", "c")
+    assert ("start", "c", "output of a | output of b") in crew.events
+    assert time.perf_counter() - started < 0.6
+
+
+def test_run_is_logged_and_kept_in_stats(caplog):
+    a = fake_task("a", context=[])
+    b = fake_task("b", context=[a])
+    runs = dag_stats.stats()["runs"]
+    with caplog.at_level(logging.INFO, logger="sv_country_planner.scheduler"):
+        DagScheduler(FakeCrew([a, b]), workers=2).run()
+    assert "critical path a -> b" in caplog.text
+    stats = dag_stats.stats()
+    assert stats["runs"] == runs + 1
+    assert stats["last_run"]["critical_path"] == ["a", "b"]
+    assert set(stats["last_run"]["tasks"]) == {"a", "b"}
+
+
+def test_workers_bound_the_tasks_running_at_once():
+    tasks = [fake_task(name, context=[], seconds=0.1) for name in "abc"]
+    crew = FakeCrew(tasks)
+    DagScheduler(crew, workers=1).run()
+    kinds = [event[0] for event in crew.events]
+    assert kinds == ["start", "end"] * 3
+
+
+def test_task_starts_on_partial_context_output():
+    research = fake_task("country_research_task", context=[], seconds=0.5, partial=0.6)
+    planner = fake_task("country_planner_task", context=[research], seconds=0.05)
+    crew = FakeCrew([research, planner])
+    DagScheduler(crew, workers=2, partial_fraction=0.5).run()
+    assert crew.position("start", "country_planner_task") < crew.position("end", "country_research_task")
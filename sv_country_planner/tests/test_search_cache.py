@@ -0,0 +1,55 @@
+from sv_country_planner.tools.search_cache import DAY, HOUR, SearchCache, normalize_query, ttl_for_section
+
+
+def test_normalize_query():
+    assert normalize_query('  "Bali"  Weather,  in DECEMBER? ') == "bali weather in december"
+
+
+def test_ttl_follows_the_section():
+    assert ttl_for_section("Recent News") == 3 * HOUR
+    assert ttl_for_section("Local History") == 90 * DAY
+    assert ttl_for_section(None) == ttl_for_section("Not a section") == 7 * DAY
+
+
+def test_hit_miss_and_params(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    assert cache.get("bali weather", n=10) is None
+    cache.put("Bali weather", {"organic": [1]}, n=10)
+    assert cache.get("  bali WEATHER ", n=10) == {"organic": [1]}
+    assert cache.get("bali weather", n=5) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 2, 1)
+
+
+def test_expired_entries_are_misses_and_purged(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    cache.put("bali weather", {"organic": []}, ttl=-1)
+    assert not cache.contains("bali weather")
+    assert cache.get("bali weather") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.purge_expired() == 1
+
+
+def test_prefetched_entry_is_handed_out_once_and_counted_once(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    cache.put("Indonesia weather December", {"organic": ["prefetched"]}, topic="Indonesia", prefetched=True)
+    # The agent phrases the query its own way.
+    assert cache.lookup("what is the weather like in indonesia in winter") == {"organic": ["prefetched"]}
+    assert cache.lookup("weather indonesia december rain") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["prefetch_hits"]) == (1, 1, 1)
+
+
+def test_prefetched_entry_needs_the_topic_and_section(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    cache.put("Indonesia weather December", {"organic": []}, topic="Indonesia", prefetched=True)
+    assert cache.take_prefetched("weather in malaysia") is None
+    assert cache.take_prefetched("indonesia") is None  # no section
+
+
+def test_arm_prefetched_marks_a_cached_entry(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    cache.put("Indonesia weather December", {"organic": ["cached"]})
+    assert cache.take_prefetched("indonesia weather") is None
+    cache.arm_prefetched("Indonesia weather December", None, "Indonesia")
+    assert cache.take_prefetched("indonesia weather") == {"organic": ["cached"]}
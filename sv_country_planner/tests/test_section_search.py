@@ -0,0 +1,49 @@
+import pytest
+
+from sv_country_planner.tools.embedders import website_app
+from sv_country_planner.tools.page_stream import index_page
+from sv_country_planner.tools.section_search import format_chunks, search_chunks
+
+URL = "https://en.wikipedia.org/wiki/Bali"
+PAGE = """<h1>Bali</h1>
+<h2>Climate</h2><p>Bali has a tropical climate. The rainy season runs from November to March, with heavy
+afternoon rain and high humidity; the dry season from April to October is sunny, with cooler nights in the
+highlands around Ubud and Kintamani, and the best diving visibility along the north and east coasts.</p>
+<h2>Cuisine</h2><p>Balinese food is built on rice, with dishes such as babi guling and lawar, and spicy
+sambal served alongside fish, chicken and vegetables at warungs; night markets in Denpasar and Gianyar sell
+satay, martabak and sweet rice cakes until late, and cooking classes in Ubud start at the morning market.</p>
+<h2>Transport</h2><p>Most visitors rent a scooter or hire a driver; there is no railway, and buses between
+the towns are infrequent, so plan extra time for the rainy season traffic. Fast boats leave Sanur and Padang
+Bai for the Gili islands and Nusa Penida several times a day, and ride-hailing apps work in the south.</p>"""
+
+
+@pytest.fixture
+def app(tmp_path):
+    config = {"app": {"config": {"id": "test", "collect_metrics": False}},
+              "vectordb": {"provider": "chroma", "config": {"collection_name": "pages", "dir": str(tmp_path)}}}
+    app = website_app(config, "hashing")
+    assert index_page(app, URL, [PAGE.encode("utf-8")], chunk_size=400) is not None
+    return app
+
+
+def test_chunks_carry_headings_and_section(app):
+    metadatas = app.db.collection.get(include=["metadatas"])["metadatas"]
+    assert {(m["headings"], m["section"]) for m in metadatas} >= {("Bali > Climate", "Weather")}
+
+
+def test_lookup_favours_the_section_the_query_names(app):
+    chunks = search_chunks(app, "weather in Bali during the rainy season", k=3)
+    assert chunks[0].section == "Weather"
+    # Off-section chunks only stay if they beat the section's best chunk.
+    assert all(chunk.section == "Weather" for chunk in chunks)
+    assert format_chunks(chunks).startswith("Relevant Content:\n[Bali > Climate]\nBali\nClimate\nBali has a tropical")
+
+
+def test_lookup_is_limited_to_the_page_asked_for(app):
+    assert search_chunks(app, "weather", url="https://example.com/not-indexed", k=2)
+    assert search_chunks(app, "weather", url=URL, k=2)[0].url == URL
+
+
+def test_reindexing_a_page_drops_chunks_it_no_longer_has(app):
+    index_page(app, URL, [b"<h1>Bali</h1><h2>Climate</h2><p>Tropical.</p>"], chunk_size=400)
+    assert [m["headings"] for m in app.db.collection.get(include=["metadatas"])["metadatas"]] == ["Bali > Climate"]
@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from sv_country_planner import seed_sites
+from sv_country_planner.seed_sites import SEEDED_NOTE, seed_queries, seeded_sites, site_scope, with_seed_note
+from sv_country_planner.tools.search_cache import SearchCache
+from sv_country_planner.tools.travel_tools import TravelSearchTool
+
+INPUTS = {"Country": "Indonesia"}
+CONFIG = {"description": "Research {Country}.\n"}
+
+
+class FakeSerper:
+    """Answers a 'site:' search with two pages of that site and one of another."""
+
+    def run(self, coroutine):
+        return asyncio.run(coroutine)
+
+    async def arequest(self, method, url, json=None, **kwargs):
+        scope = json["q"].split("site:")[1]
+        links = [f"https://{scope}/indonesia/{n}" for n in range(3)] + ["https://other.com"]
+        organic = [{"title": link, "link": link, "snippet": "", "position": n} for n, link in enumerate(links)]
+        return httpx.Response(200, json={"organic": organic}, request=httpx.Request(method, url))
+
+
+@pytest.fixture
+def search_tool(tmp_path):
+    tool = TravelSearchTool()
+    tool._cache = SearchCache(str(tmp_path / "search.sqlite3"))
+    return tool
+
+
+def indexed_links():
+    links = []
+    return links, SimpleNamespace(add_many=lambda pages, concurrency: links.extend(pages) or len(pages))
+
+
+def test_site_scope():
+    assert site_scope("https://www.cia.gov/the-world-factbook/countries") == "cia.gov/the-world-factbook/countries"
+    assert site_scope("https://travel.state.gov/content/travel/en/traveladvisories/traveladvisories.html") == \
+        "travel.state.gov/content/travel/en/traveladvisories"
+
+
+def test_seed_queries():
+    queries = dict(seed_queries(INPUTS))
+    assert queries["lonelyplanet.com"] == "Indonesia site:lonelyplanet.com"
+    assert len(queries) == len(set(queries.values()))
+
+
+def test_seeding_indexes_the_best_pages_of_each_site(search_tool, monkeypatch):
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    monkeypatch.setattr(seed_sites, "shared_http_client", FakeSerper)
+    links, website_tool = indexed_links()
+    with seeded_sites(INPUTS, search_tool, website_tool, pages_per_site=2) as stats:
+        assert with_seed_note(CONFIG)["description"].endswith(SEEDED_NOTE + "\n")
+    assert stats["pages_indexed"] == len(links) == 2 * stats["sites"]
+    assert "https://lonelyplanet.com/indonesia/1" in links and "https://other.com" not in links
+    assert with_seed_note(CONFIG) is CONFIG
+
+
+def test_seeding_without_a_serper_key_uses_cached_searches_only(search_tool, monkeypatch):
+    monkeypatch.delenv("SERPER_API_KEY", raising=False)
+    monkeypatch.setattr(seed_sites, "shared_http_client", FakeSerper)
+    params = search_tool.cache_params(search_tool.search_type)
+    search_tool.cache.put("Indonesia site:lonelyplanet.com",
+                          {"organic": [{"link": "https://www.lonelyplanet.com/indonesia"}]}, **params)
+    links, website_tool = indexed_links()
+    with seeded_sites(INPUTS, search_tool, website_tool) as stats:
+        assert SEEDED_NOTE in with_seed_note(CONFIG)["description"]
+    assert links == ["https://www.lonelyplanet.com/indonesia"]
+    assert stats["failed"] == stats["sites"] - 1
+
+
+def test_no_note_when_nothing_was_indexed(search_tool, monkeypatch):
+    monkeypatch.delenv("SERPER_API_KEY", raising=False)
+    monkeypatch.setattr(seed_sites, "shared_http_client", FakeSerper)
+    with seeded_sites(INPUTS, search_tool, indexed_links()[1]) as stats:
+        assert with_seed_note(CONFIG) is CONFIG
+    assert stats["pages_indexed"] == 0
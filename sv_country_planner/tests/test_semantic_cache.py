@@ -0,0 +1,104 @@
+import json
+import re
+
+import pytest
+
+from sv_country_planner.llm_cache import CachedCompletion
+from sv_country_planner.map_reduce import shard_descriptions
+from sv_country_planner.sections import TASKS_CONFIG, _load_tasks, prompt_placeholders, prompt_sections
+from sv_country_planner.semantic_cache import CONTEXT_MARKER, SemanticCache, prompt_scope
+from sv_country_planner.tools.embedders import HashingEmbedder
+
+INPUTS = {"HomeCountry": "USA", "Country": "Oman", "StartDate": "10 December 2025",
+          "EndDate": "01 January 2026", "PreferredActivity": "Kayaking"}
+
+
+def task_prompt(name, inputs=INPUTS):
+    task = _load_tasks(TASKS_CONFIG)[name]
+    text = f"{task['description']}\n\n{task['expected_output']}"
+    return re.sub(r"\{(\w+)\}", lambda m: inputs.get(m.group(1), m.group(0)), text)
+
+
+def scoped_inputs(scope):
+    return json.loads(scope)[-1]
+
+
+def test_task_prompt_depends_on_its_placeholders_only():
+    prompt = task_prompt("country_research_task") + "\n\nI like Kayaking."
+    scope, masked = prompt_scope("gpt-4o-mini", {}, [{"role": "user", "content": prompt}], INPUTS)
+    assert "PreferredActivity" not in scoped_inputs(scope)
+    assert scoped_inputs(scope)["Country"] == "Oman"
+    assert "I like {PreferredActivity}." in masked
+
+
+def test_masking_is_whole_words_only():
+    prompt = task_prompt("country_research_task") + "\n\nRomania and Kayakings are not Kayaking."
+    _, masked = prompt_scope("gpt-4o-mini", {}, [{"role": "user", "content": prompt}], INPUTS)
+    assert "Romania and Kayakings are not {PreferredActivity}." in masked
+
+
+@pytest.mark.parametrize("prompt", [
+    "Plan a trip from USA to Oman, I like Kayaking.",  # not a task of tasks.yaml
+    f"{task_prompt('country_research_task')}\n\n{CONTEXT_MARKER}\n\nI like Kayaking.",  # given upstream output
+])
+def test_prompt_without_known_scope_depends_on_every_input(prompt):
+    scope, masked = prompt_scope("gpt-4o-mini", {}, [{"role": "user", "content": prompt}], INPUTS)
+    assert scoped_inputs(scope) == INPUTS
+    assert "{" + "PreferredActivity" + "}" not in masked
+
+
+def test_scope_differs_by_model_and_roles():
+    messages = [{"role": "user", "content": "Plan a trip."}]
+    scope, _ = prompt_scope("gpt-4o-mini", {}, messages, INPUTS)
+    assert scope != prompt_scope("groq/gemma2-9b-it", {}, messages, INPUTS)[0]
+    assert scope != prompt_scope("gpt-4o-mini", {}, [{"role": "system", "content": "Plan a trip."}], INPUTS)[0]
+
+
+def shard_prompt(index, inputs=INPUTS):
+    task = _load_tasks(TASKS_CONFIG)["country_research_task"]
+    shard = shard_descriptions(task["description"], per_shard=5)[index]
+    text = f"{shard['description']}\n\n{task['expected_output']}"
+    return shard["sections"], re.sub(r"\{(\w+)\}", lambda m: inputs.get(m.group(1), m.group(0)), text)
+
+
+def test_shard_depends_on_its_sections_placeholders():
+    names, prompt = shard_prompt(1)
+    assert [section.name for section in prompt_sections(prompt)] == names
+    assert prompt_placeholders(prompt) == ("Country",)
+    names, prompt = shard_prompt(0)
+    assert "Weather" in names
+    assert set(prompt_placeholders(prompt)) == {"Country", "HomeCountry", "StartDate", "EndDate"}
+
+
+def test_date_independent_shard_is_shared_across_shifted_dates():
+    shifted = dict(INPUTS, StartDate="17 December 2025", EndDate="08 January 2026")
+    scope, masked = prompt_scope("gpt-4o-mini", {}, [{"role": "user", "content": shard_prompt(1)[1]}], INPUTS)
+    other = prompt_scope("gpt-4o-mini", {}, [{"role": "user", "content": shard_prompt(1, shifted)[1]}], shifted)
+    assert (scope, masked) == other
+    assert "{StartDate}" in masked
+    dated = [{"role": "user", "content": shard_prompt(0, shifted)[1]}]
+    assert prompt_scope("gpt-4o-mini", {}, dated, shifted)[0] != \
+        prompt_scope("gpt-4o-mini", {}, [{"role": "user", "content": shard_prompt(0)[1]}], INPUTS)[0]
+
+
+def test_each_agent_step_has_a_scope_of_its_own():
+    step = [{"role": "system", "content": "You are a travel researcher."},
+            {"role": "user", "content": task_prompt("country_research_task")},
+            {"role": "assistant", "content": "Thought: search the weather\nObservation: dry season in Oman"}]
+    following = step[:-1] + [{"role": "assistant", "content": step[-1]["content"] +
+                              "\nThought: search the food\nObservation: shuwa and halwa"}]
+    scope = prompt_scope("gpt-4o-mini", {}, step, INPUTS)[0]
+    assert scope != prompt_scope("gpt-4o-mini", {}, following, INPUTS)[0]
+    assert scope != prompt_scope("gpt-4o-mini", {}, step + [{"role": "user", "content": "Go on."}], INPUTS)[0]
+    assert scope == prompt_scope("gpt-4o-mini", {}, step, dict(INPUTS, PreferredActivity="Hiking"))[0]
+
+
+def test_similar_prompt_in_the_same_scope_is_reused(tmp_path):
+    cache = SemanticCache(str(tmp_path / "semantic.sqlite3"), threshold=0.9, embedder=HashingEmbedder())
+    completion = CachedCompletion("Oman is dry in December.", ["Oman is dry in December."], 40, 6, 2.0)
+    prompt = task_prompt("country_research_task")
+    cache.put("scope", prompt, completion)
+    assert cache.get("scope", prompt + " Please.") == completion
+    assert cache.get("other scope", prompt) is None
+    assert cache.get("scope", "Plan a ski trip to Norway.") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["saved_tokens"] == 46
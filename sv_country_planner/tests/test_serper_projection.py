@@ -0,0 +1,44 @@
+from sv_country_planner.tools.serper_projection import ProjectionConfig, ProjectionStats, project_results
+
+RESULTS = {
+    "searchParameters": {"q": "bali weather", "type": "search"},
+    "answerBox": {"title": "Bali", "answer": "Tropical", "link": "https://example.com/bali", "extra": "x"},
+    "organic": [
+        {"title": "Same as the answer box", "link": "https://EXAMPLE.com/bali/", "snippet": "dup"},
+        {"title": "Climate", "link": "https://a.com/climate", "snippet": "Wet season", "sitelinks": [1, 2],
+         "position": 2},
+        {"title": "Climate again", "link": "https://a.com/climate#rain", "snippet": "dup"},
+    ] + [{"title": f"Page {n}", "link": f"https://b.com/{n}", "snippet": "s"} for n in range(10)],
+    "peopleAlsoAsk": [{"question": "When is the dry season?"}],
+    "relatedSearches": [{"query": "bali rain"}],
+    "credits": 1,
+}
+
+
+def test_projection_keeps_the_used_fields_without_duplicate_urls():
+    projected = project_results(RESULTS, ProjectionConfig(enabled=True, max_results=3))
+    assert set(projected) == {"query", "answerBox", "organic"}
+    assert projected["query"] == "bali weather"
+    assert projected["answerBox"] == {"title": "Bali", "answer": "Tropical", "link": "https://example.com/bali"}
+    assert projected["organic"] == [
+        {"title": "Climate", "link": "https://a.com/climate", "snippet": "Wet season"},
+        {"title": "Page 0", "link": "https://b.com/0", "snippet": "s"},
+        {"title": "Page 1", "link": "https://b.com/1", "snippet": "s"},
+    ]
+
+
+def test_disabled_projection_and_other_results_pass_through():
+    assert project_results(RESULTS, ProjectionConfig(enabled=False)) is RESULTS
+    assert project_results("no results", ProjectionConfig(enabled=True)) == "no results"
+
+
+def test_stats_report_savings_since_a_snapshot():
+    stats = ProjectionStats()
+    stats.add(RESULTS, {})
+    since = stats.snapshot()
+    projected = project_results(RESULTS, ProjectionConfig(enabled=True))
+    stats.add(RESULTS, projected)
+    report = stats.report(since=since)
+    assert report["search_calls"] == 1
+    assert 0 < report["projected_tokens"] < report["raw_tokens"]
+    assert report["tokens_saved"] == report["raw_tokens"] - report["projected_tokens"]
@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sv_country_planner.tools.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    group = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"organic": ["result"]}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(group.do, "bali weather", fetch) for _ in range(4)]
+        while group.stats()["coalesced_calls"] < 3:
+            pass
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert all(result == {"organic": ["result"]} for result in results)
+    # Followers get copies: one caller's changes do not reach the others.
+    results[0]["organic"].append("mine")
+    assert sum(result["organic"] == ["result"] for result in results) == 3
+    assert group.stats() == {"upstream_calls": 1, "coalesced_calls": 3, "in_flight": 0}
+
+
+def test_followers_get_the_leaders_error():
+    group = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(group.do, "key", fail)
+        started.wait(5)
+        follower = pool.submit(group.do, "key", lambda: "never called")
+        while group.stats()["coalesced_calls"] < 1:
+            pass
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_calls_after_completion_run_again():
+    group = SingleFlight()
+    assert group.do("key", lambda: 1) == 1
+    assert group.do("key", lambda: 2) == 2
+    assert group.do("other", lambda: 3) == 3
+    assert group.stats()["upstream_calls"] == 3
@@ -0,0 +1,84 @@
+import json
+
+from crewai.tasks.task_output import TaskOutput
+
+from sv_country_planner import structured_output
+from sv_country_planner.sections import load_sections
+from sv_country_planner.structured_output import (
+    CountryPlan, DayPlan, SectionText, _models, context_text, field_name, load_output, markdown_guardrail,
+    parse_markdown, structured, to_markdown,
+)
+
+REPORT = """# Indonesia
+
+## Basics about Indonesia
+
+Capital: Jakarta, see https://en.wikipedia.org/wiki/Indonesia.
+
+### Population
+
+About 280 million.
+
+## Weather
+
+Rainy season from November (https://www.weather.gov/).
+
+## Food
+
+NULL
+"""
+
+
+def research():
+    return parse_markdown(_models()["country_research_task"], REPORT)
+
+
+def test_country_research_has_a_field_per_section():
+    model = _models()["country_research_task"]
+    assert field_name("Tourisism Highlights") == "tourisism_highlights"
+    assert [info.title for info in model.model_fields.values()] == \
+        [section.name for section in load_sections("country_research_task")]
+
+
+def test_markdown_is_parsed_into_sections():
+    output = research()
+    assert output.basics.text.startswith("Capital: Jakarta")
+    assert "### Population\n\nAbout 280 million." in output.basics.text  # a sub-heading stays with its section
+    assert output.basics.sources == ["https://en.wikipedia.org/wiki/Indonesia"]
+    assert output.weather.sources == ["https://www.weather.gov/"]
+    assert output.food.text == "NULL" and output.health.text == "NULL"
+
+
+def test_context_gets_the_needed_non_empty_sections():
+    output = TaskOutput(description="Research.", agent="Researcher", raw=REPORT, pydantic=research())
+    planner = context_text("country_planner_task", "country_research_task", output)
+    assert planner.startswith("## Weather\n\nRainy season") and "Basics" not in planner
+    final = context_text("final_reporting_task", "country_research_task", output)
+    assert "## Basics" in final and "## Food" not in final
+    assert context_text("country_planner_task", "country_research_task",
+                        TaskOutput(description="Research.", agent="Researcher", raw=REPORT)) == REPORT
+
+
+def test_days_and_guardrail_render_markdown():
+    plan = CountryPlan(days=[DayPlan(day=1, title="Bali", text="Kayak at Sanur.", sources=["https://bali.com"])])
+    assert to_markdown(plan) == "## Day 1 - Bali\n\nKayak at Sanur.\n\nSources:\n- https://bali.com"
+    output = TaskOutput(description="Plan.", agent="Planner", raw="{}", pydantic=plan)
+    assert markdown_guardrail(output) == (True, output)
+    assert output.raw.startswith("## Day 1 - Bali")
+
+
+def test_models_only_when_turned_on(monkeypatch):
+    assert structured("country_planner_task") == {}
+    monkeypatch.setattr(structured_output, "ENABLED", True)
+    assert structured("country_planner_task")["output_pydantic"] is CountryPlan
+    assert structured("unknown_task") == {}
+
+
+def test_saved_output_is_loaded(tmp_path):
+    path = tmp_path / "country_planner.md"
+    assert load_output("country_planner_task", str(path)) is None
+    (tmp_path / "country_planner.json").write_text(json.dumps({"days": [{"day": 1, "text": "Ubud."}]}))
+    assert load_output("country_planner_task", str(path)).days[0] == DayPlan(day=1, text="Ubud.")
+    (tmp_path / "country_planner.json").write_text('{"days": "many"}')
+    assert load_output("country_planner_task", str(path)) is None
+    assert SectionText().text == "NULL"
@@ -0,0 +1,62 @@
+import logging
+
+import numpy as np
+import pytest
+
+from sv_country_planner.tools.embedders import website_app
+from sv_country_planner.tools.vector_quant import QuantizedIndex, exact_rerank, hnsw_metadata, open_collection, quantize
+
+URL = "https://en.wikipedia.org/wiki/Bali"
+
+
+def test_quantize_keeps_rows_within_one_step():
+    vectors = np.random.default_rng(0).normal(size=(5, 16)).astype(np.float32)
+    vectors[2] = 0.0
+    codes, scales = quantize(vectors)
+    assert codes.dtype == np.int8 and codes.shape == vectors.shape
+    assert scales[2] == 1.0  # an all-zero row keeps a usable scale
+    assert np.all(np.abs(codes * scales[:, None] - vectors) <= scales[:, None] / 2 + 1e-6)
+
+
+def test_search_filters_and_reranks_with_stored_vectors(tmp_path):
+    index = QuantizedIndex("pages", str(tmp_path / "vectors.sqlite3"))
+    index.put("app", URL, [("a", "Weather", [1.0, 0.0, 0.0]),
+                           ("b", "Food", [0.0, 1.0, 0.0]),
+                           ("c", "Weather", [0.9, 0.1, 0.0])])
+    assert len(index) == 3
+    assert index.search([1.0, 0.0, 0.0], 2) == ["a", "c"]
+    assert index.search([0.0, 1.0, 0.0], 3, where={"section": "Weather"}) == ["c", "a"]
+    assert index.search([1.0, 0.0, 0.0], 3, where={"url": "https://example.com"}) == []
+
+    stored = index.vectors(["a", "c", "missing"])
+    assert set(stored) == {"a", "c"}
+    assert stored["c"].dtype == np.float32
+    assert exact_rerank([1.0, 0.0, 0.0], [stored["a"], stored["c"]]) == [0.0, pytest.approx(0.02, abs=1e-6)]
+
+    index.delete(["a"])
+    assert index.search([1.0, 0.0, 0.0], 3) == ["c", "b"]
+    stats = index.stats()
+    assert stats["vectors"] == 2 and stats["float32_bytes"] == 2 * 3 * 4
+    assert stats["searches"] == 4
+
+
+def test_other_processes_writes_are_picked_up(tmp_path):
+    path = str(tmp_path / "vectors.sqlite3")
+    reader = QuantizedIndex("pages", path)
+    assert reader.search([1.0, 0.0], 1) == []
+    QuantizedIndex("pages", path).put("app", URL, [("a", "Weather", [1.0, 0.0])])
+    assert reader.search([1.0, 0.0], 1) == ["a"]
+    assert QuantizedIndex("other", path).search([1.0, 0.0], 1) == []
+
+
+def test_empty_collection_is_recreated_with_hnsw_settings(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("TA_HNSW_M", "8")
+    config = {"app": {"config": {"id": "test", "collect_metrics": False}},
+              "vectordb": {"provider": "chroma", "config": {"collection_name": "pages", "dir": str(tmp_path)}}}
+    app = website_app(config, "hashing")
+    with caplog.at_level(logging.INFO, logger="sv_country_planner.tools.vector_quant"):
+        open_collection(app)
+    assert app.db.collection.metadata == hnsw_metadata()
+    assert app.db.collection.metadata["hnsw:M"] == 8
+    assert "Re-creating the empty collection" in caplog.text
+